@@ -0,0 +1,8 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""
+Coralogix Logger benchmarks
+Author: Coralogix Ltd.
+Email: info@coralogix.com
+"""
@@ -0,0 +1,83 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""
+Coralogix Logger benchmarks runner, prints the results as JSON.
+Run: python -m coralogix.benchmarks [--records N] [--threads N] [--only NAME] [--output FILE]
+Author: Coralogix Ltd.
+Email: info@coralogix.com
+"""
+
+from __future__ import print_function
+import sys
+import json
+import time
+import argparse
+import platform
+from coralogix import __version__
+from coralogix.encoder import get_encoder
+from . import encoders, pipeline
+
+BENCHMARKS = (
+    ('add_logline', lambda args: {
+        'single_thread': pipeline.add_logline_throughput(args.records, 1),
+        'multi_thread': pipeline.add_logline_throughput(args.records, args.threads),
+    }),
+    ('shard_contention', lambda args: pipeline.shard_contention(args.records)),
+    ('emit_latency', lambda args: {
+        'immediate': pipeline.emit_latency(args.records // 5),
+        'deferred': pipeline.emit_latency(args.records // 5, deferred=True),
+    }),
+    ('batch_cutting', lambda args: pipeline.batch_cutting(threads=args.threads)),
+    ('end_to_end', lambda args: {
+        'single_thread': pipeline.end_to_end(args.records, 1),
+        'multi_thread': pipeline.end_to_end(args.records, args.threads),
+    }),
+    ('encoders', lambda args: encoders.run(args.records // 5)),
+)
+
+
+def main(argv=None):
+    """
+    Run benchmarks
+    :param argv: Command line arguments (default: sys.argv)
+    :type argv: list
+    :return: Exit code
+    :rtype: int
+    """
+    parser = argparse.ArgumentParser(prog='python -m coralogix.benchmarks', description=__doc__.split('\n')[0])
+    parser.add_argument('--records', type=int, default=100000, help='records per benchmark run (default: 100000)')
+    parser.add_argument('--threads', type=int, default=4, help='producer threads of multi-thread runs (default: 4)')
+    parser.add_argument('--only', action='append', choices=[name for name, _ in BENCHMARKS],
+                        help='run only this benchmark, may be repeated')
+    parser.add_argument('--output', help='write the results to this file instead of stdout')
+    args = parser.parse_args(argv)
+
+    results = {}
+    for name, benchmark in BENCHMARKS:
+        if args.only and name not in args.only:
+            continue
+        print('Running {}...'.format(name), file=sys.stderr)
+        results[name] = benchmark(args)
+
+    report = json.dumps({
+        'benchmark': 'pipeline',
+        'sdk': __version__,
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'encoder': get_encoder().name,
+        'timestamp': int(time.time()),
+        'records': args.records,
+        'threads': args.threads,
+        'results': results,
+    }, indent=2)
+    if args.output:
+        with open(args.output, 'w') as output:
+            output.write(report + '\n')
+    else:
+        print(report)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
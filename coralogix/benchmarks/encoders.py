@@ -0,0 +1,101 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""
+Coralogix Logger JSON encoders benchmark.
+Run: python -m coralogix.benchmarks.encoders
+Author: Coralogix Ltd.
+Email: info@coralogix.com
+"""
+
+from __future__ import print_function
+import sys
+import json
+import time
+import uuid
+import decimal
+import datetime
+from coralogix.encoder import ENCODERS, is_available, set_encoder, dumps
+
+# Log records as they are encoded by add_logline()
+RECORDS = {
+    'handler': {
+        'text': 'GET /api/v1/orders/1234 200 12.5ms',
+        'timestamp': 1700000000000.123,
+        'severity': 3,
+        'category': 'app.requests',
+        'className': 'views',
+        'methodName': 'get_order',
+        'threadId': '140234567890',
+    },
+    'traceback': {
+        'text': 'Failed to process order\nTraceback (most recent call last):\n' +
+                '  File "/srv/app/orders.py", line 42, in process\n    total = compute(order)\n' * 8 +
+                'ZeroDivisionError: division by zero',
+        'timestamp': 1700000000000.123,
+        'severity': 5,
+        'category': 'app.orders',
+        'className': 'orders',
+        'methodName': 'process',
+        'threadId': '140234567890',
+    },
+    'unicode': {
+        'text': u'Пользователь 用户 ユーザー logged in ✓',
+        'timestamp': 1700000000000.123,
+        'severity': 3,
+        'category': 'app.auth',
+    },
+    'extras': {
+        'text': 'Payment captured',
+        'timestamp': 1700000000000.123,
+        'severity': 3,
+        'category': 'app.payments',
+        'amount': decimal.Decimal('19.99'),
+        'paymentId': uuid.UUID(int=1234),
+        'capturedAt': datetime.datetime(2024, 1, 2, 3, 4, 5),
+    },
+}
+
+
+def measure(record, iterations):
+    """
+    Encode record repeatedly with the selected encoder
+    :return: Nanoseconds per record and encoded size
+    :rtype: tuple
+    """
+    size = len(dumps(record))
+    started = time.perf_counter()
+    for _ in range(iterations):
+        dumps(record)
+    return (time.perf_counter() - started) * 1e9 / iterations, size
+
+
+def run(iterations=20000):
+    """
+    Benchmark all installed encoders on all records
+    :param iterations: Encodings per record and encoder
+    :type iterations: int
+    :return: Results by encoder and record
+    :rtype: dict
+    """
+    results = {}
+    try:
+        for name, _ in ENCODERS:
+            if not is_available(name):
+                continue
+            set_encoder(name)
+            results[name] = {}
+            for record_name, record in RECORDS.items():
+                ns, size = measure(record, iterations)
+                results[name][record_name] = {'ns_per_record': round(ns, 1), 'bytes': size}
+    finally:
+        set_encoder()
+    return results
+
+
+if __name__ == '__main__':
+    print(json.dumps({
+        'benchmark': 'encoders',
+        'python': sys.version.split()[0],
+        'results': run(int(sys.argv[1]) if len(sys.argv) > 1 else 20000),
+    }, indent=2))
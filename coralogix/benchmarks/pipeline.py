@@ -0,0 +1,305 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""
+Coralogix Logger ingestion and send pipeline benchmarks.
+Run: python -m coralogix.benchmarks
+Author: Coralogix Ltd.
+Email: info@coralogix.com
+"""
+
+import os
+import time
+import logging
+from contextlib import contextmanager
+from threading import Thread, Barrier
+from coralogix.constants import Coralogix
+from coralogix.handlers import CoralogixLogger
+from coralogix.manager import LoggerManager
+from .server import IngressServer, TIME_PATH
+
+PRIVATE_KEY = 'benchmark-private-key'
+APP_NAME = 'benchmark'
+SUBSYSTEM_NAME = 'pipeline'
+REGION = 'EU2'
+CATEGORY = 'benchmark'
+
+# Latency percentiles reported by emit_latency()
+PERCENTILES = (50, 90, 99, 99.9)
+
+# Buffer fills measured by batch_cutting()
+FILLS = (1000, 10000, 100000)
+
+# Fields add_logline() gets from the handler for every record
+FIELDS = {'className': 'pipeline', 'methodName': 'benchmark', 'threadId': '140234567890'}
+MESSAGE = 'GET /api/v1/orders/1234 200 12.5ms'
+
+
+@contextmanager
+def ingress(server):
+    """
+    Point the SDK at a local ingress server
+    :param server: Started ingress server
+    :type server: IngressServer
+    """
+    names = ('CORALOGIX_LOG_URL', 'CORALOGIX_TIME_DELTA_URL')
+    previous = dict((name, os.environ.get(name)) for name in names)
+    os.environ['CORALOGIX_LOG_URL'] = server.url()
+    os.environ['CORALOGIX_TIME_DELTA_URL'] = server.url(TIME_PATH)
+    try:
+        yield server
+    finally:
+        for name, value in previous.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+
+
+def percentiles(samples):
+    """
+    Summarize latency samples
+    :param samples: Latencies in microseconds
+    :type samples: list
+    :return: Percentiles, mean and maximum in microseconds
+    :rtype: dict
+    """
+    samples = sorted(samples)
+    summary = dict(
+        ('p{:g}'.format(percentile), round(samples[min(int(percentile / 100.0 * len(samples)), len(samples) - 1)], 2))
+        for percentile in PERCENTILES
+    )
+    summary['mean'] = round(sum(samples) / len(samples), 2)
+    summary['max'] = round(samples[-1], 2)
+    return summary
+
+
+def fill(manager, records, threads=1):
+    """
+    Add records to the manager from several threads started at once
+    :return: Seconds the threads took
+    :rtype: float
+    """
+    barrier = Barrier(threads + 1)
+
+    def produce(count):
+        add_logline = manager.add_logline
+        barrier.wait()
+        for _ in range(count):
+            add_logline(MESSAGE, Coralogix.Severity.INFO, CATEGORY, **FIELDS)
+
+    workers = [
+        Thread(target=produce, args=(records // threads + (index < records % threads),))
+        for index in range(threads)
+    ]
+    for worker in workers:
+        worker.start()
+    barrier.wait()
+    started = time.perf_counter()
+    for worker in workers:
+        worker.join()
+    return time.perf_counter() - started
+
+
+def add_logline_throughput(records=100000, threads=1):
+    """
+    Measure records per second add_logline() buffers.
+    The manager is not configured, so nothing is sent while the buffer fills.
+    :param records: Total records added
+    :type records: int
+    :param threads: Producer threads
+    :type threads: int
+    :rtype: dict
+    """
+    manager = LoggerManager(max_buffer_size=records * 1024)
+    try:
+        seconds = fill(manager, records, threads)
+        stats = manager.stats()
+    finally:
+        manager.close()
+    return {
+        'threads': threads,
+        'records': records,
+        'seconds': round(seconds, 4),
+        'records_per_second': round(records / seconds),
+        'ns_per_record': round(seconds * 1e9 / records, 1),
+        'enqueued': stats['records_enqueued'],
+    }
+
+
+def shard_contention(records=100000, threads=(1, 8, 64)):
+    """
+    Measure add_logline() latency with a single buffer shard and with Coralogix.BUFFER_SHARDS
+    shards, as more producer threads contend for the shard locks
+    :param records: Total records added by each run
+    :type records: int
+    :param threads: Producer thread counts
+    :type threads: tuple
+    :return: Results by thread count and shard count
+    :rtype: dict
+    """
+    results = {}
+    shard_counts = sorted(set((1, max(Coralogix.BUFFER_SHARDS, 1))))
+    for count in threads:
+        runs = {}
+        for shards in shard_counts:
+            buffer_shards = Coralogix.BUFFER_SHARDS
+            Coralogix.BUFFER_SHARDS = shards
+            try:
+                manager = LoggerManager(max_buffer_size=records * 1024)
+            finally:
+                Coralogix.BUFFER_SHARDS = buffer_shards
+            samples = []
+            barrier = Barrier(count + 1)
+
+            def produce(total):
+                add_logline = manager.add_logline
+                clock = time.perf_counter
+                latencies = []
+                barrier.wait()
+                for _ in range(total):
+                    started = clock()
+                    add_logline(MESSAGE, Coralogix.Severity.INFO, CATEGORY, **FIELDS)
+                    latencies.append((clock() - started) * 1e6)
+                # list.extend() of another list is atomic
+                samples.extend(latencies)
+
+            workers = [
+                Thread(target=produce, args=(records // count + (index < records % count),))
+                for index in range(count)
+            ]
+            try:
+                for worker in workers:
+                    worker.start()
+                barrier.wait()
+                started = time.perf_counter()
+                for worker in workers:
+                    worker.join()
+                seconds = time.perf_counter() - started
+                filled = sum(1 for shard in manager._shards if shard.entries)
+            finally:
+                manager.close()
+            summary = percentiles(samples)
+            summary['records_per_second'] = round(records / seconds)
+            summary['filled_shards'] = filled
+            runs[str(shards)] = summary
+        results[str(count)] = runs
+    return results
+
+
+def emit_latency(records=20000, deferred=False):
+    """
+    Measure latency of logger.info() calls through the logging stack and CoralogixLogger.emit()
+    :param records: Records logged
+    :type records: int
+    :param deferred: Format records on the sending thread
+    :type deferred: bool
+    :return: Latency percentiles in microseconds
+    :rtype: dict
+    """
+    with IngressServer() as server, ingress(server):
+        manager = LoggerManager()
+        handler = CoralogixLogger(PRIVATE_KEY, APP_NAME, SUBSYSTEM_NAME, region=REGION,
+                                  deferred=deferred, manager=manager)
+        logger = logging.getLogger('coralogix.benchmarks.emit')
+        logger.propagate = False
+        logger.setLevel(logging.INFO)
+        logger.addHandler(handler)
+        samples = []
+        try:
+            clock = time.perf_counter
+            for index in range(records):
+                started = clock()
+                logger.info('GET /api/v1/orders/%d 200 12.5ms', index)
+                samples.append((clock() - started) * 1e6)
+        finally:
+            logger.removeHandler(handler)
+            manager.close()
+    summary = percentiles(samples)
+    summary['records'] = records
+    return summary
+
+
+def batch_cutting(fills=FILLS, threads=4):
+    """
+    Measure the cost of cutting bulks out of the buffer at various buffer fills:
+    merging the shards of producer threads, then planning and taking each bulk
+    :param fills: Buffered records of each run
+    :type fills: tuple
+    :param threads: Producer threads filling the shards
+    :type threads: int
+    :return: Results by buffer fill
+    :rtype: dict
+    """
+    results = {}
+    chunk_size = Coralogix.MAX_LOG_CHUNK_SIZE
+    for records in fills:
+        manager = LoggerManager(max_buffer_size=records * 1024)
+        try:
+            fill(manager, records, threads)
+            with manager._mutex:
+                started = time.perf_counter()
+                manager._collect()
+                collected = time.perf_counter()
+                buffer = manager._buffer
+                bulks = 0
+                while len(buffer):
+                    buffer.take(buffer.plan(chunk_size))
+                    bulks += 1
+                finished = time.perf_counter()
+                manager._buffer_size = buffer.size
+        finally:
+            manager.close()
+        results[str(records)] = {
+            'collect_ms': round((collected - started) * 1e3, 3),
+            'bulks': bulks,
+            'us_per_bulk': round((finished - collected) * 1e6 / max(bulks, 1), 2),
+            'records_per_bulk': round(float(records) / max(bulks, 1), 1),
+        }
+    return results
+
+
+def end_to_end(records=100000, threads=1, compression=None, timeout=60):
+    """
+    Measure records per second delivered to a local ingress server
+    :param records: Total records added
+    :type records: int
+    :param threads: Producer threads
+    :type threads: int
+    :param compression: HTTP body compression (default: None)
+    :type compression: str
+    :param timeout: Maximum seconds to wait for the delivery (default: 60)
+    :type timeout: float
+    :rtype: dict
+    """
+    with IngressServer() as server, ingress(server):
+        manager = LoggerManager(max_buffer_size=records * 1024)
+        try:
+            manager.configure(
+                sync_time=False, privateKey=PRIVATE_KEY, applicationName=APP_NAME,
+                subsystemName=SUBSYSTEM_NAME, region=REGION, compression=compression
+            )
+            # The init message is delivered before the clock starts
+            manager.flush()
+            baseline = server.records
+            started = time.perf_counter()
+            seconds = fill(manager, records, threads)
+            deadline = time.monotonic() + timeout
+            while server.records - baseline < records and time.monotonic() < deadline:
+                time.sleep(0.001)
+            elapsed = time.perf_counter() - started
+            stats = manager.stats()
+        finally:
+            manager.close()
+    delivered = server.records - baseline
+    return {
+        'threads': threads,
+        'compression': compression,
+        'records': records,
+        'delivered': delivered,
+        'bulks': server.bulks,
+        'seconds': round(elapsed, 4),
+        'add_seconds': round(seconds, 4),
+        'records_per_second': round(delivered / elapsed),
+        'dropped': sum(stats['records_dropped'].values()),
+    }
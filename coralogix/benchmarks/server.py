@@ -0,0 +1,351 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""
+Coralogix Logger local ingress endpoint for benchmarks and fault injection
+Author: Coralogix Ltd.
+Email: info@coralogix.com
+"""
+
+import json
+import time
+import random
+import socket
+import struct
+from threading import Thread, Lock
+from http.server import HTTPServer, BaseHTTPRequestHandler
+from socketserver import ThreadingMixIn
+from coralogix.compression import decompress
+
+# Paths of the Coralogix ingress endpoints used by the SDK
+LOGS_PATH = '/logs/v1/singles'
+TIME_PATH = '/sdk/v1/time'
+
+# Injected faults
+FAULT_LATENCY = 'latency'
+FAULT_ERROR = 'error'
+FAULT_RESET = 'reset'
+FAULT_ACK_LOST = 'ack_lost'
+FAULT_SLOW_READ = 'slow_read'
+FAULT_OUTAGE = 'outage'
+FAULTS = (FAULT_LATENCY, FAULT_ERROR, FAULT_RESET, FAULT_ACK_LOST, FAULT_SLOW_READ, FAULT_OUTAGE)
+
+# Body chunk read at once by slow reads
+SLOW_READ_CHUNK = 1024
+
+
+class Faults(object):
+    """
+    Faults injected into ingress responses. Rates are probabilities of a request
+    to get the fault; all of them are off by default.
+    """
+
+    def __init__(self, latency=0, jitter=0, error_rate=0, error_statuses=(429, 500, 502, 503),
+                 reset_rate=0, ack_loss_rate=0, slow_read=0, outages=(), outage_every=0,
+                 outage_duration=0, outage_status=503, seed=None):
+        """
+        Initialize faults
+        :param latency: Seconds added to every response (default: 0)
+        :type latency: float
+        :param jitter: Maximum random seconds added on top of the latency (default: 0)
+        :type jitter: float
+        :param error_rate: Rate of requests rejected with an error status (default: 0)
+        :type error_rate: float
+        :param error_statuses: Statuses of rejected requests, picked at random (default: 429 and 5xx)
+        :type error_statuses: tuple
+        :param reset_rate: Rate of connections reset before the body is read (default: 0)
+        :type reset_rate: float
+        :param ack_loss_rate: Rate of connections reset after the records were accepted,
+                              the client sends them again (default: 0)
+        :type ack_loss_rate: float
+        :param slow_read: Body read speed in bytes per second, 0 reads at full speed (default: 0)
+        :type slow_read: float
+        :param outages: Outages as (start, duration) seconds after the server started (default: none)
+        :type outages: tuple
+        :param outage_every: Seconds between periodic outages, 0 disables them (default: 0)
+        :type outage_every: float
+        :param outage_duration: Seconds each periodic outage lasts (default: 0)
+        :type outage_duration: float
+        :param outage_status: Status of requests during an outage, None resets them (default: 503)
+        :type outage_status: int
+        :param seed: Random seed, to repeat a run (default: None)
+        :type seed: int
+        """
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_statuses = tuple(error_statuses)
+        self.reset_rate = reset_rate
+        self.ack_loss_rate = ack_loss_rate
+        self.slow_read = slow_read
+        self.outages = tuple(outages)
+        self.outage_every = outage_every
+        self.outage_duration = outage_duration
+        self.outage_status = outage_status
+        self._random = random.Random(seed)
+        self._lock = Lock()
+
+    def random(self):
+        """
+        Draw a random number of this run
+        :rtype: float
+        """
+        with self._lock:
+            return self._random.random()
+
+    def delay(self):
+        """
+        Seconds to delay a response
+        :rtype: float
+        """
+        return self.latency + (self.random() * self.jitter if self.jitter else 0)
+
+    def in_outage(self, elapsed):
+        """
+        Check if the server is down
+        :param elapsed: Seconds since the server started
+        :type elapsed: float
+        :rtype: bool
+        """
+        if self.outage_every and self.outage_duration and \
+                elapsed % self.outage_every >= self.outage_every - self.outage_duration:
+            return True
+        return any(start <= elapsed < start + duration for start, duration in self.outages)
+
+    def error_status(self):
+        """
+        Status of a rejected request, None if the request is accepted
+        :rtype: int
+        """
+        if self.error_rate and self.random() < self.error_rate:
+            with self._lock:
+                return self._random.choice(self.error_statuses)
+        return None
+
+
+class _ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Connections reset on purpose fail when the handler finishes
+        pass
+
+
+class IngressServer(object):
+    """
+    Local stand-in for Coralogix ingress which counts the received log records.
+    Bodies are parsed but not kept, so long runs do not grow the server memory.
+    Faults can be changed while the server runs.
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, faults=None, sequence=None):
+        """
+        Bind ingress server, it serves requests after start()
+        :param host: Listening address (default: 127.0.0.1)
+        :type host: str
+        :param port: Listening port, 0 picks a free one (default: 0)
+        :type port: int
+        :param faults: Faults injected into responses (default: none)
+        :type faults: Faults
+        :param sequence: Function returning the sequence number of a received record, or None.
+                         Records whose number was received before are counted as duplicates.
+        :type sequence: callable
+        """
+        self.faults = faults or Faults()
+        self.records = 0
+        self.distinct = 0
+        self.duplicates = 0
+        self.bulks = 0
+        self.bytes = 0
+        self.requests = 0
+        self.injected = dict.fromkeys(FAULTS, 0)
+        self.started = time.monotonic()
+        self._sequence = sequence
+        # One byte per sequence number, the bytes of received records are set
+        self._seen = bytearray()
+        self._lock = Lock()
+        ingress = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def _respond(self, status=200, body=b''):
+                self.send_response(status)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                if self.command != 'HEAD':
+                    self.wfile.write(body)
+
+            def _reset(self):
+                # Closing with a zero linger time sends RST instead of FIN
+                self.connection.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, struct.pack('ii', 1, 0))
+                self.close_connection = True
+                self.connection.close()
+
+            def _read_body(self, faults):
+                length = int(self.headers.get('Content-Length', 0))
+                if not faults.slow_read:
+                    return self.rfile.read(length)
+                ingress.inject(FAULT_SLOW_READ)
+                chunks = []
+                while length > 0:
+                    chunk = self.rfile.read(min(SLOW_READ_CHUNK, length))
+                    if not chunk:
+                        break
+                    chunks.append(chunk)
+                    length -= len(chunk)
+                    time.sleep(len(chunk) / float(faults.slow_read))
+                return b''.join(chunks)
+
+            def _fail(self, faults):
+                """
+                Inject the faults which reject a request before its body is read
+                :return: True if the request was rejected
+                """
+                ingress.count_request()
+                delay = faults.delay()
+                if delay:
+                    ingress.inject(FAULT_LATENCY)
+                    time.sleep(delay)
+                if faults.in_outage(time.monotonic() - ingress.started):
+                    ingress.inject(FAULT_OUTAGE)
+                    if faults.outage_status is None:
+                        self._reset()
+                    else:
+                        self._discard_body()
+                        self._respond(faults.outage_status)
+                    return True
+                if faults.reset_rate and faults.random() < faults.reset_rate:
+                    ingress.inject(FAULT_RESET)
+                    self._reset()
+                    return True
+                return False
+
+            def _discard_body(self):
+                length = int(self.headers.get('Content-Length', 0))
+                if length:
+                    self.rfile.read(length)
+
+            def do_POST(self):
+                faults = ingress.faults
+                if self._fail(faults):
+                    return
+                body = self._read_body(faults)
+                status = faults.error_status()
+                if status is not None:
+                    ingress.inject(FAULT_ERROR)
+                    self._respond(status)
+                    return
+                ingress.receive(decompress(body, self.headers.get('Content-Encoding')))
+                if faults.ack_loss_rate and faults.random() < faults.ack_loss_rate:
+                    ingress.inject(FAULT_ACK_LOST)
+                    self._reset()
+                    return
+                self._respond()
+
+            def do_GET(self):
+                if self._fail(ingress.faults):
+                    return
+                if self.path.startswith(TIME_PATH):
+                    # Server time in 100 nanoseconds ticks
+                    self._respond(body=str(int(time.time() * 1e7)).encode())
+                else:
+                    self._respond(404)
+
+            def do_HEAD(self):
+                if not self._fail(ingress.faults):
+                    self._respond()
+
+        self._server = _ThreadingHTTPServer((host, port), Handler)
+        self._thread = Thread(target=self._server.serve_forever)
+        self._thread.daemon = True
+        self._thread.name = 'coralogix-ingress-server'
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def start(self):
+        """
+        Start serving requests, outages are scheduled from now
+        """
+        self.started = time.monotonic()
+        self._thread.start()
+
+    def close(self):
+        """
+        Stop serving requests and close the socket
+        """
+        self._server.shutdown()
+        self._server.server_close()
+
+    def url(self, path=LOGS_PATH):
+        """
+        URL of an ingress endpoint
+        :param path: Endpoint path (default: logs endpoint)
+        :type path: str
+        :rtype: str
+        """
+        return 'http://{}:{}{}'.format(self._server.server_address[0], self._server.server_address[1], path)
+
+    def count_request(self):
+        """
+        Count received request
+        """
+        with self._lock:
+            self.requests += 1
+
+    def inject(self, fault):
+        """
+        Count injected fault
+        :param fault: Fault name, one of FAULTS
+        :type fault: str
+        """
+        with self._lock:
+            self.injected[fault] += 1
+
+    def receive(self, body):
+        """
+        Count log records of a bulk
+        :param body: Decompressed request body, a JSON array of log records
+        :type body: bytes
+        """
+        records = json.loads(body.decode('utf8'))
+        sequences = [self._sequence(record) for record in records] if self._sequence else ()
+        with self._lock:
+            self.bulks += 1
+            self.records += len(records)
+            self.bytes += len(body)
+            seen = self._seen
+            for sequence in sequences:
+                if sequence is None:
+                    continue
+                if sequence >= len(seen):
+                    seen.extend(bytes(max(sequence + 1 - len(seen), len(seen))))
+                if seen[sequence]:
+                    self.duplicates += 1
+                else:
+                    seen[sequence] = 1
+                    self.distinct += 1
+
+    def stats(self):
+        """
+        Server counters
+        :rtype: dict
+        """
+        with self._lock:
+            return {
+                'requests': self.requests,
+                'bulks': self.bulks,
+                'records': self.records,
+                'distinct': self.distinct,
+                'duplicates': self.duplicates,
+                'bytes': self.bytes,
+                'faults': dict(self.injected),
+            }
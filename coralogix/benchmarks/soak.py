@@ -0,0 +1,292 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""
+Coralogix Logger soak test against a local ingress server with injected faults.
+Run: python -m coralogix.benchmarks.soak --duration 3600 --rate 1000 --error-rate 0.05
+Author: Coralogix Ltd.
+Email: info@coralogix.com
+"""
+
+from __future__ import print_function
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+from coralogix.constants import Coralogix
+from coralogix.handlers import DebugLogger
+from coralogix.manager import LoggerManager
+from .pipeline import ingress, PRIVATE_KEY, APP_NAME, REGION
+from .server import IngressServer, Faults
+
+SUBSYSTEM_NAME = 'soak'
+CATEGORY = 'soak'
+# Records carry their sequence number, so the server tells duplicates apart
+MESSAGE_PREFIX = 'soak record '
+
+# Every this many records one is an error, it takes the priority lane
+ERROR_EVERY = 100
+
+
+def record_sequence(record):
+    """
+    Sequence number of a soak record
+    :param record: Received log record
+    :type record: dict
+    :return: Sequence number, None for other records
+    :rtype: int
+    """
+    text = record.get('text')
+    if isinstance(text, str) and text.startswith(MESSAGE_PREFIX):
+        return int(text[len(MESSAGE_PREFIX):])
+    return None
+
+
+def rss():
+    """
+    Resident set size of this process
+    :return: Bytes, None if it cannot be read on this platform
+    :rtype: int
+    """
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, IOError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+        # Peak instead of current size; kilobytes on Linux, bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == 'darwin' else peak * 1024
+    except (ImportError, OSError):
+        return None
+
+
+class Soak(object):
+    """
+    Drives a Logger Manager at a target rate against a local ingress server
+    and samples delivery, drops, duplicates, memory and threads over time
+    """
+
+    def __init__(self, faults=None, rate=1000, threads=4, max_buffer_size=None, compression=None):
+        """
+        Initialize soak run
+        :param faults: Faults injected by the ingress server (default: none)
+        :type faults: Faults
+        :param rate: Records per second of all producers together (default: 1000)
+        :type rate: float
+        :param threads: Producer threads (default: 4)
+        :type threads: int
+        :param max_buffer_size: Manager buffer size (default: Coralogix.MAX_LOG_BUFFER_SIZE)
+        :type max_buffer_size: int
+        :param compression: HTTP body compression (default: None)
+        :type compression: str
+        """
+        self.rate = float(rate)
+        self.threads = max(int(threads), 1)
+        self.server = IngressServer(faults=faults, sequence=record_sequence)
+        self.manager = None
+        self.samples = []
+        self._max_buffer_size = max_buffer_size
+        self._compression = compression
+        self._produced = [0] * self.threads
+        self._stop = threading.Event()
+        self._started = None
+
+    @property
+    def produced(self):
+        """
+        Records added by the producers so far
+        :rtype: int
+        """
+        return sum(self._produced)
+
+    def _produce(self, index):
+        """
+        Producer thread loop, adds records at its share of the rate
+        """
+        rate = self.rate / self.threads
+        add_logline = self.manager.add_logline
+        started = time.monotonic()
+        sent = 0
+        while not self._stop.is_set():
+            due = int((time.monotonic() - started) * rate)
+            while sent < due:
+                # Producers interleave their sequence numbers
+                sequence = sent * self.threads + index
+                severity = Coralogix.Severity.ERROR if sequence % ERROR_EVERY == 0 else Coralogix.Severity.INFO
+                add_logline(MESSAGE_PREFIX + str(sequence), severity, CATEGORY)
+                sent += 1
+                self._produced[index] = sent
+            self._stop.wait(0.005)
+
+    def sample(self):
+        """
+        Take a sample of the run state
+        :rtype: dict
+        """
+        stats = self.manager.stats()
+        server = self.server.stats()
+        sample = {
+            'elapsed': round(time.monotonic() - self._started, 3),
+            'produced': self.produced,
+            'delivered': server['distinct'],
+            'duplicated': server['duplicates'],
+            'dropped': dict((reason, count) for reason, count in stats['records_dropped'].items() if count),
+            'buffer_bytes': stats['buffer_bytes'] + stats['priority_buffer_bytes'],
+            'buffer_records': stats['buffer_records'] + stats['priority_buffer_records'],
+            'retries_pending': stats['retries_pending'],
+            'circuit_breaker_state': stats['circuit_breaker_state'],
+            'rss_bytes': rss(),
+            'threads': threading.active_count(),
+            'requests': server['requests'],
+            'faults': dict((fault, count) for fault, count in server['faults'].items() if count),
+        }
+        self.samples.append(sample)
+        return sample
+
+    def run(self, duration, report_interval=10, report=None, drain_timeout=120):
+        """
+        Run the soak test
+        :param duration: Seconds the producers run
+        :type duration: float
+        :param report_interval: Seconds between samples (default: 10)
+        :type report_interval: float
+        :param report: Procedure called with every sample (default: None)
+        :type report: callable
+        :param drain_timeout: Maximum seconds to wait for the buffered records
+                              once the producers and the faults stop (default: 120)
+        :type drain_timeout: float
+        :return: Summary of the run
+        :rtype: dict
+        """
+        with self.server, ingress(self.server):
+            self.manager = LoggerManager(max_buffer_size=self._max_buffer_size)
+            self.manager.configure(
+                sync_time=False, privateKey=PRIVATE_KEY, applicationName=APP_NAME,
+                subsystemName=SUBSYSTEM_NAME, region=REGION, compression=self._compression
+            )
+            self._started = time.monotonic()
+            baseline = self.sample()
+            producers = [
+                threading.Thread(target=self._produce, args=(index,), name='soak-producer-{}'.format(index))
+                for index in range(self.threads)
+            ]
+            for producer in producers:
+                producer.daemon = True
+                producer.start()
+            try:
+                deadline = self._started + duration
+                while time.monotonic() < deadline:
+                    time.sleep(max(min(report_interval, deadline - time.monotonic()), 0))
+                    sample = self.sample()
+                    if report is not None:
+                        report(sample)
+            finally:
+                self._stop.set()
+                for producer in producers:
+                    producer.join()
+
+            # Records still buffered or waiting for a retry are delivered once the faults stop
+            self.server.faults = Faults()
+            drain_started = time.monotonic()
+            while time.monotonic() - drain_started < drain_timeout:
+                sample = self.sample()
+                dropped = sum(sample['dropped'].values())
+                if sample['delivered'] + dropped >= sample['produced'] and not sample['retries_pending']:
+                    break
+                time.sleep(0.1)
+            drained = time.monotonic() - drain_started
+            self.manager.close()
+            final = self.sample()
+            if report is not None:
+                report(final)
+        return self.summary(baseline, final, drained)
+
+    def summary(self, baseline, final, drained):
+        """
+        Summarize the run
+        :rtype: dict
+        """
+        dropped = sum(final['dropped'].values())
+        rss_samples = [sample['rss_bytes'] for sample in self.samples if sample['rss_bytes'] is not None]
+        return {
+            'duration': final['elapsed'],
+            'drain_seconds': round(drained, 3),
+            'produced': final['produced'],
+            'delivered': final['delivered'],
+            'duplicated': final['duplicated'],
+            'dropped': final['dropped'],
+            # Records neither delivered nor counted as dropped, anything but 0 is a leak
+            'unaccounted': final['produced'] - final['delivered'] - dropped,
+            'rss_start_bytes': baseline['rss_bytes'],
+            'rss_end_bytes': final['rss_bytes'],
+            'rss_max_bytes': max(rss_samples) if rss_samples else None,
+            'threads_start': baseline['threads'],
+            'threads_max': max(sample['threads'] for sample in self.samples),
+            'threads_end': final['threads'],
+            'buffer_bytes_max': max(sample['buffer_bytes'] for sample in self.samples),
+            'retries_pending_max': max(sample['retries_pending'] for sample in self.samples),
+            'requests': final['requests'],
+            'faults': final['faults'],
+        }
+
+
+def main(argv=None):
+    """
+    Run soak test from the command line, samples are printed to stderr as JSON lines
+    and the summary to stdout as JSON
+    :param argv: Command line arguments (default: sys.argv)
+    :type argv: list
+    :return: Exit code, 1 if records were lost
+    :rtype: int
+    """
+    parser = argparse.ArgumentParser(prog='python -m coralogix.benchmarks.soak', description=__doc__.split('\n')[0])
+    parser.add_argument('--duration', type=float, default=60, help='seconds the producers run (default: 60)')
+    parser.add_argument('--rate', type=float, default=1000, help='records per second (default: 1000)')
+    parser.add_argument('--threads', type=int, default=4, help='producer threads (default: 4)')
+    parser.add_argument('--report-interval', type=float, default=10, help='seconds between samples (default: 10)')
+    parser.add_argument('--drain-timeout', type=float, default=120,
+                        help='seconds to wait for buffered records after the run (default: 120)')
+    parser.add_argument('--max-buffer-size', type=int, help='manager buffer size in bytes')
+    parser.add_argument('--compression', help='HTTP body compression: gzip, deflate or zstd')
+    parser.add_argument('--latency', type=float, default=0, help='seconds added to every response')
+    parser.add_argument('--jitter', type=float, default=0, help='maximum random seconds added to the latency')
+    parser.add_argument('--error-rate', type=float, default=0, help='rate of requests rejected with 429 or 5xx')
+    parser.add_argument('--error-status', type=int, action='append',
+                        help='status of rejected requests, may be repeated (default: 429, 500, 502, 503)')
+    parser.add_argument('--reset-rate', type=float, default=0, help='rate of connections reset before reading')
+    parser.add_argument('--ack-loss-rate', type=float, default=0,
+                        help='rate of connections reset after the records were accepted')
+    parser.add_argument('--slow-read', type=float, default=0, help='body read speed in bytes per second')
+    parser.add_argument('--outage', nargs=2, type=float, action='append', metavar=('START', 'DURATION'),
+                        help='outage seconds after the start, may be repeated')
+    parser.add_argument('--outage-every', type=float, default=0, help='seconds between periodic outages')
+    parser.add_argument('--outage-duration', type=float, default=0, help='seconds each periodic outage lasts')
+    parser.add_argument('--outage-reset', action='store_true', help='reset connections during outages instead of 503')
+    parser.add_argument('--seed', type=int, help='random seed of the faults')
+    parser.add_argument('--debug', action='store_true', help='print SDK debug output')
+    args = parser.parse_args(argv)
+
+    DebugLogger.debug_mode = args.debug
+    faults = Faults(
+        latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+        error_statuses=args.error_status or (429, 500, 502, 503), reset_rate=args.reset_rate,
+        ack_loss_rate=args.ack_loss_rate, slow_read=args.slow_read, outages=args.outage or (),
+        outage_every=args.outage_every, outage_duration=args.outage_duration,
+        outage_status=None if args.outage_reset else 503, seed=args.seed
+    )
+    soak = Soak(faults, rate=args.rate, threads=args.threads, max_buffer_size=args.max_buffer_size,
+                compression=args.compression)
+    summary = soak.run(
+        args.duration, report_interval=args.report_interval, drain_timeout=args.drain_timeout,
+        report=lambda sample: print(json.dumps(sample), file=sys.stderr)
+    )
+    print(json.dumps(summary, indent=2))
+    return 1 if summary['unaccounted'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
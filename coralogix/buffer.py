@@ -0,0 +1,239 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""
+Coralogix Logger log entries buffer
+Author: Coralogix Ltd.
+Email: info@coralogix.com
+"""
+
+from bisect import bisect_left, bisect_right
+from itertools import chain
+from threading import Lock
+
+# Policies of a full buffer
+# The new log is dropped, or written to the spill file if there is one
+DROP_NEWEST = 'drop_newest'
+# The oldest buffered logs are dropped to make room
+DROP_OLDEST = 'drop_oldest'
+# Buffered logs of a lower severity than the new one are dropped, lowest first
+DROP_LOWEST_SEVERITY = 'drop_lowest_severity'
+# The caller waits for the sending thread to make room, up to a timeout
+BLOCK = 'block'
+# Buffered logs older than the maximum age are dropped
+EXPIRE = 'expire'
+POLICIES = (DROP_NEWEST, DROP_OLDEST, DROP_LOWEST_SEVERITY, BLOCK, EXPIRE)
+
+
+class LogBuffer(object):
+    """
+    FIFO of encoded log entries with a running prefix-sum of their sizes,
+    so the largest bulk which fits a size limit is found with a bisect
+    """
+
+    def __init__(self):
+        """
+        Initialize empty buffer
+        """
+        self._entries = []
+        # Cumulative size of the entries including a separator after each of them.
+        # Offsets are absolute, _base is the offset of the first buffered entry.
+        self._offsets = []
+        self._base = 0
+        self.size = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __iter__(self):
+        return iter(self._entries)
+
+    def __getitem__(self, index):
+        return self._entries[index]
+
+    def append(self, entry):
+        """
+        Add log entry to the end of the buffer
+        :param entry: Encoded log entry
+        :type entry: LogEntry
+        """
+        last = self._offsets[-1] if self._offsets else self._base
+        self._entries.append(entry)
+        self._offsets.append(last + entry.size + 1)
+        self.size += entry.size
+
+    def extend(self, entries):
+        """
+        Add log entries to the end of the buffer
+        :param entries: Encoded log entries
+        :type entries: iterable
+        """
+        for entry in entries:
+            self.append(entry)
+
+    def plan(self, max_size, minimum=1):
+        """
+        Calculate how many leading entries fit into a JSON array of the given size
+        :param max_size: Maximum bulk size in bytes
+        :type max_size: int or float
+        :param minimum: Entries taken even if they do not fit (default: 1)
+        :type minimum: int
+        :return: Number of entries, at least the minimum if the buffer is not empty
+        :rtype: int
+        """
+        if not self._entries:
+            return 0
+        # Array of N entries takes offsets[N - 1] - base + 1 bytes: N - 1 commas and two brackets
+        count = bisect_right(self._offsets, self._base + max_size - 1)
+        # We must take at least one value, even if it is bigger than max_size
+        return max(count, min(minimum, len(self._entries)))
+
+    def take(self, count):
+        """
+        Remove leading entries from the buffer
+        :param count: Number of entries
+        :type count: int
+        :return: Removed entries
+        :rtype: list
+        """
+        count = min(count, len(self._entries))
+        if count < 1:
+            return []
+        entries = self._entries[:count]
+        del self._entries[:count]
+        base = self._offsets[count - 1]
+        del self._offsets[:count]
+        self.size -= base - self._base - count
+        self._base = base
+        return entries
+
+    def put_back(self, entries):
+        """
+        Return taken entries to the front of the buffer, e.g. a bulk which was not sent
+        :param entries: Entries in buffer order
+        :type entries: list
+        """
+        if not entries:
+            return
+        # Offsets of the buffered entries stay valid, the new ones end where the base was
+        base = self._base - sum(entry.size + 1 for entry in entries)
+        offsets = []
+        offset = base
+        for entry in entries:
+            offset += entry.size + 1
+            offsets.append(offset)
+        self._entries[:0] = entries
+        self._offsets[:0] = offsets
+        self._base = base
+        self.size += sum(entry.size for entry in entries)
+
+    def take_size(self, size):
+        """
+        Remove the fewest leading entries which free the given size
+        :param size: Bytes to free
+        :type size: int
+        :return: Removed entries
+        :rtype: list
+        """
+        if size <= 0:
+            return []
+        # Offsets count a separator after each entry, so this may take an entry more
+        return self.take(bisect_left(self._offsets, self._base + size) + 1)
+
+    def take_expired(self, timestamp):
+        """
+        Remove leading entries older than the given time.
+        Entries are ordered by time, the scan stops at the first newer one.
+        :param timestamp: Epoch time in milliseconds
+        :type timestamp: float
+        :return: Removed entries
+        :rtype: list
+        """
+        count = 0
+        for entry in self._entries:
+            if entry.timestamp is None or entry.timestamp >= timestamp:
+                break
+            count += 1
+        return self.take(count)
+
+    def take_lower_severity(self, severity, size):
+        """
+        Remove entries of a lower severity than the given one, the lowest severity
+        and the oldest entries first, until the given size is freed
+        :param severity: Severity of the log which needs room
+        :type severity: int
+        :param size: Bytes to free
+        :type size: int
+        :return: Removed entries
+        :rtype: list
+        """
+        entries = self._entries
+        # A single scan groups the candidates by severity, each group in buffer order
+        candidates = {}
+        for index, entry in enumerate(entries):
+            if entry.severity is not None and entry.severity < severity:
+                candidates.setdefault(entry.severity, []).append(index)
+        removed = set()
+        freed = 0
+        for index in chain.from_iterable(candidates[level] for level in sorted(candidates)):
+            if freed >= size:
+                break
+            removed.add(index)
+            freed += entries[index].size
+        if not removed:
+            return []
+        kept, taken = [], []
+        for index, entry in enumerate(entries):
+            (taken if index in removed else kept).append(entry)
+        self._entries = []
+        self._offsets = []
+        self.size = 0
+        self.extend(kept)
+        return taken
+
+
+class BufferShard(object):
+    """
+    Append-only generation of log entries written by a subset of threads.
+    The sender takes the whole generation at once by swapping the list.
+    """
+
+    __slots__ = ('lock', 'entries', 'size', 'appended', 'appended_size')
+
+    def __init__(self):
+        """
+        Initialize empty shard
+        """
+        self.lock = Lock()
+        self.entries = []
+        self.size = 0
+        # Totals since the shard was created, they are not reset by swap()
+        self.appended = 0
+        self.appended_size = 0
+
+    def append(self, entry):
+        """
+        Add log entry to the current generation
+        :param entry: Encoded log entry
+        :type entry: LogEntry
+        :return: True if the entry started a new generation
+        :rtype: bool
+        """
+        with self.lock:
+            self.entries.append(entry)
+            self.size += entry.size
+            self.appended += 1
+            self.appended_size += entry.size
+            return len(self.entries) == 1
+
+    def swap(self):
+        """
+        Take the current generation and start a new one
+        :return: Log entries of the taken generation
+        :rtype: list
+        """
+        with self.lock:
+            entries = self.entries
+            self.entries = []
+            self.size = 0
+        return entries
@@ -0,0 +1,206 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""
+Coralogix Logger clock synchronization with Coralogix servers
+Author: Coralogix Ltd.
+Email: info@coralogix.com
+"""
+
+import os
+import time
+from collections import deque
+from threading import Thread, Lock, Event
+from .constants import Coralogix
+
+
+class ClockSync(object):
+    """
+    Background estimation of the offset between the local clock and Coralogix servers.
+    Each sample is compensated by half of its round trip, the sample with the shortest
+    round trip of the recent ones is trusted most, and the estimate moves towards it
+    smoothly instead of jumping with network jitter.
+    The offset is kept against the monotonic clock, so wall clock steps on this host
+    are followed without another request to the server.
+    """
+
+    def __init__(self, fetch, on_update=None, interval=None, retry_interval=None, check_interval=None,
+                 samples=None, burst=None, smoothing=None, step=None):
+        """
+        Initialize clock synchronization, it runs in background after start()
+        :param fetch: Procedure returning the server epoch time in milliseconds, or None
+        :type fetch: callable
+        :param on_update: Procedure called with the time delta in milliseconds after every update (default: None)
+        :type on_update: callable
+        :param interval: Seconds between synchronizations (default: Coralogix.SYNC_TIME_UPDATE_INTERVAL minutes)
+        :type interval: float
+        :param retry_interval: Seconds before a failed synchronization is repeated
+                               (default: Coralogix.SYNC_TIME_RETRY_INTERVAL)
+        :type retry_interval: float
+        :param check_interval: Seconds between checks of the local wall clock
+                               (default: Coralogix.SYNC_TIME_CHECK_INTERVAL)
+        :type check_interval: float
+        :param samples: Recent samples the shortest round trip is picked from
+                        (default: Coralogix.SYNC_TIME_SAMPLES)
+        :type samples: int
+        :param burst: Requests of each synchronization (default: Coralogix.SYNC_TIME_BURST)
+        :type burst: int
+        :param smoothing: Weight of a new estimate against the current one (default: Coralogix.SYNC_TIME_SMOOTHING)
+        :type smoothing: float
+        :param step: Milliseconds of error above which the offset is replaced instead of smoothed
+                     (default: Coralogix.SYNC_TIME_STEP_THRESHOLD)
+        :type step: float
+        """
+        self._fetch = fetch
+        self._on_update = on_update
+        self.interval = interval if interval is not None else 60 * Coralogix.SYNC_TIME_UPDATE_INTERVAL
+        self.retry_interval = retry_interval if retry_interval is not None else Coralogix.SYNC_TIME_RETRY_INTERVAL
+        self.check_interval = check_interval if check_interval is not None else Coralogix.SYNC_TIME_CHECK_INTERVAL
+        self.burst = max(burst if burst is not None else Coralogix.SYNC_TIME_BURST, 1)
+        self.smoothing = smoothing if smoothing is not None else Coralogix.SYNC_TIME_SMOOTHING
+        self.step = step if step is not None else Coralogix.SYNC_TIME_STEP_THRESHOLD
+        # Server epoch time minus monotonic time in milliseconds, None until the first sample
+        self.offset = None
+        # Round trip of the sample the offset was last updated from, in milliseconds
+        self.rtt = None
+        # Epoch time of the last successful synchronization
+        self.last_update = 0
+        self._synced = None
+        self._samples = deque(maxlen=max(samples if samples is not None else Coralogix.SYNC_TIME_SAMPLES, 1))
+        self._lock = Lock()
+        self._stop = Event()
+        self._thread = None
+        self._process = None
+
+    @property
+    def running(self):
+        """
+        Check if the background thread of this process runs
+        :rtype: bool
+        """
+        thread = self._thread
+        return thread is not None and self._process == os.getpid() and thread.is_alive()
+
+    def start(self):
+        """
+        Start background synchronization, a no-op if it runs already.
+        A forked child starts its own thread.
+        """
+        if self.running:
+            return
+        with self._lock:
+            if self._thread is not None and self._process == os.getpid() and self._thread.is_alive():
+                return
+            self._stop = Event()
+            self._process = os.getpid()
+            self._thread = Thread(target=self._run)
+            self._thread.daemon = True
+            self._thread.name = 'coralogix-clock-sync'
+            self._thread.start()
+
+    def stop(self, timeout=None):
+        """
+        Stop background synchronization
+        :param timeout: Maximum seconds to wait for the thread (default: no wait)
+        :type timeout: float
+        """
+        self._stop.set()
+        thread = self._thread
+        if timeout is not None and thread is not None and self._process == os.getpid() and thread.is_alive():
+            thread.join(timeout)
+
+    def time_delta(self):
+        """
+        Difference between the server time and the local wall clock
+        :return: Milliseconds, 0 before the first synchronization
+        :rtype: float
+        """
+        offset = self.offset
+        if offset is None:
+            return 0
+        return offset + (time.monotonic() - time.time()) * 1000
+
+    def age(self):
+        """
+        Time since the last successful synchronization
+        :return: Seconds, None before the first synchronization
+        :rtype: float
+        """
+        synced = self._synced
+        return None if synced is None else time.monotonic() - synced
+
+    def sample(self):
+        """
+        Request the server time once and update the offset estimate
+        :return: False if the server did not answer with its time
+        :rtype: bool
+        """
+        started = time.monotonic()
+        server_time = self._fetch()
+        finished = time.monotonic()
+        if server_time is None:
+            return False
+        rtt = (finished - started) * 1000
+        # The server read its clock half of the round trip after the request was sent
+        offset = server_time - (started + finished) * 500
+        with self._lock:
+            if self.offset is None or abs(offset - self.offset) > self.step:
+                # First sample or the clocks diverged, smoothing would take too long
+                self._samples.clear()
+                self._samples.append((rtt, offset))
+                self.offset, self.rtt = offset, rtt
+            else:
+                self._samples.append((rtt, offset))
+                rtt, offset = min(self._samples)
+                self.offset += self.smoothing * (offset - self.offset)
+                self.rtt = rtt
+            self._synced = finished
+            self.last_update = time.time()
+        return True
+
+    def sync(self):
+        """
+        Synchronize with the server now, on the current thread
+        :return: False if no sample succeeded
+        :rtype: bool
+        """
+        # Loaded on use, so the clock imports without the handlers package and the manager
+        from .handlers.debug import DebugLogger
+        DebugLogger.info('Syncing time with Coralogix server...')
+        synced = False
+        for _ in range(self.burst):
+            try:
+                synced = self.sample() or synced
+            except Exception as exc:
+                DebugLogger.exception('Failed to sync time with Coralogix server', exc)
+                break
+        if synced:
+            DebugLogger.info('Updating time delta to: {} (round trip: {} ms)', self.time_delta(), self.rtt)
+            self.publish()
+        return synced
+
+    def publish(self):
+        """
+        Pass the current time delta to the update procedure
+        """
+        if self.offset is not None and self._on_update is not None:
+            self._on_update(self.time_delta())
+
+    def _run(self):
+        """
+        Background synchronization loop. Between synchronizations the delta is
+        republished, so steps of the local wall clock are followed.
+        """
+        from .handlers.debug import DebugLogger
+        stop = self._stop
+        due = time.monotonic()
+        while not stop.is_set():
+            try:
+                if time.monotonic() >= due:
+                    due = time.monotonic() + (self.interval if self.sync() else self.retry_interval)
+                else:
+                    self.publish()
+            except Exception as exc:
+                DebugLogger.exception('Exception from the clock sync loop:', exc)
+                due = time.monotonic() + self.retry_interval
+            stop.wait(max(min(self.check_interval, due - time.monotonic()), 0))
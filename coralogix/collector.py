@@ -0,0 +1,209 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""
+Coralogix Logger collector for pre-fork servers
+Author: Coralogix Ltd.
+Email: info@coralogix.com
+"""
+
+import os
+import time
+import socket
+from threading import Thread, Lock
+from .constants import Coralogix
+from .entry import LogEntry, HEADER
+
+# Unix domain sockets are not available on every platform, e.g. Windows
+AF_UNIX = getattr(socket, 'AF_UNIX', None)
+
+
+def is_supported():
+    """
+    Check if collector mode can be used on this platform
+    :return: Check result
+    :rtype: bool
+    """
+    return AF_UNIX is not None
+
+
+class CollectorServer(object):
+    """
+    Receives encoded log entries from worker processes over a Unix datagram socket.
+    Runs as a thread of the process which sends the logs, usually the pre-fork master.
+    """
+
+    def __init__(self, path, callback, mode=None):
+        """
+        Bind collector socket
+        :param path: Socket file path
+        :type path: str
+        :param callback: Procedure called with every received LogEntry
+        :type callback: callable
+        :param mode: Socket file permissions (default: Coralogix.COLLECTOR_SOCKET_MODE)
+        :type mode: int
+        """
+        if not is_supported():
+            raise RuntimeError('Collector mode requires Unix domain sockets')
+        self.path = path
+        self.received = 0
+        self._callback = callback
+        self._closed = False
+        self._process = os.getpid()
+        # A socket file left by a previous run would make bind() fail
+        if os.path.exists(path):
+            os.unlink(path)
+        self._socket = socket.socket(AF_UNIX, socket.SOCK_DGRAM)
+        try:
+            self._socket.setsockopt(
+                socket.SOL_SOCKET, socket.SO_RCVBUF, Coralogix.COLLECTOR_RECEIVE_BUFFER
+            )
+        except OSError:
+            pass
+        # The socket is bound under a temporary name and published once its permissions
+        # are restricted, so no other user can connect to it in between
+        temporary = '{}.{}.tmp'.format(path, os.getpid())
+        if os.path.exists(temporary):
+            os.unlink(temporary)
+        try:
+            self._socket.bind(temporary)
+            os.chmod(temporary, Coralogix.COLLECTOR_SOCKET_MODE if mode is None else mode)
+            os.rename(temporary, path)
+        except Exception:
+            self._socket.close()
+            if os.path.exists(temporary):
+                os.unlink(temporary)
+            raise
+        self._socket.settimeout(0.5)
+        self._thread = Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.name = 'coralogix-collector-thread'
+
+    def start(self):
+        """
+        Start receiving thread
+        """
+        self._thread.start()
+
+    def close(self):
+        """
+        Stop receiving and remove the socket file.
+        In a forked child only the inherited descriptor is closed.
+        """
+        self._closed = True
+        owner = self._process == os.getpid()
+        try:
+            self._socket.close()
+        except OSError:
+            pass
+        if owner:
+            if self._thread.is_alive():
+                self._thread.join(1)
+            try:
+                os.unlink(self.path)
+            except OSError:
+                pass
+
+    def _run(self):
+        """
+        Receiving thread loop
+        """
+        # Not imported at module level, the handlers package loads the collector via the manager
+        from .handlers.debug import DebugLogger
+        size = Coralogix.COLLECTOR_MAX_ENTRY_SIZE + HEADER.size
+        while not self._closed:
+            try:
+                data = self._socket.recv(size)
+            except socket.timeout:
+                continue
+            except OSError as exc:
+                if not self._closed:
+                    DebugLogger.exception('Collector failed to receive log entry', exc)
+                    time.sleep(0.1)
+                continue
+            if len(data) <= HEADER.size:
+                continue
+            try:
+                self.received += 1
+                self._callback(LogEntry.from_bytes(data))
+            except Exception as exc:
+                DebugLogger.exception('Collector failed to buffer log entry', exc)
+
+
+class CollectorClient(object):
+    """
+    Forwards encoded log entries of a worker process to the collector.
+    send() never blocks: when the collector is missing or busy it returns False
+    and the worker buffers the entry itself.
+    """
+
+    def __init__(self, path):
+        """
+        Initialize collector client, the socket is connected on the first send
+        :param path: Collector socket file path
+        :type path: str
+        """
+        self.path = path
+        self._socket = None
+        self._retry_at = 0
+        self._lock = Lock()
+
+    def _connect(self):
+        """
+        Connect to the collector socket, at most once per retry interval
+        :return: Connected socket or None
+        """
+        with self._lock:
+            if self._socket is not None:
+                return self._socket
+            if not is_supported() or time.time() < self._retry_at:
+                return None
+            sock = socket.socket(AF_UNIX, socket.SOCK_DGRAM)
+            try:
+                sock.setblocking(False)
+                sock.connect(self.path)
+            except OSError as exc:
+                sock.close()
+                self._retry_at = time.time() + Coralogix.COLLECTOR_RETRY_INTERVAL
+                from .handlers.debug import DebugLogger
+                DebugLogger.warning('Collector {} is unavailable, buffering logs locally: {}', self.path, exc)
+                return None
+            self._socket = sock
+            return sock
+
+    def send(self, entry):
+        """
+        Forward log entry to the collector
+        :param entry: Encoded log entry
+        :type entry: LogEntry
+        :return: True if the collector took the entry
+        :rtype: bool
+        """
+        if entry.size > Coralogix.COLLECTOR_MAX_ENTRY_SIZE:
+            return False
+        sock = self._socket or self._connect()
+        if sock is None:
+            return False
+        try:
+            sock.send(entry.to_bytes())
+            return True
+        except (BlockingIOError, InterruptedError):
+            # Collector queue is full, keep this entry locally
+            return False
+        except OSError:
+            # Collector is gone, reconnect after the retry interval
+            with self._lock:
+                if self._socket is sock:
+                    self._socket = None
+                    self._retry_at = time.time() + Coralogix.COLLECTOR_RETRY_INTERVAL
+            sock.close()
+            return False
+
+    def close(self):
+        """
+        Close collector socket
+        """
+        with self._lock:
+            if self._socket is not None:
+                self._socket.close()
+                self._socket = None
@@ -0,0 +1,79 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""
+Coralogix Logger payload compression
+Author: Coralogix Ltd.
+Email: info@coralogix.com
+"""
+
+import gzip
+import zlib
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Content-Encoding header values with default compression levels
+ENCODINGS = {
+    'gzip': 6,
+    'deflate': 6,
+    'zstd': 3,
+}
+
+
+def is_available(encoding):
+    """
+    Check if compression encoding can be used
+    :param encoding: Content-Encoding name
+    :type encoding: str
+    :return: Check result
+    :rtype: bool
+    """
+    if encoding == 'zstd':
+        return zstandard is not None
+    return encoding in ENCODINGS
+
+
+def compress(data, encoding, level=None):
+    """
+    Compress HTTP body
+    :param data: Raw body
+    :type data: bytes
+    :param encoding: Content-Encoding name (gzip, deflate or zstd)
+    :type encoding: str
+    :param level: Compression level (default: encoding specific)
+    :type level: int
+    :return: Compressed body
+    :rtype: bytes
+    """
+    level = ENCODINGS[encoding] if level is None else level
+    if encoding == 'gzip':
+        return gzip.compress(data, compresslevel=level)
+    if encoding == 'deflate':
+        return zlib.compress(data, level)
+    if encoding == 'zstd' and zstandard is not None:
+        return zstandard.ZstdCompressor(level=level).compress(data)
+    raise ValueError('Unsupported compression "{}"'.format(encoding))
+
+
+def decompress(data, encoding):
+    """
+    Decompress HTTP body
+    :param data: Compressed body
+    :type data: bytes
+    :param encoding: Content-Encoding name (gzip, deflate or zstd)
+    :type encoding: str
+    :return: Raw body
+    :rtype: bytes
+    """
+    if not encoding:
+        return data
+    if encoding == 'gzip':
+        return gzip.decompress(data)
+    if encoding == 'deflate':
+        return zlib.decompress(data)
+    if encoding == 'zstd' and zstandard is not None:
+        return zstandard.ZstdDecompressor().decompress(data)
+    raise ValueError('Unsupported compression "{}"'.format(encoding))
@@ -11,6 +11,23 @@ import os
 from enum import IntEnum
 
 
+def _env_seconds(name, default):
+    """
+    Read a number of seconds from an environment variable
+    :param name: Environment variable name
+    :type name: str
+    :param default: Seconds used when the variable is unset or not a non-negative number
+    :type default: float
+    :rtype: float
+    """
+    try:
+        value = float(os.environ[name])
+    except (KeyError, ValueError):
+        return default
+    # NaN fails the comparison as well
+    return value if 0 <= value < float('inf') else default
+
+
 class Coralogix(object):
     """
     Default constants for Coralogix Logger
@@ -40,15 +57,93 @@ class Coralogix(object):
     # Maximum log buffer size
     MAX_LOG_BUFFER_SIZE = 12 * 1024 ** 2  # 12mb
 
+    # Policy once the buffer is full: drop_newest, drop_oldest, drop_lowest_severity, block or expire
+    BACKPRESSURE_POLICY = 'drop_newest'
+
+    # Severities sent through the priority lane: they have a buffer budget of their own,
+    # go first into bulks and are sent right away. An empty tuple disables the lane.
+    PRIORITY_SEVERITIES = (Severity.ERROR, Severity.CRITICAL)
+
+    # Maximum size of the priority lane buffer, priority logs over it share the main buffer
+    PRIORITY_BUFFER_SIZE = 1024 ** 2  # 1mb
+
+    # Maximum seconds a caller waits for room in the buffer with the block policy
+    BACKPRESSURE_TIMEOUT = 1.0
+
+    # Age in seconds of buffered logs dropped with the expire policy
+    BACKPRESSURE_MAX_AGE = 300
+
+    # Number of buffer shards producer threads are spread over
+    BUFFER_SHARDS = 16
+
+    # Disk spill file for logs overflowing the buffer, None disables spilling
+    SPILL_PATH = None
+
+    # Maximum disk spill file size
+    MAX_SPILL_SIZE = 64 * 1024 ** 2  # 64mb
+
     # Maximum chunk size
     MAX_LOG_CHUNK_SIZE = 1.5 * 1024 ** 2  # 1.5 mb
 
+    # Buffer size which wakes the sending thread immediately
+    SEND_SIZE_THRESHOLD = MAX_LOG_CHUNK_SIZE / 2
+
+    # Maximum compressed chunk size. When set and compression is enabled,
+    # bulks are packed by the estimated compressed size instead of MAX_LOG_CHUNK_SIZE
+    MAX_LOG_WIRE_CHUNK_SIZE = None
+
+    # Collector socket of pre-fork workers, None sends logs from every process
+    COLLECTOR_PATH = None
+
+    # Maximum entry size forwarded to the collector, bigger entries are buffered locally
+    COLLECTOR_MAX_ENTRY_SIZE = 64 * 1024  # 64kb
+
+    # Permissions of the collector socket file, only processes allowed to write it can send logs
+    COLLECTOR_SOCKET_MODE = 0o600
+
+    # Receive buffer of the collector socket
+    COLLECTOR_RECEIVE_BUFFER = 4 * 1024 ** 2  # 4mb
+
+    # Interval between attempts to reach an unavailable collector
+    COLLECTOR_RETRY_INTERVAL = 5
+
+    # Maximum number of records waiting for the asyncio sending task
+    MAX_ASYNC_QUEUE_LENGTH = 100000
+
+    # Format records on the sending thread instead of the logging thread
+    DEFERRED_FORMATTING = False
+
+    # Maximum number of records waiting to be formatted on the sending thread
+    MAX_DEFERRED_QUEUE_LENGTH = 100000
+
+    # Number of records waiting to be formatted which wakes the sending thread
+    DEFERRED_DRAIN_BATCH = 1000
+
+    # Ingestion rate limits by category, Severity or (category, Severity) key.
+    # Values are records per second or (records per second, burst) tuples; None disables limiting.
+    RATE_LIMITS = None
+
+    # Interval in seconds between reports of records suppressed by the rate limits
+    RATE_LIMIT_SUMMARY_INTERVAL = 60
+
+    # Window in seconds in which repeats of a record are collapsed into one, None disables it
+    DEDUP_WINDOW = None
+
+    # Maximum number of distinct records tracked for repeats
+    DEDUP_MAX_KEYS = 10000
+
+    # Record fields which, besides text, severity and category, tell records apart
+    DEDUP_FIELDS = ('className', 'methodName')
+
     # Bulk send interval in normal mode
     NORMAL_SEND_SPEED_INTERVAL = 500.0 / 1000
 
-    # Bulk send interval in fast mode
+    # Bulk send interval in fast mode, also the retry interval while all sender threads are busy
     FAST_SEND_SPEED_INTERVAL = 100.0 / 1000
 
+    # Maximum time in seconds a log waits in the buffer before its bulk is sent
+    MAX_SEND_LATENCY = NORMAL_SEND_SPEED_INTERVAL
+
     # Legacy constants removed - use get_log_url(region) and get_time_delta_url(region) instead
     # Regions are now mandatory as per Coralogix endpoint deprecation (March 31, 2026)
     # Coralogix logs url
@@ -76,18 +171,79 @@ class Coralogix(object):
     # Default http timeout
     HTTP_TIMEOUT = 30
 
+    # Timeout of establishing a connection
+    HTTP_CONNECT_TIMEOUT = 5
+
+    # Timeout of waiting for the server response
+    HTTP_READ_TIMEOUT = HTTP_TIMEOUT
+
     # Number of attempts to retry http post
     HTTP_SEND_RETRY_COUNT = 5
 
-    # Interval between failed http post requests
+    # Interval after the first failed http post request, doubled after each next failure
     HTTP_SEND_RETRY_INTERVAL = 2
 
+    # Maximum interval between failed http post requests
+    HTTP_SEND_RETRY_MAX_INTERVAL = 60
+
+    # Consecutive failed http post requests which stop sending
+    CIRCUIT_BREAKER_THRESHOLD = 5
+
+    # Interval between probes of the endpoint while sending is stopped
+    CIRCUIT_BREAKER_RESET_TIMEOUT = 30
+
+    # HTTP body compression: None, 'gzip', 'deflate' or 'zstd' (requires zstandard package)
+    COMPRESSION = None
+
+    # Compression level, None for the compression default
+    COMPRESSION_LEVEL = None
+
+    # JSON encoder of log records: 'orjson', 'ujson' or 'json', None for the fastest installed one
+    JSON_ENCODER = None
+
+    # Number of threads sending bulks concurrently
+    SENDER_WORKERS = 1
+
+    # Maximum number of bulks sent or waiting for a sender thread
+    MAX_IN_FLIGHT_BULKS = 2
+
+    # Number of hosts to keep connection pools for
+    HTTP_POOL_CONNECTIONS = 2
+
+    # Maximum number of kept alive connections per host
+    HTTP_POOL_MAXSIZE = 4
+
     # Coralogix category
     CORALOGIX_CATEGORY = 'CORALOGIX'
 
+    # Maximum seconds flush() and close() wait for buffered logs to be sent
+    FLUSH_TIMEOUT = 30
+
+    # Seconds the exit and SIGTERM handlers have to send buffered logs, keep it below
+    # the grace period of the container runtime (10 seconds for docker stop)
+    SHUTDOWN_TIMEOUT = _env_seconds('CORALOGIX_SHUTDOWN_TIMEOUT', 8)
+
     # Sync time update interval
     SYNC_TIME_UPDATE_INTERVAL = 5  # minutes
 
+    # Seconds before a failed time sync is repeated
+    SYNC_TIME_RETRY_INTERVAL = 30
+
+    # Seconds between checks of the local wall clock, its steps are applied to the time delta
+    SYNC_TIME_CHECK_INTERVAL = 5
+
+    # Time requests of each sync
+    SYNC_TIME_BURST = 3
+
+    # Recent time samples the one with the shortest round trip is picked from
+    SYNC_TIME_SAMPLES = 8
+
+    # Weight of a new time offset estimate against the current one
+    SYNC_TIME_SMOOTHING = 0.25
+
+    # Offset error in milliseconds above which the time delta is replaced instead of smoothed
+    SYNC_TIME_STEP_THRESHOLD = 1000
+
     # Supported Coralogix regions
     REGIONS = {
         'AP1': 'ap1',
@@ -0,0 +1,115 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""
+Coralogix Logger duplicate records collapsing
+Author: Coralogix Ltd.
+Email: info@coralogix.com
+"""
+
+from collections import OrderedDict
+from threading import Lock
+
+
+class DuplicateWindow(object):
+    """
+    Repeats of a record within the dedup window
+    """
+
+    __slots__ = ('key', 'record', 'first', 'last', 'count')
+
+    def __init__(self, key, record, timestamp):
+        """
+        Open window at the first occurrence of a record
+        :param key: Record identity
+        :type key: tuple
+        :param record: Fields of the first occurrence, used to report the repeats
+        :type record: dict
+        :param timestamp: Epoch time of the first occurrence in seconds
+        :type timestamp: float
+        """
+        self.key = key
+        self.record = record
+        self.first = timestamp
+        self.last = timestamp
+        # Number of repeats after the first occurrence
+        self.count = 0
+
+
+class Deduplicator(object):
+    """
+    Keeps the first occurrence of a record and counts its repeats within a time window.
+    Windows are kept in LRU order, sharded by the record hash so producer threads
+    rarely share a lock; the number of windows is bounded.
+    """
+
+    def __init__(self, window, max_keys, shards=16):
+        """
+        Initialize deduplicator
+        :param window: Window length in seconds
+        :type window: float
+        :param max_keys: Maximum number of windows, the least recently repeated are evicted
+        :type max_keys: int
+        :param shards: Number of independently locked shards (default: 16)
+        :type shards: int
+        """
+        self.window = float(window)
+        self._shards = [(Lock(), OrderedDict()) for _ in range(max(int(shards), 1))]
+        self._max_keys = max(int(max_keys) // len(self._shards), 1)
+
+    def __len__(self):
+        return sum(len(windows) for _, windows in self._shards)
+
+    def add(self, key, timestamp, record):
+        """
+        Register occurrence of a record
+        :param key: Record identity, must be hashable
+        :type key: tuple
+        :param timestamp: Epoch time of the occurrence in seconds
+        :type timestamp: float
+        :param record: Fields of the occurrence
+        :type record: dict
+        :return: True if the record must be kept, and closed windows which have repeats to report
+        :rtype: tuple
+        """
+        lock, windows = self._shards[hash(key) % len(self._shards)]
+        closed = None
+        with lock:
+            window = windows.get(key)
+            if window is not None:
+                if timestamp - window.first <= self.window:
+                    window.count += 1
+                    window.last = timestamp
+                    windows.move_to_end(key)
+                    return False, ()
+                # The window is over, this occurrence opens a new one
+                del windows[key]
+                closed = [window]
+            windows[key] = DuplicateWindow(key, record, timestamp)
+            if len(windows) > self._max_keys:
+                _, evicted = windows.popitem(last=False)
+                closed = (closed or []) + [evicted]
+        return True, [window for window in closed or () if window.count]
+
+    def expire(self, now, force=False):
+        """
+        Close windows which saw no repeat for a whole window length
+        :param now: Current epoch time in seconds
+        :type now: float
+        :param force: Close all windows (default: False)
+        :type force: bool
+        :return: Closed windows which have repeats to report
+        :rtype: list
+        """
+        closed = []
+        for lock, windows in self._shards:
+            with lock:
+                while windows:
+                    key, window = next(iter(windows.items()))
+                    # Windows are ordered by the last repeat, the rest are more recent
+                    if not force and now - window.last <= self.window:
+                        break
+                    del windows[key]
+                    if window.count:
+                        closed.append(window)
+        return closed
@@ -0,0 +1,206 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""
+Coralogix Logger JSON encoder
+Author: Coralogix Ltd.
+Email: info@coralogix.com
+"""
+
+import json
+import uuid
+import decimal
+import datetime
+from enum import Enum
+from threading import Lock
+from .constants import Coralogix
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import ujson
+except ImportError:
+    ujson = None
+
+
+def _isoformat(value):
+    return value.isoformat()
+
+
+def _text(value):
+    return value.decode('utf8', 'replace')
+
+
+# Converters of common values which are not native JSON types, found by the value type
+# or its nearest base class; anything else is converted with str()
+CONVERTERS = (
+    (datetime.datetime, _isoformat),
+    (datetime.date, _isoformat),
+    (datetime.time, _isoformat),
+    (datetime.timedelta, lambda value: value.total_seconds()),
+    (decimal.Decimal, str),
+    (uuid.UUID, str),
+    (Enum, lambda value: value.value),
+    (bytes, _text),
+    (bytearray, _text),
+    (memoryview, lambda value: _text(value.tobytes())),
+    (set, list),
+    (frozenset, list),
+)
+
+_converters = dict(CONVERTERS)
+_converters_lock = Lock()
+
+
+def default(value):
+    """
+    Convert value which is not a native JSON type, the encoder never raises on it.
+    The converter is looked up once per type and cached.
+    :param value: Value to convert
+    :return: JSON serializable value
+    """
+    converter = _converters.get(type(value))
+    if converter is None:
+        converter = str
+        for base, base_converter in CONVERTERS:
+            if isinstance(value, base):
+                converter = base_converter
+                break
+        with _converters_lock:
+            _converters[type(value)] = converter
+    return converter(value)
+
+
+def _json_dumps(obj):
+    return json.dumps(obj, separators=(',', ':'), default=default).encode('utf8')
+
+
+def _orjson_dumps(obj):
+    return orjson.dumps(obj, default=default, option=orjson.OPT_NON_STR_KEYS)
+
+
+def _ujson_dumps(obj):
+    return ujson.dumps(obj, default=default, escape_forward_slashes=False).encode('utf8')
+
+
+def _ujson_supported():
+    """
+    Check if the installed ujson takes a default function (ujson 5.2+)
+    :rtype: bool
+    """
+    try:
+        return ujson is not None and _ujson_dumps({'value': decimal.Decimal(1)}) == b'{"value":"1"}'
+    except Exception:
+        return False
+
+
+# Encoders by name, in the order they are picked automatically
+ENCODERS = (
+    ('orjson', _orjson_dumps if orjson is not None else None),
+    ('ujson', _ujson_dumps if _ujson_supported() else None),
+    ('json', _json_dumps),
+)
+
+
+def is_available(name):
+    """
+    Check if JSON encoder can be used
+    :param name: Encoder name: orjson, ujson or json
+    :type name: str
+    :return: Check result
+    :rtype: bool
+    """
+    return dict(ENCODERS).get(name) is not None
+
+
+class Encoder(object):
+    """
+    JSON encoder of log records. Values the fast encoder cannot handle,
+    e.g. integers beyond 64 bits, are encoded by the standard library instead.
+    """
+
+    def __init__(self, name, encode):
+        """
+        Initialize encoder
+        :param name: Encoder name
+        :type name: str
+        :param encode: Function encoding an object to JSON bytes
+        :type encode: callable
+        """
+        self.name = name
+        self._encode = encode
+
+    def dumps(self, obj):
+        """
+        Encode object to compact JSON
+        :param obj: Object to encode
+        :return: UTF-8 encoded JSON
+        :rtype: bytes
+        """
+        try:
+            return self._encode(obj)
+        except (TypeError, ValueError, OverflowError):
+            if self._encode is _json_dumps:
+                raise
+            return _json_dumps(obj)
+
+
+def set_encoder(encoder=None):
+    """
+    Select JSON encoder of log records
+    :param encoder: Encoder name: orjson, ujson or json, or a function encoding an object
+                    to JSON bytes or str (default: Coralogix.JSON_ENCODER, the fastest installed one)
+    :type encoder: str or callable
+    :return: Selected encoder
+    :rtype: Encoder
+    """
+    global _encoder
+    encoder = encoder or Coralogix.JSON_ENCODER
+    if callable(encoder):
+        def encode(obj):
+            data = encoder(obj)
+            return data.encode('utf8') if isinstance(data, str) else data
+        _encoder = Encoder(getattr(encoder, '__name__', 'custom'), encode)
+        return _encoder
+    available = [(name, encode) for name, encode in ENCODERS if encode is not None]
+    if encoder:
+        name = encoder.lower()
+        if name not in dict(ENCODERS):
+            raise ValueError(
+                'Invalid JSON encoder "{}". Supported encoders: {}'.format(
+                    encoder, ', '.join(name for name, _ in ENCODERS)
+                )
+            )
+        if not is_available(name):
+            # Imported here, the encoder is loaded before the handlers package
+            from .handlers.debug import DebugLogger
+            DebugLogger.warning('JSON encoder "{}" is not installed, falling back to {}', name, available[0][0])
+        else:
+            available = [(name, dict(ENCODERS)[name])]
+    _encoder = Encoder(*available[0])
+    return _encoder
+
+
+def get_encoder():
+    """
+    Get JSON encoder of log records
+    :rtype: Encoder
+    """
+    return _encoder
+
+
+def dumps(obj):
+    """
+    Encode object to compact JSON with the selected encoder
+    :param obj: Object to encode
+    :return: UTF-8 encoded JSON
+    :rtype: bytes
+    """
+    return _encoder.dumps(obj)
+
+
+_encoder = None
+set_encoder()
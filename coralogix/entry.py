@@ -0,0 +1,137 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""
+Coralogix Logger pre-encoded log entry
+Author: Coralogix Ltd.
+Email: info@coralogix.com
+"""
+
+import json
+import struct
+from .encoder import dumps
+
+# Binary header of an entry passed between processes or stored on disk: severity, timestamp
+HEADER = struct.Struct('<Bd')
+
+
+class LogEntry(object):
+    """
+    Log record which is serialized exactly once, when it is added to the buffer.
+    The encoded bytes are reused for size accounting, chunk planning and the HTTP body.
+    """
+
+    __slots__ = ('payload', 'size', 'severity', 'timestamp')
+
+    def __init__(self, payload, severity, timestamp):
+        """
+        Initialize log entry
+        :param payload: UTF-8 encoded JSON object of the log record
+        :type payload: bytes
+        :param severity: Log record severity(level)
+        :type severity: int
+        :param timestamp: Log record timestamp in milliseconds
+        :type timestamp: float
+        """
+        self.payload = payload
+        self.size = len(payload)
+        self.severity = severity
+        self.timestamp = timestamp
+
+    @classmethod
+    def from_dict(cls, entry):
+        """
+        Encode log record dictionary
+        :param entry: Log record fields
+        :type entry: dict
+        :return: Encoded log entry
+        :rtype: LogEntry
+        """
+        return cls(
+            dumps(entry),
+            entry.get('severity'),
+            entry.get('timestamp')
+        )
+
+    def to_bytes(self):
+        """
+        Serialize log entry with its metadata, for the disk spill or the collector socket
+        :return: Binary entry
+        :rtype: bytes
+        """
+        return HEADER.pack(self.severity or 0, self.timestamp or 0) + self.payload
+
+    @classmethod
+    def from_bytes(cls, data):
+        """
+        Restore log entry serialized with to_bytes()
+        :param data: Binary entry
+        :type data: bytes
+        :return: Log entry
+        :rtype: LogEntry
+        """
+        severity, timestamp = HEADER.unpack_from(data)
+        return cls(bytes(data[HEADER.size:]), severity or None, timestamp)
+
+    def to_dict(self):
+        """
+        Decode log entry back to dictionary
+        :return: Log record fields
+        :rtype: dict
+        """
+        return json.loads(self.payload.decode('utf8'))
+
+    @staticmethod
+    def bulk_size(entries):
+        """
+        Size of JSON array built from encoded entries
+        :param entries: Encoded log entries
+        :type entries: list
+        :return: Size in bytes
+        :rtype: int
+        """
+        if not entries:
+            return 2
+        return sum(entry.size for entry in entries) + len(entries) + 1
+
+    @staticmethod
+    def join(entries, common=None):
+        """
+        Build JSON array from encoded entries
+        :param entries: Encoded log entries
+        :type entries: list
+        :param common: Fields which should be merged into every entry (default: None)
+        :type common: dict
+        :return: UTF-8 encoded JSON array
+        :rtype: bytes
+        """
+        if not common:
+            return b'[' + b','.join(entry.payload for entry in entries) + b']'
+        # Entry fields must override the common ones, so common fields go first
+        encoded = dumps(common)
+        prefix = encoded[:-1] + b','
+        # An entry which may set a common field itself is decoded to leave that field out
+        markers = tuple(dumps(key) for key in common)
+        return b'[' + b','.join(
+            LogEntry._merge(entry, common) if any(marker in entry.payload for marker in markers)
+            else prefix + entry.payload[1:] if entry.size > 2 else encoded
+            for entry in entries
+        ) + b']'
+
+    @staticmethod
+    def _merge(entry, common):
+        """
+        Merge common fields which are not set by the entry itself
+        :param entry: Encoded log entry
+        :type entry: LogEntry
+        :param common: Fields which should be merged into the entry
+        :type common: dict
+        :return: UTF-8 encoded JSON object
+        :rtype: bytes
+        """
+        own = entry.to_dict()
+        missing = dict((key, value) for key, value in common.items() if key not in own)
+        if not missing:
+            return entry.payload
+        encoded = dumps(missing)
+        return encoded[:-1] + b',' + entry.payload[1:] if entry.size > 2 else encoded
@@ -0,0 +1,359 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""
+Coralogix Logger asyncio handler
+Author: Coralogix Ltd.
+Email: info@coralogix.com
+"""
+
+import socket
+import asyncio
+from collections import deque
+from logging import Handler, LogRecord
+from ..constants import Coralogix
+from ..buffer import LogBuffer
+from ..manager import LoggerManager
+from ..http import CoralogixHTTPSender
+from ..retry import backoff, is_retryable
+from ..stats import PipelineStats, DROP_BUFFER_FULL, DROP_TOO_BIG
+from .debug import DebugLogger
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+
+class AsyncCoralogixLogger(Handler):
+    """
+    Coralogix logger for asyncio applications (Python 3.7+).
+    emit() only appends the record to a queue, records are encoded and sent
+    by a task running on the event loop, so logging never waits on a lock or a thread.
+    Bulks are sent with aiohttp when it is installed, otherwise on the default executor.
+    """
+
+    def __init__(self, private_key=None, app_name=None, subsystem=None,
+                 category=None, region=None):
+        """
+        Initialize asyncio Coralogix Logger
+        :param private_key: Private key for Coralogix
+        :type private_key: str
+        :param app_name: User application name
+        :type app_name: str
+        :param subsystem: Name of subsystem name(frontend, backend, etc.)
+        :type subsystem: str
+        :param category: Log record category
+        :type category: str
+        :param region: Coralogix region (AP1, AP2, AP3, EU1, EU2, US1, US2)
+        :type region: str
+        """
+        Handler.__init__(self)
+        self._category = category if category is not None else Coralogix.CORALOGIX_CATEGORY
+        self._bulk_template = {
+            'privateKey': private_key if private_key and not private_key.isspace()
+            else Coralogix.FAILED_PRIVATE_KEY,
+            'applicationName': app_name if app_name and not app_name.isspace()
+            else Coralogix.NO_APP_NAME,
+            'subsystemName': subsystem if subsystem and not subsystem.isspace()
+            else Coralogix.NO_SUB_SYSTEM,
+            'computerName': socket.gethostname().strip(),
+        }
+        self._url = Coralogix.get_log_url(region.upper() if region else None)
+        self._queue = deque()
+        self._buffer = LogBuffer()
+        self._task = None
+        self._loop = None
+        # Set while the sending task sends, so closing waits for the bulk instead of losing it
+        self._sending = False
+        self._session = None
+        # Own connections and circuit breaker, the handler does not share the manager ones
+        self._sender = CoralogixHTTPSender()
+        self._closed = False
+        self._stats = PipelineStats()
+
+    def handle(self, record):
+        """
+        Emit record if it passes the filters. The handler lock is not taken:
+        emit() only appends to a deque, which is thread safe on its own.
+        :param record: Log record object
+        :type record: LogRecord
+        :return: Filtering result
+        """
+        rv = self.filter(record)
+        if isinstance(rv, LogRecord):
+            record = rv
+        if rv:
+            self.emit(record)
+        return rv
+
+    def emit(self, record):
+        """
+        Queue log record
+        :param record: Log record object
+        :type record: LogRecord
+        """
+        try:
+            if len(self._queue) >= Coralogix.MAX_ASYNC_QUEUE_LENGTH:
+                self._stats.drop(DROP_BUFFER_FULL)
+                return
+            self._queue.append((
+                record.levelno,
+                self.format(record),
+                record.name,
+                record.module,
+                record.funcName,
+                record.thread,
+                record.created
+            ))
+            task = self._task
+            # The task ends with its event loop, a new loop gets a new task
+            if task is None or task.done():
+                self.start()
+        except Exception:
+            self.handleError(record)
+
+    def start(self):
+        """
+        Start the sending task on the running event loop
+        :return: True if the task is running
+        :rtype: bool
+        """
+        if self._task is not None and not self._task.done():
+            return True
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # Not in the event loop thread, the task is started by the next call from the loop
+            return False
+        self._closed = False
+        self._loop = loop
+        self._task = loop.create_task(self._run())
+        return True
+
+    def flush(self):
+        """
+        Schedule sending of queued records on the event loop, without waiting for them.
+        Await aflush() to wait until they are sent.
+        """
+        loop = self._loop
+        if loop is None or loop.is_closed() or not loop.is_running() or \
+                not (self._queue or len(self._buffer)):
+            return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            loop.create_task(self.aflush())
+        else:
+            asyncio.run_coroutine_threadsafe(self.aflush(), loop)
+
+    async def aflush(self):
+        """
+        Send all queued records. Await it on application shutdown, e.g. in ASGI lifespan.
+        """
+        await self._send_pending()
+
+    async def aclose(self):
+        """
+        Stop the sending task, flush queued records and close HTTP connections.
+        A bulk the task is sending is sent to the end, it is not cancelled.
+        """
+        self._closed = True
+        task = self._task
+        if task is not None and task is not asyncio.current_task() and not task.done():
+            if self._sending:
+                # The task loop ends once the bulk is sent
+                try:
+                    await task
+                except Exception as exc:
+                    DebugLogger.exception('Exception from the asyncio sending task:', exc)
+            else:
+                task.cancel()
+        self._task = None
+        await self.aflush()
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+        Handler.close(self)
+
+    def close(self):
+        """
+        Stop the sending task. Records which were not flushed with aclose() are lost.
+        """
+        self._closed = True
+        if self._task is not None and not self._task.done():
+            try:
+                self._task.cancel()
+            except RuntimeError:
+                pass
+        self._task = None
+        Handler.close(self)
+
+    async def _run(self):
+        """
+        Sending task loop
+        """
+        while not self._closed:
+            if self._buffer.size > (Coralogix.MAX_LOG_CHUNK_SIZE / 2):
+                await asyncio.sleep(Coralogix.FAST_SEND_SPEED_INTERVAL)
+            else:
+                await asyncio.sleep(Coralogix.NORMAL_SEND_SPEED_INTERVAL)
+            self._sending = True
+            try:
+                sent = await self._send_pending()
+            except Exception as exc:
+                sent = True
+                DebugLogger.exception('Exception from the asyncio sending task:', exc)
+            finally:
+                self._sending = False
+            if not sent:
+                # Wait until the breaker lets a probe through, or for the probe in flight
+                wait = self._sender.circuit_breaker.retry_in()
+                await asyncio.sleep(max(wait or 0, Coralogix.NORMAL_SEND_SPEED_INTERVAL))
+
+    def stats(self):
+        """
+        Statistics of the handler
+        :return: Counters and gauges, see LoggerManager.stats()
+        :rtype: dict
+        """
+        stats = self._stats.snapshot()
+        stats['buffer_bytes'] = self._buffer.size
+        stats['buffer_records'] = len(self._buffer) + len(self._queue)
+        return stats
+
+    async def _drain(self):
+        """
+        Move queued records to the buffer, encoding them on the way
+        """
+        count = 0
+        while self._queue:
+            levelno, message, name, module, func_name, thread, created = self._queue.popleft()
+            if self._buffer.size >= Coralogix.MAX_LOG_BUFFER_SIZE:
+                self._stats.drop(DROP_BUFFER_FULL)
+                continue
+            entry = LoggerManager._create_entry(
+                message,
+                Coralogix.map_severity(levelno),
+                name or self._category,
+                created=created,
+                className=module,
+                methodName=func_name,
+                threadId=str(thread)
+            )
+            if entry is not None:
+                self._buffer.append(entry)
+            else:
+                self._stats.drop(DROP_TOO_BIG)
+            count += 1
+            # Let other coroutines run while a big backlog is encoded
+            if count % 1000 == 0:
+                await asyncio.sleep(0)
+
+    async def _send_pending(self):
+        """
+        Send all buffered records in bulks. Records stay in the buffer while
+        the circuit breaker is open.
+        :return: False if sending stopped at an open circuit breaker
+        :rtype: bool
+        """
+        await self._drain()
+        while len(self._buffer):
+            entries = self._buffer.take(self._buffer.plan(Coralogix.MAX_LOG_CHUNK_SIZE))
+            if not await self._send(dict(self._bulk_template, logEntries=entries)):
+                # Older records go first once Coralogix is reachable again
+                self._buffer.put_back(entries)
+                return False
+        return True
+
+    def _get_session(self):
+        """
+        Get aiohttp session which keeps connections to Coralogix alive
+        :return: HTTP session
+        :rtype: aiohttp.ClientSession
+        """
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=Coralogix.HTTP_POOL_MAXSIZE),
+                headers={'User-Agent': CoralogixHTTPSender._get_user_agent()}
+            )
+        return self._session
+
+    def _post(self, body, headers):
+        """
+        Blocking HTTP POST used when aiohttp is not installed
+        :return: HTTP status code
+        :rtype: int
+        """
+        response = self._sender._get_session().post(
+            url=self._url,
+            timeout=self._sender._get_timeout(),
+            data=body,
+            headers=headers
+        )
+        return response.status_code
+
+    async def _send(self, bulk):
+        """
+        Send bulk to Coralogix, retrying without blocking the event loop
+        :param bulk: Bulk with logs records
+        :type bulk: dict
+        :return: False if the circuit breaker stopped sending before the retries were used up
+        :rtype: bool
+        """
+        body, headers = self._sender._build_request(bulk)
+        records = len(bulk['logEntries'])
+        breaker = self._sender.circuit_breaker
+        for attempt in range(1, Coralogix.HTTP_SEND_RETRY_COUNT + 2):
+            if not breaker.allow():
+                DebugLogger.error('Coralogix server is unreachable, circuit breaker is open')
+                return False
+            if attempt > 1:
+                self._stats.retry()
+            try:
+                DebugLogger.info('About to send bulk to Coralogix server. Attempt number: {0:d}', attempt)
+                if aiohttp is not None:
+                    async with self._get_session().post(
+                        self._url,
+                        data=body,
+                        headers=headers,
+                        timeout=aiohttp.ClientTimeout(
+                            sock_connect=Coralogix.HTTP_CONNECT_TIMEOUT,
+                            sock_read=Coralogix.HTTP_READ_TIMEOUT
+                        )
+                    ) as response:
+                        await response.read()
+                        status = response.status
+                else:
+                    status = await asyncio.get_running_loop().run_in_executor(
+                        None, self._post, body, headers
+                    )
+                if not is_retryable(status):
+                    breaker.record_success()
+                    if status < 400:
+                        DebugLogger.info('Successfully sent bulk to Coralogix server. Result is: {0:d}', status)
+                        self._stats.batch_sent(records, len(body))
+                    else:
+                        DebugLogger.error('Coralogix server rejected bulk. Result is: {0:d}', status)
+                        self._stats.batch_failed(records)
+                    return True
+                DebugLogger.error('Coralogix server is unavailable. Result is: {0:d}', status)
+            except asyncio.CancelledError:
+                # The breaker is shared with the other senders, a cancelled probe
+                # must not leave it half open
+                breaker.record_failure()
+                raise
+            except Exception as exc:
+                DebugLogger.exception('Failed to send HTTP POST request', exc)
+            breaker.record_failure()
+            if attempt > Coralogix.HTTP_SEND_RETRY_COUNT:
+                break
+            if not breaker.ready():
+                return False
+            delay = backoff(attempt)
+            DebugLogger.error('Failed to send bulk. Will retry in: {0:.2f} seconds...', delay)
+            await asyncio.sleep(delay)
+        self._stats.batch_failed(records)
+        return True
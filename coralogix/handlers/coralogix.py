@@ -8,12 +8,16 @@ Email: info@coralogix.com
 """
 
 from __future__ import print_function
-from logging import Handler
+import copy
+from logging import Handler, LogRecord, Formatter
 from threading import current_thread
 from ..constants import Coralogix
 from ..manager import LoggerManager
 from .debug import DebugLogger
 
+# Formatter of handlers without one, as in logging.Handler.format()
+_default_formatter = Formatter()
+
 
 class CoralogixLogger(Handler):
     """
@@ -22,7 +26,8 @@ class CoralogixLogger(Handler):
     """
 
     def __init__(self, private_key=None, app_name=None, subsystem=None,
-                 category=None, sync_time=False, region=None):
+                 category=None, sync_time=False, region=None, warm_up=False, compression=None,
+                 spill_path=None, deferred=None, manager=None):
         """
         Initialize Coralogix Logger
         :param private_key: Private key for Coralogix
@@ -37,9 +42,22 @@ class CoralogixLogger(Handler):
         :type sync_time: bool
         :param region: Coralogix region (AP1, AP2, AP3, EU1, EU2, US1, US2)
         :type region: str
+        :param warm_up: Open connection to Coralogix before the first bulk (default: False)
+        :type warm_up: bool
+        :param compression: HTTP body compression: gzip, deflate or zstd (default: None)
+        :type compression: str
+        :param spill_path: File which keeps logs overflowing the buffer (default: None)
+        :type spill_path: str
+        :param deferred: Format records on the sending thread (default: Coralogix.DEFERRED_FORMATTING)
+        :type deferred: bool
+        :param manager: Logger Manager which buffers and sends the logs (default: LoggerManager)
+        :type manager: LoggerManager
         """
-        self.configure(private_key, app_name, subsystem, sync_time, region)
+        self._manager = manager if manager is not None else LoggerManager
+        self.configure(private_key, app_name, subsystem, sync_time, region, warm_up, compression,
+                       spill_path, self._manager)
         self._category = category if category is not None else Coralogix.CORALOGIX_CATEGORY
+        self._deferred = Coralogix.DEFERRED_FORMATTING if deferred is None else bool(deferred)
         Handler.__init__(self)
 
     @classmethod
@@ -54,12 +72,33 @@ class CoralogixLogger(Handler):
         DebugLogger.debug_mode = debug_mode
         return DebugLogger.debug_mode
 
+    def handle(self, record):
+        """
+        Emit record if it passes the filters. In deferred mode the handler lock is not taken:
+        emit() only appends to a deque, which is thread safe on its own.
+        :param record: Log record object
+        :type record: LogRecord
+        :return: Filtering result
+        """
+        if not self._deferred:
+            return Handler.handle(self, record)
+        rv = self.filter(record)
+        if isinstance(rv, LogRecord):
+            record = rv
+        if rv:
+            self.emit(record)
+        return rv
+
     def emit(self, record):
         """
         Send log record
         :param record: Log record object
         :type record: LogRecord
         """
+        if self._deferred:
+            # The record is formatted by the sending thread from a snapshot taken by prepare()
+            self._manager.add_record(self, record)
+            return
         self.log(
             Coralogix.map_severity(record.levelno),
             self.format(record),
@@ -69,8 +108,28 @@ class CoralogixLogger(Handler):
             record.thread
         )
 
+    def prepare(self, record):
+        """
+        Snapshot log record which is formatted later on the sending thread, like
+        QueueHandler.prepare(). The message is merged with its arguments and the exception
+        is rendered to text now, so changes the caller makes afterwards do not reach the log.
+        :param record: Log record object
+        :type record: LogRecord
+        :return: Copy of the record without arguments and exception info
+        :rtype: LogRecord
+        """
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            if not record.exc_text:
+                record.exc_text = (self.formatter or _default_formatter).formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
     @classmethod
-    def configure(cls, private_key, app_name, sub_system, sync_time=False, region=None):
+    def configure(cls, private_key, app_name, sub_system, sync_time=False, region=None,
+                  warm_up=False, compression=None, spill_path=None, manager=None):
         """
         Configure Coralogix logger with customer specific values
         :param private_key: Coralogix account private key
@@ -83,8 +142,17 @@ class CoralogixLogger(Handler):
         :type sync_time: bool
         :param region: Coralogix region (AP1, AP2, AP3, EU1, EU2, US1, US2)
         :type region: str
+        :param warm_up: Open connection to Coralogix before the first bulk (default: False)
+        :type warm_up: bool
+        :param compression: HTTP body compression: gzip, deflate or zstd (default: None)
+        :type compression: str
+        :param spill_path: File which keeps logs overflowing the buffer (default: None)
+        :type spill_path: str
+        :param manager: Logger Manager to configure (default: LoggerManager)
+        :type manager: LoggerManager
         """
-        if not LoggerManager.configured:
+        manager = manager if manager is not None else LoggerManager
+        if not manager.configured:
             private_key = private_key if private_key and not private_key.isspace() \
                 else Coralogix.FAILED_PRIVATE_KEY
             app_name = app_name if app_name and not app_name.isspace() \
@@ -92,12 +160,15 @@ class CoralogixLogger(Handler):
             sub_system = sub_system if sub_system and not sub_system.isspace() \
                 else Coralogix.NO_SUB_SYSTEM
 
-            LoggerManager.configure(
+            manager.configure(
                 sync_time=sync_time,
                 privateKey=private_key,
                 applicationName=app_name,
                 subsystemName=sub_system,
-                region=region
+                region=region,
+                warm_up=warm_up,
+                compression=compression or Coralogix.COMPRESSION,
+                spill_path=spill_path
             )
 
     @classmethod
@@ -133,7 +204,7 @@ class CoralogixLogger(Handler):
         category = category if category else self._category
         thread_id = str(thread_id)
         thread_id = thread_id if thread_id and (not thread_id.isspace()) else current_thread().ident
-        LoggerManager.add_logline(
+        self._manager.add_logline(
             message,
             severity,
             category,
@@ -176,7 +247,7 @@ class CoralogixLogger(Handler):
 
             return wrapper
         else:
-            DebugLogger.error('Invalid severity name "{0:s}"!'.format(severity.lower()))
+            DebugLogger.error('Invalid severity name "{0:s}"!', severity.lower())
             raise AttributeError('Severity name is invalid!')
 
     @staticmethod
@@ -9,87 +9,219 @@ Email: info@coralogix.com
 
 from __future__ import print_function
 import sys
+import time
 import datetime
 import traceback
+from collections import deque
+from threading import Lock
+
+# Levels of debug messages by name
+LEVELS = {'DEBUG': 10, 'INFO': 20, 'WARNING': 30, 'ERROR': 40}
+
+# Levels whose repeated messages are rate limited
+REPEAT_LIMITED_LEVEL = LEVELS['WARNING']
+
+# Maximum number of distinct rate limited messages remembered
+MAX_REPEAT_KEYS = 1000
 
 
 class DebugLogger(object):
     """
-    A private class to print debugging messages from CoralogixLogger
+    A private class to print debugging messages from CoralogixLogger.
+    Messages take str.format() arguments, which are only formatted when the message
+    is written, so disabled messages cost a single check.
     """
 
     debug_mode = False
 
+    # Minimum level of written messages
+    level = LEVELS['DEBUG']
+
+    # Seconds a repeated warning or error is not written again, 0 writes every one
+    repeat_interval = 60
+
+    # Set when messages are kept in memory or written to a file besides stdout
+    _sinks = False
+    _recent = None
+    _file = None
+    # Rate limited messages: key -> [last written time, suppressed count]
+    _repeats = {}
+    _lock = Lock()
+
+    @classmethod
+    def configure(cls, level=None, recent=None, path=None, repeat_interval=None):
+        """
+        Configure debug messages output. Memory and file outputs work without debug mode,
+        stdout is written in debug mode only.
+        :param level: Minimum level of written messages: DEBUG, INFO, WARNING or ERROR (default: unchanged)
+        :type level: str
+        :param recent: Number of recent messages kept in memory, 0 keeps none (default: unchanged)
+        :type recent: int
+        :param path: File messages are appended to, empty string closes it (default: unchanged)
+        :type path: str
+        :param repeat_interval: Seconds a repeated warning or error is not written again (default: unchanged)
+        :type repeat_interval: float
+        """
+        with cls._lock:
+            if level is not None:
+                cls.level = LEVELS[level.upper()] if isinstance(level, str) else int(level)
+            if recent is not None:
+                cls._recent = deque(cls._recent or (), maxlen=recent) if recent > 0 else None
+            if path is not None:
+                if cls._file is not None:
+                    cls._file.close()
+                # Line buffered, so messages are on disk if the process dies
+                cls._file = open(path, 'a', buffering=1) if path else None
+            if repeat_interval is not None:
+                cls.repeat_interval = repeat_interval
+                cls._repeats = {}
+            cls._sinks = cls._recent is not None or cls._file is not None
+
     @classmethod
-    def log(cls, level, message, exception=None):
+    def enabled(cls, level='DEBUG'):
+        """
+        Check if messages of a level are written, to skip building expensive arguments
+        :param level: Level name
+        :type level: str
+        :rtype: bool
+        """
+        return (cls.debug_mode or cls._sinks) and LEVELS[level] >= cls.level
+
+    @classmethod
+    def recent(cls):
+        """
+        Recent messages kept in memory
+        :return: Written lines, the oldest first
+        :rtype: list
+        """
+        return list(cls._recent or ())
+
+    @classmethod
+    def log(cls, level, message, *args, **kwargs):
         """
         Logs a message with level on this logger
         :param level: Level of the log record
         :type level: str
-        :param message: Log record content
+        :param message: Log record content, a str.format() template if there are arguments
         :type message: str
+        :param args: Arguments of the template
         :param exception: Some exception which logs
         :type exception: Exception
         """
-        if not cls.debug_mode:
+        if not (cls.debug_mode or cls._sinks) or LEVELS.get(level, LEVELS['ERROR']) < cls.level:
             return
+        exception = kwargs.get('exception')
         try:
+            suppressed = cls._suppressed(level, message, exception)
+            if suppressed is None:
+                return
+            if args:
+                message = message.format(*args)
+            line = '{0:s} - [{1:s}]\t-\t{2:s}'.format(
+                datetime.datetime.utcnow().strftime('%d-%m-%Y %H:%M:%S.%f'),
+                level,
+                message
+            )
+            if suppressed:
+                line += ' ({0:d} similar messages suppressed)'.format(suppressed)
             if exception:
-                print(
-                    '{0:s} - [{1:s}]\t-\t{2:s}\nEXCEPTION: {3}'.format(
-                        datetime.datetime.utcnow().strftime('%d-%m-%Y %H:%M:%S.%f'),
-                        level,
-                        message,
-                        exception
-                    )
-                )
-                traceback.print_exc(file=sys.stdout)
-            else:
-                print(
-                    '{0:s} - [{1:s}]\t-\t{2:s}'.format(
-                        datetime.datetime.utcnow().strftime('%d-%m-%Y %H:%M:%S.%f'),
-                        level,
-                        message
-                    )
-                )
+                line += '\nEXCEPTION: {0}'.format(exception)
+            cls._write(line, exception is not None)
         except Exception as exc:
             print('Failed to print log: {0}'.format(exc))
 
     @classmethod
-    def debug(cls, message):
+    def _suppressed(cls, level, message, exception):
+        """
+        Rate limit repeated warnings and errors
+        :return: Number of repeats suppressed since the message was last written,
+                 None if this one is suppressed too
+        :rtype: int
+        """
+        if not cls.repeat_interval or LEVELS.get(level, LEVELS['ERROR']) < REPEAT_LIMITED_LEVEL:
+            return 0
+        # The template is the key, so repeats with other arguments count as the same message
+        key = (level, message, type(exception))
+        now = time.monotonic()
+        with cls._lock:
+            repeat = cls._repeats.get(key)
+            if repeat is None:
+                if len(cls._repeats) >= MAX_REPEAT_KEYS:
+                    cls._repeats.clear()
+                cls._repeats[key] = [now, 0]
+                return 0
+            if now - repeat[0] < cls.repeat_interval:
+                repeat[1] += 1
+                return None
+            suppressed, repeat[0], repeat[1] = repeat[1], now, 0
+            return suppressed
+
+    @classmethod
+    def _write(cls, line, with_traceback=False):
+        """
+        Write a formatted message to the enabled outputs
+        :param line: Formatted message
+        :type line: str
+        :param with_traceback: Append the traceback of the exception being handled
+        :type with_traceback: bool
+        """
+        if cls.debug_mode:
+            print(line)
+            if with_traceback:
+                traceback.print_exc(file=sys.stdout)
+        if cls._sinks:
+            if with_traceback:
+                line += '\n' + traceback.format_exc().rstrip('\n')
+            recent, output = cls._recent, cls._file
+            if recent is not None:
+                recent.append(line)
+            if output is not None:
+                with cls._lock:
+                    output.write(line + '\n')
+
+    @classmethod
+    def debug(cls, message, *args):
         """
         Logs a message with level DEBUG on this logger
-        :param message: Log record content
+        :param message: Log record content, a str.format() template if there are arguments
         :type message: str
+        :param args: Arguments of the template
         """
-        cls.log('DEBUG', message)
+        if cls.debug_mode or cls._sinks:
+            cls.log('DEBUG', message, *args)
 
     @classmethod
-    def info(cls, message):
+    def info(cls, message, *args):
         """
         Logs a message with level INFO on this logger
-        :param message: Log record content
+        :param message: Log record content, a str.format() template if there are arguments
         :type message: str
+        :param args: Arguments of the template
         """
-        cls.log('INFO', message)
+        if cls.debug_mode or cls._sinks:
+            cls.log('INFO', message, *args)
 
     @classmethod
-    def warning(cls, message):
+    def warning(cls, message, *args):
         """
         Logs a message with level WARNING on this logger
-        :param message: Log record content
+        :param message: Log record content, a str.format() template if there are arguments
         :type message: str
+        :param args: Arguments of the template
         """
-        cls.log('WARNING', message)
+        if cls.debug_mode or cls._sinks:
+            cls.log('WARNING', message, *args)
 
     @classmethod
-    def error(cls, message):
+    def error(cls, message, *args):
         """
         Logs a message with level ERROR on this logger
-        :param message: Log record content
+        :param message: Log record content, a str.format() template if there are arguments
         :type message: str
+        :param args: Arguments of the template
         """
-        cls.log('ERROR', message)
+        if cls.debug_mode or cls._sinks:
+            cls.log('ERROR', message, *args)
 
     @classmethod
     def exception(cls, message, exception=None):
@@ -100,4 +232,5 @@ class DebugLogger(object):
         :param exception: Exception instance
         :type exception: Exception
         """
-        cls.log('ERROR', message, exception=exception)
+        if cls.debug_mode or cls._sinks:
+            cls.log('ERROR', message, exception=exception)
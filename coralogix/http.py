@@ -9,21 +9,95 @@ Email: info@coralogix.com
 
 from __future__ import print_function
 from threading import Lock
+from types import MethodType
+import os
 import time
 import sys
 import requests
+from requests.adapters import HTTPAdapter
 from .constants import Coralogix
+from .entry import LogEntry
+from .compression import ENCODINGS as COMPRESSIONS, compress, is_available
+from .retry import CircuitBreaker, backoff, is_retryable
 from .handlers.debug import DebugLogger
 from . import __version__
 
 
+class BulkRequest(object):
+    """
+    HTTP body and headers of a bulk. The bulk is encoded and compressed once,
+    every attempt to send it reuses the same bytes.
+    """
+
+    __slots__ = ('body', 'headers', 'records')
+
+    def __init__(self, body, headers, records):
+        """
+        Initialize bulk request
+        :param body: Encoded, possibly compressed HTTP body
+        :type body: bytes
+        :param headers: HTTP headers
+        :type headers: dict
+        :param records: Number of log records in the body
+        :type records: int
+        """
+        self.body = body
+        self.headers = headers
+        self.records = records
+
+
+class sendermethod(object):
+    """
+    Method of a HTTP sender. It is bound to the instance it is called on,
+    or to the CoralogixHTTPSender class itself, which is the default sender.
+    """
+
+    def __init__(self, func):
+        self.__func__ = func
+        self.__doc__ = func.__doc__
+
+    def __get__(self, instance, owner=None):
+        return MethodType(self.__func__, owner if instance is None else instance)
+
+
 class CoralogixHTTPSender(object):
     """
-    HTTP middleware class for sending logs to Coralogix
+    HTTP middleware class for sending logs to Coralogix.
+    The class is the default sender of the default Logger Manager. Each other manager
+    creates an instance, with its own connections, compression and circuit breaker.
     """
 
     _mutex = Lock()
     _timeout = 30
+    _session = None
+    _session_pid = None
+    _requests_count = 0
+    _compression = None
+    _compression_level = None
+    _compression_ratio = None
+    # Sender threads sharing the session, None uses Coralogix.SENDER_WORKERS
+    _workers = None
+    # Stops sending while Coralogix is unreachable
+    circuit_breaker = CircuitBreaker()
+
+    def __init__(self, timeout=None, workers=None):
+        """
+        Create HTTP sender independent of the default one
+        :param timeout: Time to wait for the server response (default: Coralogix.HTTP_READ_TIMEOUT)
+        :type timeout: int
+        :param workers: Sender threads sharing the sender (default: Coralogix.SENDER_WORKERS)
+        :type workers: int
+        """
+        self._mutex = Lock()
+        self._session = None
+        self._session_pid = None
+        self._requests_count = 0
+        self._compression = None
+        self._compression_level = None
+        self._compression_ratio = None
+        self._workers = workers
+        self.circuit_breaker = CircuitBreaker()
+        self._init(timeout)
 
     @classmethod
     def _get_user_agent(cls):
@@ -39,89 +113,356 @@ class CoralogixHTTPSender(object):
         )
         return 'coralogix-python-sdk/{} (Python {})'.format(__version__, python_version)
 
-    @classmethod
+    @sendermethod
     def _init(cls, timeout=None):
         """
         Initialize Coralogix HTTP sender
-        :param timeout: Time between sending logs to server (default: None)
+        :param timeout: Time to wait for the server response (default: None)
         :type timeout: int
         """
-        cls._timeout = timeout or Coralogix.HTTP_TIMEOUT
+        cls._timeout = timeout or Coralogix.HTTP_READ_TIMEOUT
 
-    @classmethod
-    def send_request(cls, bulk, url=None):
+    @sendermethod
+    def set_compression(cls, encoding=None, level=None):
+        """
+        Enable compression of HTTP bodies
+        :param encoding: Content-Encoding: gzip, deflate or zstd (default: None, no compression)
+        :type encoding: str
+        :param level: Compression level (default: None, encoding specific)
+        :type level: int
+        :return: Used encoding
+        :rtype: str
+        """
+        encoding = encoding.lower() if encoding else None
+        if encoding and encoding not in COMPRESSIONS:
+            raise ValueError(
+                'Invalid compression "{}". Supported compressions: {}'.format(
+                    encoding, ', '.join(sorted(COMPRESSIONS))
+                )
+            )
+        if encoding and not is_available(encoding):
+            DebugLogger.warning('Compression "{}" requires an additional package, falling back to gzip', encoding)
+            encoding, level = 'gzip', None
+        cls._compression = encoding
+        cls._compression_level = level
+        cls._compression_ratio = None
+        return cls._compression
+
+    @sendermethod
+    def compression_ratio(cls):
+        """
+        Estimated ratio between compressed and raw bulk size
+        :return: Compression ratio, 1.0 when compression is disabled
+        :rtype: float
         """
-        Send request procedure
+        if not cls._compression or cls._compression_ratio is None:
+            return 1.0
+        return cls._compression_ratio
+
+    @sendermethod
+    def set_workers(cls, workers):
+        """
+        Size the connection pool for the sender threads sharing the sender
+        :param workers: Number of sender threads (default: Coralogix.SENDER_WORKERS)
+        :type workers: int
+        """
+        with cls._mutex:
+            if workers != cls._workers:
+                cls._workers = workers
+                # Built again with the new pool size by the next request
+                cls._session = None
+
+    @sendermethod
+    def _get_session(cls):
+        """
+        Get HTTP session which keeps connections to Coralogix alive between requests.
+        The session is rebuilt after fork, connections of the parent process are never reused.
+        The session is shared by all sender threads.
+        :return: HTTP session
+        :rtype: requests.Session
+        """
+        try:
+            cls._mutex.acquire()
+            if cls._session is None or cls._session_pid != os.getpid():
+                session = requests.Session()
+                workers = cls._workers or Coralogix.SENDER_WORKERS
+                adapter = HTTPAdapter(
+                    pool_connections=Coralogix.HTTP_POOL_CONNECTIONS,
+                    # Every sender thread needs its own connection
+                    pool_maxsize=max(Coralogix.HTTP_POOL_MAXSIZE, workers)
+                )
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                session.headers.update({'User-Agent': cls._get_user_agent()})
+                cls._session = session
+                cls._session_pid = os.getpid()
+                cls._requests_count = 0
+            return cls._session
+        finally:
+            if cls._mutex:
+                cls._mutex.release()
+
+    @sendermethod
+    def _count_request(cls):
+        """
+        Count request sent by the current process
+        """
+        with cls._mutex:
+            cls._requests_count += 1
+
+    @sendermethod
+    def connection_stats(cls):
+        """
+        Connection pool statistics of the current process
+        :return: Number of requests, opened connections and reused connections
+        :rtype: dict
+        """
+        connections = 0
+        if cls._session is not None and cls._session_pid == os.getpid():
+            # The same adapter is mounted for both http and https
+            for adapter in set(cls._session.adapters.values()):
+                pools = adapter.poolmanager.pools
+                for key in pools.keys():
+                    pool = pools.get(key)
+                    if pool is not None:
+                        connections += pool.num_connections
+            requests_count = cls._requests_count
+        else:
+            requests_count = 0
+        return {
+            'requests': requests_count,
+            'connections': connections,
+            'reused': max(requests_count - connections, 0),
+        }
+
+    @sendermethod
+    def warm_up(cls, url=None):
+        """
+        Open connection to Coralogix before the first bulk is sent
+        :param url: Log collector url (required, region-specific)
+        :type url: str
+        :return: Warm up status
+        :rtype: bool
+        """
+        if not url:
+            raise ValueError('URL parameter is required. Use Coralogix.get_log_url(region) to get the correct regional URL.')
+        try:
+            DebugLogger.info('Opening connection to Coralogix server...')
+            # Any response means TCP and TLS handshakes are done and the connection is pooled
+            cls._get_session().head(url=url, timeout=cls._get_timeout())
+            cls._count_request()
+            return True
+        except Exception as exc:
+            DebugLogger.exception('Failed to open connection to Coralogix server', exc)
+            return False
+
+    @sendermethod
+    def _build_request(cls, bulk):
+        """
+        Build singles format HTTP body and headers
         :param bulk: Bulk with logs records
         :type bulk: dict
+        :return: HTTP body, HTTP headers
+        :rtype: tuple
+        """
+        private_key = bulk.get('privateKey', '')
+
+        # Transform to singles format: array of log objects
+        # Each log entry gets the metadata fields merged in
+        log_entries = [
+            entry if isinstance(entry, LogEntry) else LogEntry.from_dict(entry)
+            for entry in bulk.get('logEntries', [])
+        ]
+        singles_payload = LogEntry.join(log_entries, {
+            'applicationName': bulk.get('applicationName', ''),
+            'subsystemName': bulk.get('subsystemName', '')
+        })
+
+        headers = {
+            'Authorization': 'Bearer {}'.format(private_key),
+            'Content-Type': 'application/json'
+        }
+
+        if cls._compression:
+            raw_size = len(singles_payload)
+            singles_payload = compress(singles_payload, cls._compression, cls._compression_level)
+            headers['Content-Encoding'] = cls._compression
+            # Smooth the ratio, it is used to pack bulks by the compressed size
+            ratio = float(len(singles_payload)) / raw_size
+            with cls._mutex:
+                if cls._compression_ratio is not None:
+                    ratio = 0.8 * cls._compression_ratio + 0.2 * ratio
+                cls._compression_ratio = ratio
+        return singles_payload, headers
+
+    @sendermethod
+    def prepare_request(cls, bulk):
+        """
+        Encode bulk into a request which can be sent any number of times
+        :param bulk: Bulk with logs records, or an already prepared request
+        :type bulk: dict or BulkRequest
+        :return: Bulk request
+        :rtype: BulkRequest
+        """
+        if isinstance(bulk, BulkRequest):
+            return bulk
+        body, headers = cls._build_request(bulk)
+        return BulkRequest(body, headers, len(bulk.get('logEntries', [])))
+
+    @sendermethod
+    def prepare_requests(cls, bulk):
+        """
+        Encode bulk into requests which fit Coralogix.MAX_LOG_WIRE_CHUNK_SIZE once compressed.
+        Bulks are packed by the estimated compression ratio, a bulk which compresses worse
+        than estimated is split in halves.
+        :param bulk: Bulk with logs records, or an already prepared request
+        :type bulk: dict or BulkRequest
+        :return: Bulk requests
+        :rtype: list
+        """
+        request = cls.prepare_request(bulk)
+        entries = bulk.get('logEntries', []) if isinstance(bulk, dict) else []
+        limit = Coralogix.MAX_LOG_WIRE_CHUNK_SIZE
+        if not limit or len(request.body) <= limit or len(entries) < 2 or \
+                'Content-Encoding' not in request.headers:
+            return [request]
+        DebugLogger.info('Compressed bulk of {0:d} bytes is too big, splitting it', len(request.body))
+        half = len(entries) // 2
+        return cls.prepare_requests(dict(bulk, logEntries=entries[:half])) + \
+            cls.prepare_requests(dict(bulk, logEntries=entries[half:]))
+
+    @sendermethod
+    def _get_timeout(cls):
+        """
+        Connect and read timeouts of HTTP requests
+        :rtype: tuple
+        """
+        return Coralogix.HTTP_CONNECT_TIMEOUT, cls._timeout
+
+    @sendermethod
+    def send_attempt(cls, bulk, url, stats=None):
+        """
+        Send bulk once, without waiting for a retry. The result is reported to the circuit breaker.
+        :param bulk: Bulk with logs records, or a request prepared with prepare_request()
+        :type bulk: dict or BulkRequest
+        :param url: Log collector url (region-specific)
+        :type url: str
+        :param stats: Pipeline statistics to record the result in (default: None)
+        :type stats: PipelineStats
+        :return: True if the bulk is done with (delivered or rejected for good),
+                 False if it should be sent again
+        :rtype: bool
+        """
+        try:
+            request = cls.prepare_request(bulk)
+            started = time.perf_counter()
+            response = cls._get_session().post(
+                url=url,
+                timeout=cls._get_timeout(),
+                data=request.body,
+                headers=request.headers
+            )
+            cls._count_request()
+        except Exception as exc:
+            DebugLogger.exception('Failed to send HTTP POST request', exc)
+            cls.circuit_breaker.record_failure()
+            return False
+
+        if stats is not None:
+            stats.observe_latency(time.perf_counter() - started)
+        if is_retryable(response.status_code):
+            DebugLogger.error('Coralogix server is unavailable. Result is: {0:d}', response.status_code)
+            cls.circuit_breaker.record_failure()
+            return False
+
+        # Any other response means the server is reachable
+        cls.circuit_breaker.record_success()
+        if response.status_code < 400:
+            if DebugLogger.enabled('INFO'):
+                DebugLogger.info(
+                    'Successfully sent bulk to Coralogix server. Result is: {0:d}. '
+                    'Connections: {1[connections]:d}, reused: {1[reused]:d}',
+                    response.status_code,
+                    cls.connection_stats()
+                )
+            if stats is not None:
+                stats.batch_sent(request.records, len(request.body))
+        else:
+            DebugLogger.error('Coralogix server rejected bulk. Result is: {0:d}', response.status_code)
+            if stats is not None:
+                stats.batch_failed(request.records)
+        return True
+
+    @sendermethod
+    def send_request(cls, bulk, url=None, stats=None):
+        """
+        Send request procedure. Blocks the calling thread between retries.
+        :param bulk: Bulk with logs records, or a request prepared with prepare_request()
+        :type bulk: dict or BulkRequest
         :param url: Log collector url (required, region-specific)
         :type url: str
+        :param stats: Pipeline statistics to record the result in (default: None)
+        :type stats: PipelineStats
         """
         if not url:
             raise ValueError('URL parameter is required. Use Coralogix.get_log_url(region) to get the correct regional URL.')
+        request = None
         try:
-            cls._mutex.acquire()
+            if not isinstance(bulk, BulkRequest):
+                # Encoded once, all attempts send the same body
+                requests_ = cls.prepare_requests(bulk)
+                if len(requests_) > 1:
+                    for request in requests_:
+                        cls.send_request(request, url=url, stats=stats)
+                    return
+                request = requests_[0]
+            else:
+                request = bulk
             for attempt in range(1, Coralogix.HTTP_SEND_RETRY_COUNT+2):
-                try:
-                    DebugLogger.info(
-                        'About to send bulk to Coralogix server. Attempt number: {0:d}'.format(
-                            attempt
-                        )
-                    )
-                    
-                    private_key = bulk.get('privateKey', '')
-                    
-                    # Transform to singles format: array of log objects
-                    # Each log entry gets the metadata fields merged in
-                    application_name = bulk.get('applicationName', '')
-                    subsystem_name = bulk.get('subsystemName', '')
-                    log_entries = bulk.get('logEntries', [])
-                    
-                    # Build singles format payload - direct array of logs
-                    singles_payload = []
-                    for entry in log_entries:
-                        log_object = {
-                            'applicationName': application_name,
-                            'subsystemName': subsystem_name
-                        }
-                        # Merge all fields from the log entry
-                        log_object.update(entry)
-                        
-                        singles_payload.append(log_object)
-                    
-                    headers = {
-                        'Authorization': 'Bearer {}'.format(private_key),
-                        'Content-Type': 'application/json',
-                        'User-Agent': cls._get_user_agent()
-                    }
-                    
-                    response = requests.post(
-                        url=url,
-                        timeout=cls._timeout,
-                        json=singles_payload,
-                        headers=headers
-                    )
-                    DebugLogger.info(
-                        'Successfully sent bulk to Coralogix server. Result is: {0:d}'.format(
-                            response.status_code
-                        )
-                    )
+                if not cls.circuit_breaker.allow():
+                    DebugLogger.error('Coralogix server is unreachable, circuit breaker is open')
+                    break
+                DebugLogger.info('About to send bulk to Coralogix server. Attempt number: {0:d}', attempt)
+                if stats is not None and attempt > 1:
+                    stats.retry()
+                if cls.send_attempt(request, url, stats):
                     return
-                except Exception as exc:
-                    DebugLogger.exception('Failed to send HTTP POST request', exc)
-                DebugLogger.error(
-                    'Failed to send bulk. Will retry in: {0:d} seconds...'.format(
-                        Coralogix.HTTP_SEND_RETRY_INTERVAL
-                    )
-                )
-                time.sleep(Coralogix.HTTP_SEND_RETRY_INTERVAL)
+                if not cls.circuit_breaker.ready():
+                    DebugLogger.error('Coralogix server is unreachable, circuit breaker is open')
+                    break
+                if attempt <= Coralogix.HTTP_SEND_RETRY_COUNT:
+                    delay = backoff(attempt)
+                    DebugLogger.error('Failed to send bulk. Will retry in: {0:.2f} seconds...', delay)
+                    time.sleep(delay)
         except Exception as exc:
             DebugLogger.exception('Failed to send HTTP POST request', exc)
-        finally:
-            if cls._mutex:
-                cls._mutex.release()
+        if stats is not None:
+            stats.batch_failed(
+                request.records if request is not None else len(bulk.get('logEntries', []))
+            )
 
-    @classmethod
+    @sendermethod
+    def get_server_time(cls, url, timeout=None):
+        """
+        Get Coralogix server current time
+        :param url: Time synchronization service url (region-specific)
+        :type url: str
+        :param timeout: Request timeout in seconds (default: Coralogix.TIME_DELAY_TIMEOUT)
+        :type timeout: float or tuple
+        :return: Server epoch time in milliseconds, None if the server did not answer with it
+        :rtype: float
+        """
+        response = cls._get_session().get(
+            url=url,
+            timeout=timeout if timeout is not None else Coralogix.TIME_DELAY_TIMEOUT
+        )
+        cls._count_request()
+        if response and response.status_code == 200:
+            # The server answers with 100 nanoseconds ticks
+            return int(response.content.decode()) / 1e4
+        return None
+
+    @sendermethod
     def get_time_sync(cls, url=None):
         """
         A helper method to get Coralogix server current time and calculate the time difference
@@ -133,34 +474,21 @@ class CoralogixHTTPSender(object):
         if not url:
             raise ValueError('URL parameter is required. Use Coralogix.get_time_delta_url(region) to get the correct regional URL.')
         try:
-            cls._mutex.acquire()
             DebugLogger.info('Syncing time with Coralogix server...')
-            headers = {
-                'User-Agent': cls._get_user_agent()
-            }
-            response = requests.get(
-                url=url,
-                timeout=cls._timeout,
-                headers=headers
-            )
-            if response and response.status_code == 200:
-                # Server epoch time in milliseconds
-                server_time = int(response.content.decode()) / 1e4
+            # Server epoch time in milliseconds
+            server_time = cls.get_server_time(url, timeout=cls._get_timeout())
+            if server_time is not None:
                 # Local epoch time in milliseconds
                 local_time = time.time() * 1e3
                 # Time delta
                 time_delta = server_time - local_time
                 DebugLogger.info(
-                    'Server epoch time={}, local epoch time={}; Updating time delta to: {}'.format(
-                        server_time,
-                        local_time,
-                        time_delta
-                    )
+                    'Server epoch time={}, local epoch time={}; Updating time delta to: {}',
+                    server_time,
+                    local_time,
+                    time_delta
                 )
                 return True, time_delta
             return False, 0
         except Exception as exc:
             DebugLogger.exception('Failed to send HTTP GET request', exc)
-        finally:
-            if cls._mutex:
-                cls._mutex.release()
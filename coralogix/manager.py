@@ -11,25 +11,157 @@ from __future__ import print_function
 import os
 import time
 import copy
-import json
 import socket
 import signal
 import atexit
-from threading import Thread, Lock, current_thread
+import heapq
+import weakref
+import itertools
+from collections import deque
+from types import MethodType
+from operator import attrgetter
+from threading import Thread, Lock, Event, current_thread, local
 from .constants import Coralogix
+from .buffer import LogBuffer, BufferShard, POLICIES, DROP_NEWEST, DROP_OLDEST, \
+    DROP_LOWEST_SEVERITY, BLOCK, EXPIRE
+from .entry import LogEntry
+from .encoder import dumps
 from . import __version__ as logger_version
 from .handlers.debug import DebugLogger
-from .http import CoralogixHTTPSender
+from .http import CoralogixHTTPSender, BulkRequest
+from .pool import SenderPool
+from .spill import SpillFile
+from .collector import CollectorServer, CollectorClient
+from .retry import backoff
+from .ratelimit import RateLimiter
+from .dedup import Deduplicator
+from .clock import ClockSync
+from .stats import PipelineStats, DROP_BUFFER_FULL, DROP_TOO_BIG, DROP_SPILL_FULL, \
+    DROP_RATE_LIMITED, DROP_DUPLICATE, DROP_EVICTED, DROP_EXPIRED
+
+
+# Buffer shard slot of each producer thread. Thread idents are aligned addresses,
+# their low bits are the same for every thread, so threads are numbered in start order.
+_thread_slot = local()
+_thread_slots = itertools.count()
+
+
+def _weak_method(method):
+    """
+    Wrap bound method of a manager, so the wrapper does not keep the manager alive
+    :param method: Bound method
+    :return: Callable which returns None once the manager is collected
+    """
+    ref = weakref.WeakMethod(method)
+
+    def call(*args, **kwargs):
+        bound = ref()
+        return None if bound is None else bound(*args, **kwargs)
+    return call
+
+
+def _sending_loop(ref):
+    """
+    Sending thread loop of a Logger Manager. Between buffer checks only a weak reference
+    to the manager is kept, so a manager which is not referenced anymore is collected.
+    :param ref: Weak reference to the manager
+    :type ref: weakref.ref
+    """
+    while True:
+        manager = ref()
+        if manager is None:
+            return
+        due = manager._check_buffer()
+        del manager
+        if due is None:
+            return
+        wakeup, delay = due
+        wakeup.wait(delay)
+
+
+class managermethod(object):
+    """
+    Method of a Logger Manager. It is bound to the instance it is called on,
+    or to the LoggerManager class itself, which is the default manager.
+    """
+
+    def __init__(self, func):
+        self.__func__ = func
+        self.__doc__ = func.__doc__
+
+    def __get__(self, instance, owner=None):
+        return MethodType(self.__func__, owner if instance is None else instance)
 
 
 class LoggerManager(object):
     """
-    Coralogix Logger Manager
+    Coralogix Logger Manager.
+    The class is the default manager shared by all handlers. Create instances to send
+    independent streams, each with its own buffer, limits, sending thread and sender pool.
     """
 
     configured = False
 
-    @classmethod
+    # Limits of the manager, None uses the global Coralogix constants
+    max_buffer_size = None
+    send_size_threshold = None
+    max_send_latency = None
+    sender_workers = None
+    max_in_flight = None
+    rate_limits = None
+    dedup_window = None
+    backpressure = None
+
+    # Managers created besides the default one, dropped once they are collected
+    _instances = weakref.WeakSet()
+
+    # HTTP sender of the manager, the class is the sender of the default manager
+    _sender = CoralogixHTTPSender
+
+    def __init__(self, max_buffer_size=None, send_size_threshold=None, max_send_latency=None,
+                 sender_workers=None, max_in_flight=None, rate_limits=None, dedup_window=None,
+                 backpressure=None):
+        """
+        Create Logger Manager independent of the default one
+        :param max_buffer_size: Maximum buffer size in bytes (default: Coralogix.MAX_LOG_BUFFER_SIZE)
+        :type max_buffer_size: int
+        :param send_size_threshold: Buffer size which sends a bulk right away
+                                    (default: Coralogix.SEND_SIZE_THRESHOLD)
+        :type send_size_threshold: int
+        :param max_send_latency: Maximum seconds a log waits in the buffer
+                                 (default: Coralogix.MAX_SEND_LATENCY)
+        :type max_send_latency: float
+        :param sender_workers: Number of sender threads (default: Coralogix.SENDER_WORKERS)
+        :type sender_workers: int
+        :param max_in_flight: Maximum bulks sent at once (default: Coralogix.MAX_IN_FLIGHT_BULKS)
+        :type max_in_flight: int
+        :param rate_limits: Ingestion rate limits (default: Coralogix.RATE_LIMITS)
+        :type rate_limits: dict
+        :param dedup_window: Seconds in which repeats of a record are collapsed
+                             (default: Coralogix.DEDUP_WINDOW)
+        :type dedup_window: float
+        :param backpressure: Policy once the buffer is full (default: Coralogix.BACKPRESSURE_POLICY)
+        :type backpressure: str
+        """
+        self.max_buffer_size = max_buffer_size
+        self.send_size_threshold = send_size_threshold
+        self.max_send_latency = max_send_latency
+        self.sender_workers = sender_workers
+        self.max_in_flight = max_in_flight
+        self.rate_limits = rate_limits
+        self.dedup_window = dedup_window
+        self.backpressure = self._check_backpressure(backpressure)
+        self.configured = False
+        # Shadow the state of the default manager, initialize() must not touch it
+        self._process = None
+        self._pool = None
+        self._spill = None
+        self._clock = None
+        self._sender = CoralogixHTTPSender()
+        LoggerManager._instances.add(self)
+        self.initialize()
+
+    @managermethod
     def initialize(cls):
         """
         Logger Manager initialize procedure
@@ -43,30 +175,95 @@ class LoggerManager(object):
         cls._time_delta = 0
         cls._mutex = Lock()
         cls._sync_time = False
+        if getattr(cls, '_clock', None) is not None:
+            cls._clock.stop()
+        # Time delta is kept up to date by a background thread, never on the send path
+        cls._clock = ClockSync(
+            _weak_method(cls._fetch_server_time), _weak_method(cls._set_time_delta)
+        )
+        cls._on_collect(cls._clock.stop)
         cls._region = None
+        # Region and its log URL, resolved once instead of for every bulk
+        cls._log_url = (None, None)
+        cls._open_spill(None)
+        # Workers of a pre-fork server forward the logs of the default manager
+        # to the collector at this path
+        cls._collector_path = None if cls is not LoggerManager else \
+            os.environ.get('CORALOGIX_COLLECTOR_PATH') or Coralogix.COLLECTOR_PATH
+        cls._collector_server = None
+        cls._collector_process = None
+        cls._sender.circuit_breaker.add_listener(cls._on_circuit_change)
         cls._init()
 
-    @classmethod
+    @managermethod
     def _init(cls):
         """
         Logger Manager threading initialize
         """
+        if getattr(cls, '_process', None) == os.getpid() and getattr(cls, '_pool', None):
+            cls._pool.close()
+        if cls._spill is not None and cls._spill_process != os.getpid():
+            # Spill file belongs to the parent process, a forked child must not write to it
+            DebugLogger.warning('Overflow spill file is disabled in forked process')
+            cls._spill = None
+        if cls._collector_server is not None and cls._collector_process != os.getpid():
+            # The collector keeps running in the parent process only
+            cls._collector_server.close()
+            cls._collector_server = None
+        cls._collector = CollectorClient(cls._collector_path) \
+            if cls._collector_path and cls._collector_process != os.getpid() else None
         cls._stop = False
         cls._thread = None
-        cls._buffer = []
+        cls._buffer = LogBuffer()
+        # Producers append to shards picked by thread slot, so they rarely share a lock
+        cls._shards = [BufferShard() for _ in range(max(Coralogix.BUFFER_SHARDS, 1))]
         cls._buffer_size = 0
+        # Priority lane: severe logs are buffered apart and go first into bulks
+        cls._priority = BufferShard()
+        cls._priority_buffer = LogBuffer()
         cls._process = os.getpid()
+        cls._stats = PipelineStats()
+        # Set when the sending thread must re-check the buffer
+        cls._wakeup = Event()
+        cls._on_collect(cls._wakeup.set)
+        # Set when the sending thread takes logs out of the buffer
+        cls._room = Event()
+        cls._limiter = cls._create_limiter()
+        cls._rate_limits_reported = time.monotonic()
+        cls._dedup = cls._create_deduplicator()
+        # Records of deferred handlers waiting to be formatted by the sending thread
+        cls._records = deque()
+        # Failed bulks waiting for a retry, ordered by due time
+        cls._retries = []
+        # Body bytes of the bulks waiting for a retry, they count against the buffer size limit
+        cls._retry_size = 0
+        cls._retry_lock = Lock()
+        cls._retry_sequence = itertools.count()
+        # Records of bulks handed to sender threads, guarded by the retry lock
+        cls._sending = 0
+        cls._pool = SenderPool(*cls._pool_size())
+        cls._on_collect(cls._pool.close)
+        cls._sender.set_workers(cls._pool.workers)
+        if cls._sync_time:
+            # A forked child syncs its clock on its own thread
+            cls._clock.start()
         cls._run()
 
-    @classmethod
+    @managermethod
     def configure(cls, sync_time, **kwargs):
         """
         Configure logger with client details
         :param sync_time: Synchronize time with Coralogix servers (default: False)
         :type sync_time: bool
-        :param kwargs: Additional configuration parameters including region
+        :param kwargs: Additional configuration parameters including region and warm_up
         """
         try:
+            # Open connection to Coralogix in background, so the first bulk skips the handshakes
+            warm_up = kwargs.pop('warm_up', False)
+            cls._sender.set_compression(
+                kwargs.pop('compression', Coralogix.COMPRESSION),
+                kwargs.pop('compression_level', Coralogix.COMPRESSION_LEVEL)
+            )
             # Extract region from kwargs if provided
             region = kwargs.pop('region', None)
             if region:
@@ -78,20 +275,137 @@ class LoggerManager(object):
                     cls._region = env_region.upper()
                 else:
                     cls._region = None
-            
+            cls._log_url = (None, None)
+
+            # Managers besides the default one must not share its spill file
+            spill_path = kwargs.pop('spill_path', None)
+            if spill_path is None and cls is LoggerManager:
+                spill_path = Coralogix.SPILL_PATH
+            cls._open_spill(spill_path)
+
+            # Sender pool is created on import, apply the configured size
+            size = cls._pool_size()
+            if (cls._pool.workers, cls._pool.max_in_flight) != size:
+                cls._pool.close()
+                cls._pool = SenderPool(*size)
+                cls._on_collect(cls._pool.close)
+                cls._sender.set_workers(cls._pool.workers)
+
+            if 'rate_limits' in kwargs:
+                cls.rate_limits = kwargs.pop('rate_limits')
+            cls._limiter = cls._create_limiter()
+            if 'dedup_window' in kwargs:
+                cls.dedup_window = kwargs.pop('dedup_window')
+            cls._dedup = cls._create_deduplicator()
+            if 'backpressure' in kwargs:
+                cls.backpressure = cls._check_backpressure(kwargs.pop('backpressure'))
+
             kwargs.update({'computerName': socket.gethostname().strip()})
             cls._bulk_template = copy.deepcopy(kwargs)
             cls._sync_time = bool(sync_time)
+            if cls._sync_time:
+                cls._clock.start()
+            else:
+                cls._clock.stop()
             DebugLogger.info('Successfully configured Coralogix logger')
             cls.send_init_message()
+            if warm_up:
+                cls._warm_up()
             cls.configured = True
+            # Logs buffered before configuration can be sent now
+            cls._wakeup.set()
         except Exception as exc:
             if not cls._stop:
                 DebugLogger.exception('Failed to configure Coralogix logger', exc)
                 cls.configured = False
         return cls.configured
 
-    @classmethod
+    @managermethod
+    def _pool_size(cls):
+        """
+        Configured size of the sender pool
+        :return: Number of sender threads, maximum bulks in flight
+        :rtype: tuple
+        """
+        return (
+            cls.sender_workers or Coralogix.SENDER_WORKERS,
+            cls.max_in_flight or Coralogix.MAX_IN_FLIGHT_BULKS
+        )
+
+    @managermethod
+    def _create_limiter(cls):
+        """
+        Create rate limiter of the configured limits
+        :return: Rate limiter, None if there are no limits
+        :rtype: RateLimiter
+        """
+        limits = cls.rate_limits if cls.rate_limits is not None else Coralogix.RATE_LIMITS
+        return RateLimiter(limits) if limits else None
+
+    @managermethod
+    def _create_deduplicator(cls):
+        """
+        Create deduplicator of the configured window
+        :return: Deduplicator, None if collapsing of repeats is disabled
+        :rtype: Deduplicator
+        """
+        window = cls.dedup_window if cls.dedup_window is not None else Coralogix.DEDUP_WINDOW
+        return Deduplicator(window, Coralogix.DEDUP_MAX_KEYS) if window else None
+
+    @staticmethod
+    def _check_backpressure(policy):
+        """
+        Validate backpressure policy name
+        :param policy: Policy name, one of coralogix.buffer.POLICIES, or None for the default
+        :type policy: str
+        :return: Policy name
+        :rtype: str
+        """
+        if policy is not None and policy not in POLICIES:
+            raise ValueError(
+                'Invalid backpressure policy "{}". Supported policies: {}'.format(policy, ', '.join(POLICIES))
+            )
+        return policy
+
+    @managermethod
+    def _warm_up(cls):
+        """
+        Start a new thread which opens pooled connection to Coralogix
+        """
+        try:
+            thread = Thread(
+                target=cls._sender.warm_up,
+                args=(cls._get_log_url(),)
+            )
+            thread.daemon = True
+            thread.name = 'coralogix-warm-up-thread'
+            thread.start()
+        except Exception as exc:
+            if not cls._stop:
+                DebugLogger.exception('Failed to start connection warm up thread', exc)
+
+    @managermethod
+    def _open_spill(cls, path):
+        """
+        Open disk spill file which takes the logs overflowing the buffer
+        :param path: Spill file path, None disables spilling
+        :type path: str
+        """
+        spill = getattr(cls, '_spill', None)
+        if spill is not None and cls._spill_process == os.getpid():
+            if spill.path == path:
+                return
+            spill.close()
+        cls._spill = None
+        cls._spill_process = os.getpid()
+        if path:
+            try:
+                cls._spill = SpillFile(path, Coralogix.MAX_SPILL_SIZE)
+                DebugLogger.info('Opened overflow spill file {} with {} unsent log entries', path, len(cls._spill))
+            except Exception as exc:
+                DebugLogger.exception('Failed to open overflow spill file', exc)
+
+    @managermethod
     def send_init_message(cls):
         """
         Send initialization message to Coralogix for check connection
@@ -108,7 +422,7 @@ class LoggerManager(object):
             threadId=current_thread().ident
         )
 
-    @classmethod
+    @managermethod
     def add_logline(cls, message, severity, category, **kwargs):
         """
         Add log line to queue
@@ -122,62 +436,479 @@ class LoggerManager(object):
         try:
             if not cls._mutex:
                 return
-            cls._mutex.acquire()
             # This is very important!
             # When forking, we will get here with a new process id.
             # For each new child fork we must create a new watcher thread.
             if os.getpid() != cls._process:
-                cls._init()
+                with cls._mutex:
+                    if os.getpid() != cls._process:
+                        cls._init()
+
+            if cls._dedup is not None and \
+                    not cls._deduplicate(message, severity, category, kwargs):
+                return
 
-            if cls._buffer_size < Coralogix.MAX_LOG_BUFFER_SIZE:
-                # Validate message
-                message = cls._msg2str(message) if message and not str(message).isspace() \
-                    else 'EMPTY_STRING'
+            # Records over the rate limits are dropped before they are validated and encoded
+            limiter = cls._limiter
+            if limiter is not None and \
+                    not limiter.allow(category or Coralogix.CORALOGIX_CATEGORY, severity):
+                cls._stats.drop(DROP_RATE_LIMITED)
+                return
 
-                # Validate severity
-                if cls._is_number(severity) and str(severity):
-                    severity = int(severity)
+            if cls._collector is not None:
+                new_entry = cls._create_entry(message, severity, category, **kwargs)
+                if new_entry is None:
+                    cls._stats.drop(DROP_TOO_BIG)
                 else:
-                    severity = int(Coralogix.Severity.DEBUG)
+                    cls._enqueue_entry(new_entry)
+                return
 
-                if int(Coralogix.Severity.DEBUG) > severity or severity > int(Coralogix.Severity.CRITICAL):
-                    severity = int(Coralogix.Severity.DEBUG)
+            buffer_size = cls._buffer.size + sum(shard.size for shard in cls._shards) + cls._retry_size
+            max_size = cls.max_buffer_size or Coralogix.MAX_LOG_BUFFER_SIZE
+            if buffer_size >= max_size and severity not in Coralogix.PRIORITY_SEVERITIES:
+                policy = cls.backpressure or Coralogix.BACKPRESSURE_POLICY
+                if policy == BLOCK:
+                    buffer_size = cls._wait_for_room(max_size)
+                elif policy == DROP_NEWEST and cls._spill is None:
+                    # Nothing can take the log, it is dropped before it is encoded
+                    cls._stats.drop(DROP_BUFFER_FULL)
+                    return
 
-                # Validate category
-                category = str(category) if category and (not category.isspace()) \
-                    else Coralogix.CORALOGIX_CATEGORY
+            # Validation and encoding run without any lock held
+            new_entry = cls._create_entry(message, severity, category, **kwargs)
+            if new_entry is None:
+                cls._stats.drop(DROP_TOO_BIG)
+                return
+            cls._append_entry(new_entry, buffer_size)
+        except Exception as exc:
+            if not cls._stop:
+                DebugLogger.exception('Failed to add log to buffer', exc)
 
-                # Combine a log-entry from the must parameters together with the optional one.
-                new_entry = {
-                    'text': message,
-                    'timestamp': time.time() * 1000 + cls._time_delta,
-                    'severity': severity,
-                    'category': category,
-                }
-                new_entry.update(kwargs)
-
-                new_entry_size = len(json.dumps(new_entry).encode('utf8'))
-                if Coralogix.MAX_LOG_CHUNK_SIZE <= new_entry_size:
-                    # if log message is too big, throw it;
-                    DebugLogger.warning(
-                        'add_logline(): received log message too big of size= {} MB, bigger than '
-                        'max_log_chunk_size= {}; throwing...'.format(
-                            new_entry_size / 1024 ** 2, Coralogix.MAX_LOG_CHUNK_SIZE
-                        )
-                    )
-                    return
+    @managermethod
+    def _enqueue_entry(cls, entry):
+        """
+        Forward encoded log entry to the collector, or add it to the buffer of this process
+        :param entry: Encoded log entry
+        :type entry: LogEntry
+        """
+        collector = cls._collector
+        # Logs stay in this process while the collector is unavailable
+        if collector is None or not collector.send(entry):
+            cls._append_entry(entry)
+
+    @managermethod
+    def _append_entry(cls, entry, buffer_size=None):
+        """
+        Add encoded log entry to the buffer. When the buffer is full the backpressure
+        policy makes room, otherwise the entry goes to the spill file or it is dropped.
+        :param entry: Encoded log entry
+        :type entry: LogEntry
+        :param buffer_size: Pending size the caller already found (default: None)
+        :type buffer_size: int
+        """
+        if entry.severity in Coralogix.PRIORITY_SEVERITIES:
+            priority = cls._priority
+            if priority.size + cls._priority_buffer.size < Coralogix.PRIORITY_BUFFER_SIZE:
+                priority.append(entry)
+                # Priority logs do not wait for the latency deadline or the size threshold
+                cls._wakeup.set()
+                return
+            # The priority lane is full, the log shares the main buffer
+        shards = cls._shards
+        if buffer_size is None:
+            buffer_size = cls._buffer.size + sum(shard.size for shard in shards) + cls._retry_size
+        max_size = cls.max_buffer_size or Coralogix.MAX_LOG_BUFFER_SIZE
+        if buffer_size >= max_size and cls._make_room(entry, max_size):
+            return
+        if buffer_size < max_size:
+            first = cls._shard().append(entry)
+            # Update the buffer size to reflect the new size.
+            cls._buffer_size = buffer_size - cls._retry_size + entry.size
+            # Wake the sending thread to arm the latency deadline of the first log of a shard
+            # generation, or to send right away once the buffer crosses the threshold.
+            # The buffer size was read before the entry was encoded, the sending thread may
+            # have emptied the buffer since, so it cannot tell which log is the first one.
+            threshold = cls.send_size_threshold or Coralogix.SEND_SIZE_THRESHOLD
+            if first or buffer_size < threshold <= cls._buffer_size:
+                cls._wakeup.set()
+        elif cls._spill is not None:
+            if not cls._spill.write(entry):
+                cls._stats.drop(DROP_SPILL_FULL)
+        else:
+            cls._stats.drop(DROP_BUFFER_FULL)
+
+    @managermethod
+    def _shard(cls):
+        """
+        Buffer shard of the current thread
+        :rtype: BufferShard
+        """
+        try:
+            slot = _thread_slot.index
+        except AttributeError:
+            slot = _thread_slot.index = next(_thread_slots)
+        shards = cls._shards
+        return shards[slot % len(shards)]
+
+    @managermethod
+    def _make_room(cls, entry, max_size):
+        """
+        Drop buffered logs chosen by the backpressure policy and add the new log in their place.
+        The buffer and its size are updated under the manager mutex, so the sending thread
+        and other producers do not see the drop without the new log.
+        :param entry: Encoded log entry which needs room
+        :type entry: LogEntry
+        :param max_size: Maximum buffer size in bytes
+        :type max_size: int
+        :return: True if the log was added to the buffer
+        :rtype: bool
+        """
+        policy = cls.backpressure or Coralogix.BACKPRESSURE_POLICY
+        if policy not in (DROP_OLDEST, DROP_LOWEST_SEVERITY, EXPIRE):
+            return False
+        with cls._mutex:
+            cls._collect()
+            buffer = cls._buffer
+            # Free a slice of the buffer at once, so the logs which follow
+            # do not scan the buffer again one by one
+            size = buffer.size + cls._retry_size - max_size + max(entry.size, max_size // 100)
+            if policy == DROP_OLDEST:
+                dropped, reason = buffer.take_size(size), DROP_EVICTED
+            elif policy == DROP_LOWEST_SEVERITY:
+                dropped, reason = buffer.take_lower_severity(entry.severity, size), DROP_EVICTED
+            else:
+                max_age = Coralogix.BACKPRESSURE_MAX_AGE * 1000
+                dropped, reason = buffer.take_expired(
+                    time.time() * 1000 + cls._time_delta - max_age
+                ), DROP_EXPIRED
+            added = buffer.size + cls._retry_size < max_size
+            if added:
+                cls._shard().append(entry)
+            cls._buffer_size = buffer.size + (entry.size if added else 0)
+        if dropped:
+            cls._stats.drop(reason, len(dropped))
+        if added:
+            # The buffer is full, sending is due right away
+            cls._wakeup.set()
+        return added
+
+    @managermethod
+    def _wait_for_room(cls, max_size):
+        """
+        Wait for the sending thread to take logs out of the full buffer
+        :param max_size: Maximum buffer size in bytes
+        :type max_size: int
+        :return: Size counted against the limit after the wait
+        :rtype: int
+        """
+        buffer_size = cls._used_size()
+        # The sending thread would wait for itself
+        if current_thread() is cls._thread:
+            return buffer_size
+        deadline = time.monotonic() + Coralogix.BACKPRESSURE_TIMEOUT
+        room = cls._room
+        while buffer_size >= max_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            room.clear()
+            cls._wakeup.set()
+            # Another waiter may clear the event, so it is polled at the fast send interval
+            room.wait(min(remaining, Coralogix.FAST_SEND_SPEED_INTERVAL))
+            buffer_size = cls._used_size()
+        return buffer_size
+
+    @managermethod
+    def start_collector(cls, path=None, mode=None):
+        """
+        Receive logs of forked worker processes and send them from this process.
+        Call it in the master process of a pre-fork server, before the workers are forked.
+        :param path: Collector socket path (default: CORALOGIX_COLLECTOR_PATH or Coralogix.COLLECTOR_PATH)
+        :type path: str
+        :param mode: Socket file permissions (default: Coralogix.COLLECTOR_SOCKET_MODE)
+        :type mode: int
+        :return: Collector server
+        :rtype: CollectorServer
+        """
+        path = path or cls._collector_path
+        if not path:
+            raise ValueError('Collector socket path is required')
+        cls.stop_collector()
+        server = CollectorServer(path, cls._append_entry, mode)
+        server.start()
+        cls._collector_server = server
+        cls._collector_path = path
+        cls._collector_process = os.getpid()
+        cls._collector = None
+        DebugLogger.info('Started log collector at {}', path)
+        return server
+
+    @managermethod
+    def stop_collector(cls):
+        """
+        Stop receiving logs of worker processes, they buffer their logs locally afterwards
+        """
+        server = cls._collector_server
+        cls._collector_server = None
+        if server is not None:
+            server.close()
+
+    @managermethod
+    def add_record(cls, handler, record):
+        """
+        Queue log record to be formatted on the sending thread.
+        The caller pays for a snapshot of the message and a deque append, no lock is taken.
+        :param handler: Handler formatting the record
+        :type handler: CoralogixLogger
+        :param record: Log record object
+        :type record: LogRecord
+        """
+        try:
+            if not cls._mutex:
+                return
+            if os.getpid() != cls._process:
+                with cls._mutex:
+                    if os.getpid() != cls._process:
+                        cls._init()
+
+            severity = Coralogix.map_severity(record.levelno)
+            limiter = cls._limiter
+            if limiter is not None and not limiter.allow(record.name or handler._category, severity):
+                cls._stats.drop(DROP_RATE_LIMITED)
+                return
 
-                cls._buffer.append(new_entry)
-                # Update the buffer size to reflect the new size.
-                cls._buffer_size += len(json.dumps(new_entry).encode('utf8'))
+            records = cls._records
+            length = len(records)
+            if length >= Coralogix.MAX_DEFERRED_QUEUE_LENGTH:
+                cls._stats.drop(DROP_BUFFER_FULL)
+                return
+            max_size = cls.max_buffer_size or Coralogix.MAX_LOG_BUFFER_SIZE
+            if cls._buffer_size + cls._retry_size >= max_size and \
+                    severity not in Coralogix.PRIORITY_SEVERITIES:
+                # Other policies make room when the record is buffered by the sending thread
+                policy = cls.backpressure or Coralogix.BACKPRESSURE_POLICY
+                if policy == DROP_NEWEST or \
+                        (policy == BLOCK and cls._wait_for_room(max_size) >= max_size):
+                    cls._stats.drop(DROP_BUFFER_FULL)
+                    return
+            # The caller may change the record afterwards, only its snapshot is queued
+            try:
+                snapshot = handler.prepare(record)
+            except Exception:
+                handler.handleError(record)
+                return
+            records.append((handler, snapshot))
+            # Wake the sending thread for the first record and after every batch
+            if length == 0 or (length + 1) % Coralogix.DEFERRED_DRAIN_BATCH == 0:
+                cls._wakeup.set()
         except Exception as exc:
             if not cls._stop:
                 DebugLogger.exception('Failed to add log to buffer', exc)
-        finally:
-            if cls._mutex:
-                cls._mutex.release()
 
-    @classmethod
+    @managermethod
+    def _format_records(cls):
+        """
+        Format queued records of deferred handlers and add them to the buffer
+        """
+        records = cls._records
+        while records:
+            try:
+                handler, record = records.popleft()
+            except IndexError:
+                break
+            try:
+                message = handler.format(record)
+                severity = Coralogix.map_severity(record.levelno)
+                category = record.name or handler._category
+                fields = {
+                    'created': record.created,
+                    'className': record.module,
+                    'methodName': record.funcName,
+                    'threadId': str(record.thread),
+                }
+                if cls._dedup is not None and \
+                        not cls._deduplicate(message, severity, category, fields):
+                    continue
+                entry = cls._create_entry(message, severity, category, **fields)
+            except Exception:
+                handler.handleError(record)
+                continue
+            # Rate limits and the buffer size were checked when the record was queued
+            if entry is None:
+                cls._stats.drop(DROP_TOO_BIG)
+            else:
+                cls._enqueue_entry(entry)
+
+    @managermethod
+    def _deduplicate(cls, message, severity, category, fields):
+        """
+        Keep the first occurrence of a record, count its repeats within the dedup window
+        :param message: Log record content
+        :type message: str
+        :param severity: Log record severity(level)
+        :type severity: int
+        :param category: Log record category
+        :type category: str
+        :param fields: Additional log record fields
+        :type fields: dict
+        :return: False if the record is a repeat and must not be buffered
+        :rtype: bool
+        """
+        if type(message) is not str:
+            return True
+        key = (message, severity, category) + \
+            tuple(fields.get(name) for name in Coralogix.DEDUP_FIELDS)
+        try:
+            keep, closed = cls._dedup.add(key, fields.get('created') or time.time(), fields)
+        except TypeError:
+            # Unhashable field value, the record is not deduplicated
+            return True
+        for window in closed:
+            cls._report_duplicates(window)
+        if not keep:
+            cls._stats.drop(DROP_DUPLICATE)
+        return keep
+
+    @managermethod
+    def _report_duplicates(cls, window):
+        """
+        Add a record which replaces the repeats of a record
+        :param window: Closed dedup window
+        :type window: DuplicateWindow
+        """
+        message, severity, category = window.key[:3]
+        fields = dict(window.record)
+        fields['created'] = window.last
+        entry = cls._create_entry(
+            {
+                'message': message,
+                'duplicates': window.count,
+                'firstTimestamp': window.first * 1000 + cls._time_delta,
+                'lastTimestamp': window.last * 1000 + cls._time_delta,
+            },
+            severity,
+            category,
+            **fields
+        )
+        if entry is not None:
+            cls._enqueue_entry(entry)
+
+    @managermethod
+    def _flush_duplicates(cls, force=False):
+        """
+        Report repeats of records whose dedup window is over
+        :param force: Report repeats of all windows (default: False)
+        :type force: bool
+        :return: Seconds until the windows are checked again, None if there are none
+        :rtype: float
+        """
+        dedup = cls._dedup
+        if dedup is None:
+            return None
+        for window in dedup.expire(time.time(), force):
+            cls._report_duplicates(window)
+        return dedup.window if len(dedup) else None
+
+    @managermethod
+    def _report_rate_limits(cls, force=False):
+        """
+        Add a record reporting how many records each rate limit suppressed,
+        at most once per Coralogix.RATE_LIMIT_SUMMARY_INTERVAL
+        :param force: Report right away (default: False)
+        :type force: bool
+        :return: Seconds until the next report is due, None if nothing was suppressed
+        :rtype: float
+        """
+        limiter = cls._limiter
+        if limiter is None or not limiter.has_suppressed():
+            return None
+        wait = cls._rate_limits_reported + Coralogix.RATE_LIMIT_SUMMARY_INTERVAL - time.monotonic()
+        if wait > 0 and not force:
+            return wait
+        cls._rate_limits_reported = time.monotonic()
+        limits = []
+        names = dict((int(severity), severity.name) for severity in Coralogix.Severity)
+        for key, count in limiter.take_suppressed().items():
+            category, severity = key if isinstance(key, tuple) else \
+                (key, None) if isinstance(key, str) else (None, key)
+            limit = {'suppressed': count}
+            if category is not None:
+                limit['category'] = category
+            if severity is not None:
+                limit['severity'] = names.get(severity, severity)
+            limits.append(limit)
+        if not limits:
+            return None
+        total = sum(limit['suppressed'] for limit in limits)
+        DebugLogger.warning('Rate limits suppressed {} log records', total)
+        entry = cls._create_entry(
+            {
+                'message': 'Rate limits suppressed {} log records'.format(total),
+                'suppressed': total,
+                'limits': limits,
+            },
+            Coralogix.Severity.WARNING,
+            Coralogix.CORALOGIX_CATEGORY
+        )
+        if entry is not None:
+            cls._enqueue_entry(entry)
+        return None
+
+    @managermethod
+    def _create_entry(cls, message, severity, category, created=None, **kwargs):
+        """
+        Validate log record and encode it
+        :param message: Log record content
+        :type message: str
+        :param severity: Log record severity(level)
+        :type severity: int
+        :param category: Log record category (default: None)
+        :type category: str
+        :param created: Log record creation epoch time in seconds (default: None, current time)
+        :type created: float
+        :return: Encoded log entry or None if the record is too big
+        :rtype: LogEntry
+        """
+        # Validate message
+        message = cls._msg2str(message) if message and not str(message).isspace() \
+            else 'EMPTY_STRING'
+
+        # Validate severity
+        if cls._is_number(severity) and str(severity):
+            severity = int(severity)
+        else:
+            severity = int(Coralogix.Severity.DEBUG)
+
+        if int(Coralogix.Severity.DEBUG) > severity or severity > int(Coralogix.Severity.CRITICAL):
+            severity = int(Coralogix.Severity.DEBUG)
+
+        # Validate category
+        category = str(category) if category and (not category.isspace()) \
+            else Coralogix.CORALOGIX_CATEGORY
+
+        # Combine a log-entry from the must parameters together with the optional one.
+        new_entry = {
+            'text': message,
+            'timestamp': (created or time.time()) * 1000 + cls._time_delta,
+            'severity': severity,
+            'category': category,
+        }
+        new_entry.update(kwargs)
+
+        # Serialize the entry only once, the encoded bytes are reused up to the HTTP body
+        new_entry = LogEntry.from_dict(new_entry)
+        new_entry_size = new_entry.size
+        if Coralogix.MAX_LOG_CHUNK_SIZE <= new_entry_size:
+            # if log message is too big, throw it;
+            DebugLogger.warning(
+                'add_logline(): received log message too big of size= {} MB, bigger than '
+                'max_log_chunk_size= {}; throwing...',
+                new_entry_size / 1024 ** 2, Coralogix.MAX_LOG_CHUNK_SIZE
+            )
+            return None
+        return new_entry
+
+    @managermethod
     def _msg2str(cls, message):
         """
         Convert log message string to compatible format
@@ -190,96 +921,422 @@ class LoggerManager(object):
             if type(message) is str:
                 return message
             elif type(message) is dict:
-                return json.dumps(message)
+                return dumps(message).decode('utf8')
             else:
                 return message
         except Exception:
             if not cls._stop:
                 return str(message)
 
-    @classmethod
-    def _send_bulk(cls, time_sync=True):
+    @managermethod
+    def _send_bulk(cls, time_sync=True, wait=True):
         """
         Send bulk from the buffer
-        :param time_sync: Synchronize time with Coralogix servers (default: True)
+        :param time_sync: Make sure time is synchronized with Coralogix servers in background (default: True)
         :type time_sync: bool
+        :param wait: Send the bulk on the current thread instead of a sender thread (default: True)
+        :type wait: bool
         """
+        bulk = None
+        reserved = False
         try:
             cls._mutex.acquire()
 
             if not cls.configured:
                 return
 
-            if time_sync:
-                cls.update_time_delta_interval()
+            if time_sync and not cls._stop:
+                # Restarts the clock sync thread if it died, the sync itself never runs here
+                cls._clock.start()
+
+            cls._collect()
 
             # Total buffer size
-            size = len(cls._buffer)
+            size = len(cls._buffer) + len(cls._priority_buffer)
             if size < 1:
                 DebugLogger.info('Buffer is empty, there is nothing to send!')
                 return
 
-            # If the size is bigger than the maximum allowed chunk size then split it by half.
-            # Keep splitting it until the size is less than MAX_LOG_CHUNK_SIZE
-            while (len(json.dumps(cls._buffer[:size]).encode('utf8')) > Coralogix.MAX_LOG_CHUNK_SIZE) \
-                    and size > 1:
-                size = int(size / 2)
-
-            # We must take at least one value.
-            # If the first message is bigger than MAX_LOG_CHUNK_SIZE
-            # we need to take it anyway.
-            size = size if size > 0 else 1
+            # Logs stay in the buffer while Coralogix is unreachable
+            if not cls._sender.circuit_breaker.ready():
+                DebugLogger.info('Circuit breaker is open, keeping logs in the buffer')
+                return
 
-            DebugLogger.info('Checking buffer size. Total log entries is: {}'.format(size))
-            cls._bulk_template['logEntries'] = cls._buffer[:size]
-            cls._buffer[:size] = []
+            # Logs stay in the buffer while all sender threads are busy
+            if not wait:
+                reserved = cls._pool.reserve()
+                if not reserved:
+                    DebugLogger.info('Maximum bulks in flight reached, keeping logs in the buffer')
+                    return
 
-            # Extract from the buffer size the total amount of the logs we removed from the buffer
-            cls._buffer_size -= (len(json.dumps(cls._bulk_template['logEntries']).encode('utf8')) - size * 2)
+            # Take the largest bulk which is less than the maximum chunk size.
+            # If the first message is bigger than the maximum chunk size we take it anyway.
+            # The priority lane goes first, the rest of the bulk is filled from the buffer.
+            chunk_size = cls._chunk_size()
+            entries = cls._priority_buffer.take(cls._priority_buffer.plan(chunk_size))
+            if entries:
+                # Joined arrays share the brackets, each buffered entry adds a comma
+                size = cls._buffer.plan(chunk_size - LogEntry.bulk_size(entries) + 1, minimum=0)
+            else:
+                size = cls._buffer.plan(chunk_size)
 
-            # Make sure we are always positive
-            cls._buffer_size = max(cls._buffer_size, 0)
+            DebugLogger.info('Checking buffer size. Total log entries is: {}', len(entries) + size)
+            # Every bulk gets its own copy of the template, bulks may be sent concurrently
+            bulk = dict(cls._bulk_template, logEntries=entries + cls._buffer.take(size))
+            cls._buffer_size = cls._buffer.size
+            cls._room.set()
         except Exception as exc:
             DebugLogger.exception('Failed to send bulk', exc)
         finally:
             cls._mutex.release()
 
-        DebugLogger.info(
-            'Buffer size after removal is: {0:d}'.format(
-                len(json.dumps(cls._buffer).encode('utf8'))-2
+        DebugLogger.info('Buffer size after removal is: {0:d}', cls._buffer_size)
+
+        if not bulk or not bulk['logEntries']:
+            if reserved:
+                cls._pool.release()
+            return
+
+        try:
+            log_url = cls._get_log_url()
+        except Exception:
+            if reserved:
+                cls._pool.release()
+            raise
+
+        if reserved:
+            cls._submit(bulk, log_url, 1, len(bulk['logEntries']))
+        else:
+            cls._sender.send_request(bulk, url=log_url, stats=cls._stats)
+
+    @managermethod
+    def _get_log_url(cls):
+        """
+        Log URL of the configured region
+        :return: Log collector url
+        :rtype: str
+        """
+        region, url = cls._log_url
+        if url is None or region != cls._region:
+            url = Coralogix.get_log_url(cls._region)
+            cls._log_url = (cls._region, url)
+        return url
+
+    @managermethod
+    def _send_attempt(cls, bulk, url, attempt):
+        """
+        Send bulk once on a sender thread. A failed bulk is scheduled for a retry
+        instead of keeping the sender thread asleep.
+        :param bulk: Bulk with logs records, or its request prepared by the first attempt
+        :type bulk: dict or BulkRequest
+        :param url: Log collector url
+        :type url: str
+        :param attempt: Attempt number, starting from 1
+        :type attempt: int
+        """
+        if not isinstance(bulk, BulkRequest):
+            # Encoded on the sender thread, retries keep only the request bytes
+            try:
+                requests = cls._sender.prepare_requests(bulk)
+            except Exception as exc:
+                DebugLogger.exception('Failed to encode bulk', exc)
+                cls._stats.batch_failed(len(bulk.get('logEntries', [])))
+                return
+            # Halves of a bulk which was too big once compressed are sent as soon as possible
+            bulk = requests[0]
+            for request in requests[1:]:
+                cls._schedule_retry(request, url, attempt, 0)
+        if not cls._sender.circuit_breaker.allow():
+            # Another request probes the server, try again once it is reachable
+            cls._schedule_retry(bulk, url, attempt, 0)
+            return
+        DebugLogger.info('About to send bulk to Coralogix server. Attempt number: {0:d}', attempt)
+        if attempt > 1:
+            cls._stats.retry()
+        if cls._sender.send_attempt(bulk, url, stats=cls._stats):
+            return
+        if attempt > Coralogix.HTTP_SEND_RETRY_COUNT:
+            DebugLogger.error('Failed to send bulk after {0:d} attempts', attempt)
+            cls._stats.batch_failed(bulk.records)
+            return
+        delay = backoff(attempt)
+        DebugLogger.error('Failed to send bulk. Will retry in: {0:.2f} seconds...', delay)
+        cls._schedule_retry(bulk, url, attempt + 1, delay)
+
+    @managermethod
+    def _schedule_retry(cls, bulk, url, attempt, delay):
+        """
+        Keep bulk until its next attempt is due
+        :param delay: Seconds to wait before the attempt
+        :type delay: float
+        """
+        with cls._retry_lock:
+            heapq.heappush(
+                cls._retries,
+                (time.monotonic() + delay, next(cls._retry_sequence), bulk, url, attempt)
             )
+            cls._retry_size += len(bulk.body)
+        cls._wakeup.set()
+
+    @managermethod
+    def _resend_retry(cls):
+        """
+        Hand the first due retry to a sender thread
+        :return: True if a retry was sent
+        :rtype: bool
+        """
+        with cls._retry_lock:
+            if not cls._retries or cls._retries[0][0] > time.monotonic():
+                return False
+            if not cls._sender.circuit_breaker.ready() or not cls._pool.reserve():
+                return False
+            _, _, bulk, url, attempt = heapq.heappop(cls._retries)
+            cls._retry_size -= len(bulk.body)
+        # The bulk no longer holds room of the buffer
+        cls._room.set()
+        cls._submit(bulk, url, attempt, bulk.records)
+        return True
+
+    @managermethod
+    def _submit(cls, bulk, url, attempt, records):
+        """
+        Hand bulk to a sender thread, a place must be reserved before
+        :param records: Number of records in the bulk
+        :type records: int
+        """
+        with cls._retry_lock:
+            cls._sending += records
+        cls._pool.submit(cls._send_submitted, bulk, url, attempt, records)
+
+    @managermethod
+    def _send_submitted(cls, bulk, url, attempt, records):
+        """
+        Send attempt on a sender thread, counting its records out of the ones being sent
+        """
+        try:
+            cls._send_attempt(bulk, url, attempt)
+        finally:
+            with cls._retry_lock:
+                cls._sending -= records
+
+    @managermethod
+    def _on_circuit_change(cls, old, new):
+        """
+        Circuit breaker transition listener
+        :param old: Previous state
+        :type old: str
+        :param new: New state
+        :type new: str
+        """
+        cls._stats.circuit_transition(new)
+        # Sending resumes, or the probe time changed
+        cls._wakeup.set()
+
+    @managermethod
+    def _collect(cls):
+        """
+        Move generations of all shards to the buffer, ordered by timestamp.
+        Must be called with the manager mutex held.
+        """
+        cls._priority_buffer.extend(cls._priority.swap())
+        generations = [shard.swap() for shard in cls._shards]
+        generations = [entries for entries in generations if entries]
+
+        # Spilled logs are older than the generations, they go first once there is room
+        if cls._spill is not None and len(cls._spill):
+            room = (cls.max_buffer_size or Coralogix.MAX_LOG_BUFFER_SIZE) - cls._buffer.size - \
+                cls._retry_size - sum(entry.size for entries in generations for entry in entries)
+            if room > 0:
+                cls._buffer.extend(cls._spill.read(room))
+
+        if len(generations) == 1:
+            cls._buffer.extend(generations[0])
+        elif generations:
+            cls._buffer.extend(heapq.merge(*generations, key=attrgetter('timestamp')))
+        cls._buffer_size = cls._buffer.size
+
+    @managermethod
+    def _spill_buffer(cls):
+        """
+        Move all buffered logs to the disk spill file, they are sent after restart
+        """
+        if cls._spill is None or cls._spill_process != os.getpid():
+            return
+        with cls._mutex:
+            cls._collect()
+            entries = cls._priority_buffer.take(len(cls._priority_buffer)) + \
+                cls._buffer.take(len(cls._buffer))
+            for entry in entries:
+                if not cls._spill.write(entry):
+                    break
+            cls._buffer_size = cls._buffer.size
+            cls._spill.close()
+            cls._spill = None
+
+    @managermethod
+    def stats(cls):
+        """
+        Pipeline statistics of the current process.
+        Render them with coralogix.stats.to_prometheus() to expose them to Prometheus.
+        :return: Counters and gauges
+        :rtype: dict
+        """
+        stats = cls._stats.snapshot()
+        shards = cls._shards
+        priority = cls._priority
+        stats['records_enqueued'] = sum(shard.appended for shard in shards) + priority.appended
+        stats['bytes_enqueued'] = sum(shard.appended_size for shard in shards) + priority.appended_size
+        stats['buffer_bytes'] = cls._buffer.size + sum(shard.size for shard in shards)
+        stats['buffer_records'] = len(cls._buffer) + sum(len(shard.entries) for shard in shards)
+        stats['priority_buffer_bytes'] = cls._priority_buffer.size + priority.size
+        stats['priority_buffer_records'] = len(cls._priority_buffer) + len(priority.entries)
+        stats['spill_records'] = len(cls._spill) if cls._spill is not None else 0
+        stats['retries_pending'] = len(cls._retries)
+        stats['retries_pending_bytes'] = cls._retry_size
+        stats['circuit_breaker_state'] = cls._sender.circuit_breaker.state
+        stats['time_delta_ms'] = cls._time_delta
+        stats['time_sync_age_seconds'] = cls._clock.age()
+        stats['time_sync_rtt_ms'] = cls._clock.rtt
+
+        oldest = cls._oldest_timestamp()
+        stats['oldest_entry_age_seconds'] = 0.0 if oldest is None else max(
+            (time.time() * 1000 + cls._time_delta - oldest) / 1000, 0.0
         )
+        return stats
+
+    @managermethod
+    def _oldest_timestamp(cls):
+        """
+        Timestamp of the oldest buffered log entry
+        :return: Epoch time in milliseconds, None if the buffer is empty
+        :rtype: float
+        """
+        # The buffer is ordered by time, each shard generation is ordered by arrival.
+        # The mutex is not taken, entries may be sent while they are inspected.
+        oldest = None
+        shards = cls._shards + [cls._priority]
+        for entries in [cls._buffer, cls._priority_buffer] + [shard.entries for shard in shards]:
+            try:
+                timestamp = entries[0].timestamp
+            except IndexError:
+                continue
+            if timestamp and (oldest is None or timestamp < oldest):
+                oldest = timestamp
+        return oldest
+
+    @managermethod
+    def _pending_size(cls):
+        """
+        Size of log entries waiting in the buffer and its shards
+        :rtype: int
+        """
+        return cls._buffer.size + sum(shard.size for shard in cls._shards)
 
-        if cls._bulk_template['logEntries']:
-            # Get the appropriate URL based on region
-            log_url = Coralogix.get_log_url(cls._region)
-            CoralogixHTTPSender.send_request(cls._bulk_template, url=log_url)
+    @managermethod
+    def _used_size(cls):
+        """
+        Size counted against the buffer size limit: log entries waiting in the buffer
+        and its shards, and bodies of the bulks waiting for a retry
+        :rtype: int
+        """
+        return cls._pending_size() + cls._retry_size
+
+    @managermethod
+    def _priority_size(cls):
+        """
+        Size of log entries waiting in the priority lane
+        :rtype: int
+        """
+        return cls._priority_buffer.size + cls._priority.size
+
+    @managermethod
+    def _next_send_delay(cls):
+        """
+        Time until the next bulk is due
+        :return: Seconds, 0 if a bulk is due now, None if there is nothing to wait for
+        :rtype: float
+        """
+        if not cls.configured:
+            return None
+        delays = []
+        if cls._priority_size() or \
+                cls._pending_size() >= (cls.send_size_threshold or Coralogix.SEND_SIZE_THRESHOLD) or \
+                (cls._spill is not None and len(cls._spill)):
+            delays.append(0)
+        else:
+            oldest = cls._oldest_timestamp()
+            if oldest is not None:
+                # Timestamps are shifted by the server time delta, deadlines use the local clock
+                deadline = (oldest - cls._time_delta) / 1000 + \
+                    (cls.max_send_latency or Coralogix.MAX_SEND_LATENCY)
+                delays.append(max(deadline - time.time(), 0))
+        with cls._retry_lock:
+            if cls._retries:
+                delays.append(max(cls._retries[0][0] - time.monotonic(), 0))
+        if not delays:
+            return None
+        # Nothing is sent while the circuit breaker is open, its transitions wake the thread
+        wait = cls._sender.circuit_breaker.retry_in()
+        if wait is None:
+            return None
+        return max(min(delays), wait)
 
-    @classmethod
+    @managermethod
+    def _chunk_size(cls):
+        """
+        Maximum raw bulk size
+        :return: Size in bytes
+        :rtype: float
+        """
+        if Coralogix.MAX_LOG_WIRE_CHUNK_SIZE and cls._sender._compression:
+            # Pack by the estimated compressed size, the ratio is refreshed after each bulk
+            ratio = max(cls._sender.compression_ratio(), 0.01)
+            return min(
+                Coralogix.MAX_LOG_WIRE_CHUNK_SIZE / ratio,
+                cls.max_buffer_size or Coralogix.MAX_LOG_BUFFER_SIZE
+            )
+        return Coralogix.MAX_LOG_CHUNK_SIZE
+
+    @managermethod
     def update_time_delta_interval(cls):
         """
-        Sync log timestamps with Coralogix server
+        Sync log timestamps with Coralogix server on the current thread,
+        if the background sync did not do it recently
         """
         try:
             # If more than 5 minutes passed from the last sync update
             if time.time() - cls._time_delta_last_update >= 60 * Coralogix.SYNC_TIME_UPDATE_INTERVAL:
-                # Get the appropriate URL based on region
-                time_url = Coralogix.get_time_delta_url(cls._region)
-                result, _time_delta = CoralogixHTTPSender.get_time_sync(url=time_url)
-                if result:
-                    cls._time_delta = _time_delta
-                    cls._time_delta_last_update = time.time()
+                cls._clock.sync()
         except Exception as exc:
             if not cls._stop:
                 DebugLogger.exception('Failed to update time sync', exc)
 
-    @classmethod
+    @managermethod
+    def _fetch_server_time(cls):
+        """
+        Get Coralogix server time of the configured region
+        :return: Epoch time in milliseconds, None if the server did not answer with it
+        :rtype: float
+        """
+        return cls._sender.get_server_time(Coralogix.get_time_delta_url(cls._region))
+
+    @managermethod
+    def _set_time_delta(cls, time_delta):
+        """
+        Apply time delta estimated by the clock sync to new log timestamps
+        :param time_delta: Server time minus local time in milliseconds
+        :type time_delta: float
+        """
+        cls._time_delta = time_delta
+        cls._time_delta_last_update = cls._clock.last_update
+
+    @managermethod
     def _run(cls):
         """
         Start a new timer thread to watch the Logger Manager queue
         """
         try:
-            cls._thread = Thread(target=cls._internal_run)
+            cls._thread = Thread(target=_sending_loop, args=(weakref.ref(cls),))
             cls._thread.daemon = True
             cls._thread.name = 'coralogix-sending-thread'
             cls._thread.start()
@@ -287,23 +1344,138 @@ class LoggerManager(object):
             if not cls._stop:
                 DebugLogger.exception('Failed to start buffer worker thread', exc)
 
-    @classmethod
-    def flush(cls):
+    @managermethod
+    def flush(cls, timeout=None):
         """
-        Flush all messages in buffer and send them immediately on the current thread
+        Send all buffered logs and wait for them. Bulks are sent by the sender threads,
+        as many at once as the pool allows. Flushing stops at the deadline, or once
+        Coralogix is unreachable until after it; logs which were not sent stay in the buffer.
+        :param timeout: Maximum seconds to wait (default: Coralogix.FLUSH_TIMEOUT)
+        :type timeout: float
+        :return: Records delivered and dropped during the flush, and records left over
+        :rtype: dict
         """
         DebugLogger.info('Flush buffer before exit')
-        cls._send_bulk(time_sync=False)
+        deadline = time.monotonic() + (Coralogix.FLUSH_TIMEOUT if timeout is None else timeout)
+        before = cls._stats.snapshot()
+        cls._format_records()
+        cls._flush_duplicates(force=True)
+        cls._report_rate_limits(force=True)
+        cls._drain(deadline)
+        after = cls._stats.snapshot()
+        result = {
+            'delivered': after['records_sent'] - before['records_sent'],
+            'dropped': sum(after['records_dropped'].values()) - sum(before['records_dropped'].values()),
+            'remaining': cls._remaining_records(),
+        }
+        DebugLogger.info(
+            'Flushed buffer: {} records delivered, {} dropped, {} left over',
+            result['delivered'], result['dropped'], result['remaining']
+        )
+        return result
+
+    @managermethod
+    def _drain(cls, deadline):
+        """
+        Send buffered logs and pending retries until nothing is left
+        :param deadline: Monotonic time to give up at
+        :type deadline: float
+        :return: True if everything was sent
+        :rtype: bool
+        """
+        breaker = cls._sender.circuit_breaker
+        # Retries waiting for their backoff get an attempt right away
+        with cls._retry_lock:
+            cls._retries = [(0,) + retry[1:] for retry in cls._retries]
+            heapq.heapify(cls._retries)
+        while True:
+            if cls.configured and breaker.ready():
+                while cls._pool.available():
+                    if cls._resend_retry():
+                        continue
+                    backlog = cls._backlog()
+                    if not backlog:
+                        break
+                    cls._send_bulk(time_sync=False, wait=False)
+                    if cls._backlog() >= backlog:
+                        break
+            now = time.monotonic()
+            with cls._retry_lock:
+                retry_due = cls._retries[0][0] if cls._retries else None
+            if not cls._pool.in_flight:
+                if not cls._backlog() and retry_due is None:
+                    return True
+                # Nothing is on the way, give up if nothing can be sent before the deadline
+                wait = breaker.retry_in() if cls.configured else None
+                if wait is None or now + wait >= deadline or \
+                        (retry_due is not None and retry_due >= deadline and not cls._backlog()):
+                    return False
+            if now >= deadline:
+                return False
+            delay = min(Coralogix.FAST_SEND_SPEED_INTERVAL, deadline - now)
+            if retry_due is not None:
+                delay = min(delay, max(retry_due - now, 0))
+            time.sleep(delay)
+
+    @managermethod
+    def _backlog(cls):
+        """
+        Measure of logs waiting to be sent, it decreases as bulks are cut
+        :return: Buffered bytes and spilled records
+        :rtype: int
+        """
+        spilled = len(cls._spill) if cls._spill is not None else 0
+        return cls._pending_size() + cls._priority_size() + spilled
 
-    @classmethod
+    @managermethod
+    def _remaining_records(cls):
+        """
+        Number of records not sent yet: buffered, spilled, being sent or waiting for a retry
+        :rtype: int
+        """
+        stats = cls.stats()
+        with cls._retry_lock:
+            retrying = sum(retry[2].records for retry in cls._retries)
+            sending = cls._sending
+        return stats['buffer_records'] + stats['priority_buffer_records'] + stats['spill_records'] + \
+            retrying + sending
+
+    @managermethod
     def stop(cls):
         """
-        Stop logger execution
+        Stop logger execution. The sending thread returns without sending the buffered logs,
+        close() sends them.
         """
         DebugLogger.info('Stopping buffer thread')
         cls._stop = True
+        cls._clock.stop()
+        cls._wakeup.set()
+
+    @managermethod
+    def close(cls, timeout=None):
+        """
+        Stop the manager, send all buffered logs and wait for the sender threads.
+        Logs which could not be sent are moved to the spill file, if there is one.
+        :param timeout: Maximum seconds to wait (default: Coralogix.FLUSH_TIMEOUT)
+        :type timeout: float
+        :return: Records delivered and dropped while closing, and records left over
+        :rtype: dict
+        """
+        deadline = time.monotonic() + (Coralogix.FLUSH_TIMEOUT if timeout is None else timeout)
+        cls.stop_collector()
+        cls.stop()
+        # The sending thread returns once it sees the stop, the flush below is the only drain
+        if cls._thread and cls._thread is not current_thread():
+            cls._thread.join(max(deadline - time.monotonic(), 0))
+        result = cls.flush(timeout=max(deadline - time.monotonic(), 0))
+        cls._pool.join(max(deadline - time.monotonic(), 0))
+        cls._spill_buffer()
+        cls._sender.circuit_breaker.remove_listener(cls._on_circuit_change)
+        if cls is not LoggerManager:
+            LoggerManager._instances.discard(cls)
+        return result
 
-    @classmethod
+    @managermethod
     def _is_number(cls, number):
         """
         Check if number is integer
@@ -313,37 +1485,78 @@ class LoggerManager(object):
         """
         return isinstance(number, int)
 
-    @classmethod
+    @managermethod
+    def _on_collect(cls, callback):
+        """
+        Call back once the manager is garbage collected without being closed.
+        The default manager is never collected.
+        :param callback: Procedure which releases a resource of the manager
+        """
+        if cls is not LoggerManager:
+            weakref.finalize(cls, callback)
+
+    @managermethod
     def _internal_run(cls):
         """
-        Start timer execution. The timer should send every X seconds logs from the buffer
+        Start sending thread execution. The thread sleeps until a log arrives, then sends
+        a bulk once the buffer crosses the size threshold or the oldest log reaches
+        the maximum latency, whichever comes first.
+        """
+        _sending_loop(weakref.ref(cls))
+
+    @managermethod
+    def _check_buffer(cls):
+        """
+        Hand the due bulks to the sender threads
+        :return: Event which wakes the sending thread and seconds until the next check,
+                 None once the thread must stop
+        :rtype: tuple
         """
         try:
-            while True:
-                if cls._stop:
-                    cls.flush()
-                    return
-                # Send log bulk
-                cls._send_bulk(time_sync=cls._sync_time)
-
-                # Check: when is the next time we should send logs?
-                # If we already have at least half of the max chunk size
-                # then we are working in fast mode
-                if cls._buffer_size > (Coralogix.MAX_LOG_CHUNK_SIZE / 2):
-                    next_check_interval = Coralogix.FAST_SEND_SPEED_INTERVAL
-                else:
-                    next_check_interval = Coralogix.NORMAL_SEND_SPEED_INTERVAL
+            # Cleared before the buffer is checked, so a log added meanwhile is not missed
+            wakeup = cls._wakeup
+            wakeup.clear()
+            if cls._stop:
+                # close() sends the buffered logs within its own deadline
+                return None
+
+            cls._format_records()
+            timers = [
+                timer for timer in (cls._flush_duplicates(), cls._report_rate_limits())
+                if timer is not None
+            ]
+
+            delay = cls._next_send_delay()
+            time_sync = cls._sync_time
+            # Keep handing bulks to free sender threads while they are due
+            while delay == 0 and cls._pool.available():
+                # Retries go first, their logs are older than the buffered ones
+                if not cls._resend_retry():
+                    pending_size = cls._pending_size() + cls._priority_size()
+                    cls._send_bulk(time_sync=time_sync, wait=False)
+                    time_sync = False
+                    if cls._pending_size() + cls._priority_size() >= pending_size:
+                        break
+                delay = cls._next_send_delay()
 
-                DebugLogger.debug(
-                    'Next buffer check is scheduled in {} seconds'.format(next_check_interval)
-                )
-                time.sleep(next_check_interval)
+            if delay == 0:
+                # All sender threads are busy, logs stay in the buffer
+                delay = Coralogix.FAST_SEND_SPEED_INTERVAL
+            if timers and (delay is None or min(timers) < delay):
+                delay = min(timers)
+
+            if delay is not None:
+                DebugLogger.debug('Next buffer check is scheduled in {} seconds', delay)
+            else:
+                DebugLogger.debug('Buffer is empty, waiting for logs')
+            return wakeup, delay
         except Exception as exc:
             try:
                 if not cls._stop:
                     DebugLogger.exception('Exception from the main buffer loop:', exc)
             except Exception:
                 pass
+            return None
 
 
 LoggerManager.initialize()
@@ -361,15 +1574,14 @@ def handler(signum, frame):
 
 def _handler():
     """
-    Thread termination event
+    Thread termination event. All managers share Coralogix.SHUTDOWN_TIMEOUT to send their logs.
     """
-    try:
-        LoggerManager.stop()
-        LoggerManager.flush()
-        if LoggerManager._thread:
-           LoggerManager._thread.join()
-    except Exception:
-        pass
+    deadline = time.monotonic() + Coralogix.SHUTDOWN_TIMEOUT
+    for manager in [LoggerManager] + list(LoggerManager._instances):
+        try:
+            manager.close(timeout=max(deadline - time.monotonic(), 0))
+        except Exception:
+            pass
 
 
 # Register thread events
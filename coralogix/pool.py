@@ -0,0 +1,130 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""
+Coralogix Logger sender threads pool
+Author: Coralogix Ltd.
+Email: info@coralogix.com
+"""
+
+from threading import Thread, Condition
+
+try:
+    from queue import Queue
+except ImportError:
+    from Queue import Queue
+
+
+class SenderPool(object):
+    """
+    Pool of threads sending bulks with a limit of bulks in flight.
+
+    Bulks are still cut by LoggerManager, one at a time and in buffer order.
+    With a single worker they are delivered in the same order; with more workers
+    bulks may complete out of order, while entries inside a bulk keep their order.
+    """
+
+    def __init__(self, workers=1, max_in_flight=None, name='coralogix-sender'):
+        """
+        Initialize and start sender threads
+        :param workers: Number of sender threads (default: 1)
+        :type workers: int
+        :param max_in_flight: Maximum number of bulks sent or waiting for a sender (default: workers)
+        :type max_in_flight: int
+        :param name: Threads name prefix
+        :type name: str
+        """
+        self.workers = max(int(workers or 1), 1)
+        self.max_in_flight = max(int(max_in_flight or self.workers), self.workers)
+        self._in_flight = 0
+        self._condition = Condition()
+        self._queue = Queue()
+        self._threads = []
+        for index in range(self.workers):
+            thread = Thread(target=self._worker)
+            thread.daemon = True
+            thread.name = '{}-{}'.format(name, index)
+            thread.start()
+            self._threads.append(thread)
+
+    @property
+    def in_flight(self):
+        """
+        Number of bulks sent or waiting for a sender
+        :rtype: int
+        """
+        return self._in_flight
+
+    def available(self):
+        """
+        Check if one more bulk can be reserved
+        :return: Check result
+        :rtype: bool
+        """
+        return self._in_flight < self.max_in_flight
+
+    def reserve(self, timeout=0):
+        """
+        Reserve a place for a bulk before it is cut from the buffer
+        :param timeout: Seconds to wait for a free place, None waits forever (default: 0)
+        :type timeout: float
+        :return: Reservation status
+        :rtype: bool
+        """
+        with self._condition:
+            if not self._condition.wait_for(self.available, timeout):
+                return False
+            self._in_flight += 1
+            return True
+
+    def release(self):
+        """
+        Release a reserved place
+        """
+        with self._condition:
+            self._in_flight -= 1
+            self._condition.notify_all()
+
+    def submit(self, target, *args, **kwargs):
+        """
+        Send bulk on a sender thread. A place must be reserved before.
+        :param target: Sending procedure
+        :type target: callable
+        """
+        self._queue.put((target, args, kwargs))
+
+    def join(self, timeout=None):
+        """
+        Wait until all bulks in flight are done
+        :param timeout: Seconds to wait, None waits forever (default: None)
+        :type timeout: float
+        :return: True if nothing is left in flight
+        :rtype: bool
+        """
+        with self._condition:
+            return self._condition.wait_for(lambda: self._in_flight < 1, timeout)
+
+    def close(self):
+        """
+        Stop sender threads once queued bulks are sent
+        """
+        for _ in self._threads:
+            self._queue.put(None)
+
+    def _worker(self):
+        """
+        Sender thread loop
+        """
+        # The manager imports the pool while the handlers package is being loaded
+        from .handlers.debug import DebugLogger
+        while True:
+            task = self._queue.get()
+            if task is None:
+                return
+            target, args, kwargs = task
+            try:
+                target(*args, **kwargs)
+            except Exception as exc:
+                DebugLogger.exception('Failed to send bulk', exc)
+            finally:
+                self.release()
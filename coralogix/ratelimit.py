@@ -0,0 +1,146 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""
+Coralogix Logger ingestion rate limiting
+Author: Coralogix Ltd.
+Email: info@coralogix.com
+"""
+
+import time
+from threading import Lock
+
+# Maximum number of (category, severity) pairs whose matching buckets are remembered
+MAX_RESOLVED_KEYS = 10000
+
+
+class TokenBucket(object):
+    """
+    Token bucket: allows bursts up to its capacity and a sustained rate of records per second
+    """
+
+    __slots__ = ('rate', 'burst', 'suppressed', '_tokens', '_updated', '_lock')
+
+    def __init__(self, rate, burst=None):
+        """
+        Initialize full bucket
+        :param rate: Records per second
+        :type rate: float
+        :param burst: Bucket capacity (default: rate, at least 1)
+        :type burst: float
+        """
+        self.rate = float(rate)
+        self.burst = max(float(burst if burst is not None else rate), 1.0)
+        self.suppressed = 0
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._lock = Lock()
+
+    def take(self):
+        """
+        Take a token for a record
+        :return: False if the record is over the limit
+        :rtype: bool
+        """
+        with self._lock:
+            now = time.monotonic()
+            tokens = min(self._tokens + (now - self._updated) * self.rate, self.burst)
+            self._updated = now
+            if tokens >= 1:
+                self._tokens = tokens - 1
+                return True
+            self._tokens = tokens
+            self.suppressed += 1
+            return False
+
+    def take_suppressed(self):
+        """
+        Reset suppressed records counter
+        :return: Records suppressed since the last call
+        :rtype: int
+        """
+        with self._lock:
+            suppressed, self.suppressed = self.suppressed, 0
+            return suppressed
+
+
+class RateLimiter(object):
+    """
+    Token bucket limits of log records keyed by category, severity or both.
+    A record must fit all limits which match it.
+    """
+
+    def __init__(self, limits):
+        """
+        Initialize rate limiter
+        :param limits: Limits by key: category name, Coralogix.Severity value or a
+                       (category, severity) tuple; values are records per second or
+                       a (records per second, burst) tuple
+        :type limits: dict
+        """
+        self._buckets = {}
+        for key, limit in limits.items():
+            rate, burst = limit if isinstance(limit, (tuple, list)) else (limit, None)
+            if isinstance(key, (tuple, list)):
+                key = (key[0], int(key[1]))
+            elif not isinstance(key, str):
+                key = int(key)
+            self._buckets[key] = TokenBucket(rate, burst)
+        self._resolved = {}
+
+    def _resolve(self, category, severity):
+        """
+        Find buckets which limit records of the category and severity
+        :rtype: tuple
+        """
+        buckets = tuple(
+            bucket for bucket in (
+                self._buckets.get((category, severity)),
+                self._buckets.get(category),
+                self._buckets.get(severity),
+            ) if bucket is not None
+        )
+        if len(self._resolved) < MAX_RESOLVED_KEYS:
+            self._resolved[(category, severity)] = buckets
+        return buckets
+
+    def allow(self, category, severity):
+        """
+        Check if a record fits the limits
+        :param category: Log record category
+        :type category: str
+        :param severity: Log record severity(level)
+        :type severity: int
+        :return: False if the record must be dropped
+        :rtype: bool
+        """
+        try:
+            buckets = self._resolved[(category, severity)]
+        except KeyError:
+            buckets = self._resolve(category, severity)
+        for bucket in buckets:
+            # The most specific limit goes first; a suppressed record is not charged to the
+            # broader limits, so a noisy category does not use up a severity shared by others
+            if not bucket.take():
+                return False
+        return True
+
+    def take_suppressed(self):
+        """
+        Collect counters of suppressed records and reset them
+        :return: Suppressed records by limit key, only keys which suppressed records
+        :rtype: dict
+        """
+        suppressed = {}
+        for key, bucket in self._buckets.items():
+            count = bucket.take_suppressed() if bucket.suppressed else 0
+            if count:
+                suppressed[key] = count
+        return suppressed
+
+    def has_suppressed(self):
+        """
+        Check if any record was suppressed since the last report
+        :rtype: bool
+        """
+        return any(bucket.suppressed for bucket in self._buckets.values())
@@ -0,0 +1,196 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""
+Coralogix Logger retry backoff and circuit breaker
+Author: Coralogix Ltd.
+Email: info@coralogix.com
+"""
+
+import time
+import random
+from threading import Lock
+from .constants import Coralogix
+
+# Circuit breaker states
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+STATES = (CLOSED, OPEN, HALF_OPEN)
+
+
+def backoff(attempt, base=None, cap=None):
+    """
+    Delay before the next attempt: exponential backoff with full jitter
+    :param attempt: Number of the failed attempt, starting from 1
+    :type attempt: int
+    :param base: Delay after the first attempt (default: Coralogix.HTTP_SEND_RETRY_INTERVAL)
+    :type base: float
+    :param cap: Maximum delay (default: Coralogix.HTTP_SEND_RETRY_MAX_INTERVAL)
+    :type cap: float
+    :return: Delay in seconds
+    :rtype: float
+    """
+    base = Coralogix.HTTP_SEND_RETRY_INTERVAL if base is None else base
+    cap = Coralogix.HTTP_SEND_RETRY_MAX_INTERVAL if cap is None else cap
+    # Jitter spreads retries of many processes hitting the same outage
+    return random.uniform(0, min(cap, base * 2 ** (max(attempt, 1) - 1)))
+
+
+def is_retryable(status_code):
+    """
+    Check if a bulk rejected with the HTTP status is worth sending again
+    :param status_code: HTTP response status code
+    :type status_code: int
+    :return: Check result
+    :rtype: bool
+    """
+    return status_code == 429 or status_code >= 500
+
+
+class CircuitBreaker(object):
+    """
+    Stops sending to an endpoint after consecutive failures.
+    While open, nothing is sent; after reset_timeout a single probe is let through.
+    A successful probe closes the breaker, a failed one opens it again.
+    """
+
+    def __init__(self, failure_threshold=None, reset_timeout=None):
+        """
+        Initialize closed circuit breaker
+        :param failure_threshold: Consecutive failures which open the breaker
+                                  (default: Coralogix.CIRCUIT_BREAKER_THRESHOLD)
+        :type failure_threshold: int
+        :param reset_timeout: Seconds between probes of an open breaker
+                              (default: Coralogix.CIRCUIT_BREAKER_RESET_TIMEOUT)
+        :type reset_timeout: float
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.failures = 0
+        self._opened = 0
+        self._lock = Lock()
+        self._listeners = []
+
+    def add_listener(self, callback):
+        """
+        Register callback called with the old and the new state on every transition
+        :param callback: Transition callback
+        :type callback: callable
+        """
+        if callback not in self._listeners:
+            self._listeners.append(callback)
+
+    def remove_listener(self, callback):
+        """
+        Unregister transition callback
+        :param callback: Transition callback
+        :type callback: callable
+        """
+        if callback in self._listeners:
+            self._listeners.remove(callback)
+
+    def _get_reset_timeout(self):
+        return Coralogix.CIRCUIT_BREAKER_RESET_TIMEOUT if self.reset_timeout is None \
+            else self.reset_timeout
+
+    def retry_in(self):
+        """
+        Time until the breaker lets a request through
+        :return: Seconds, 0 if a request can be sent now, None while a probe is in flight
+        :rtype: float
+        """
+        state = self.state
+        if state == CLOSED:
+            return 0
+        if state == HALF_OPEN:
+            return None
+        return max(self._opened + self._get_reset_timeout() - time.monotonic(), 0)
+
+    def ready(self):
+        """
+        Check if a request can be sent now, without taking the probe
+        :return: Check result
+        :rtype: bool
+        """
+        return self.retry_in() == 0
+
+    def allow(self):
+        """
+        Take permission to send a request. An open breaker lets a single probe through.
+        :return: Permission
+        :rtype: bool
+        """
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == HALF_OPEN or \
+                    time.monotonic() < self._opened + self._get_reset_timeout():
+                return False
+            transition = self._transition(HALF_OPEN)
+        self._notify(transition)
+        return True
+
+    def record_success(self):
+        """
+        Report request which reached the endpoint
+        """
+        with self._lock:
+            self.failures = 0
+            transition = self._transition(CLOSED)
+        self._notify(transition)
+
+    def record_failure(self):
+        """
+        Report failed request
+        """
+        with self._lock:
+            self.failures += 1
+            threshold = Coralogix.CIRCUIT_BREAKER_THRESHOLD if self.failure_threshold is None \
+                else self.failure_threshold
+            transition = None
+            if self.state == HALF_OPEN or (self.state == CLOSED and self.failures >= threshold):
+                self._opened = time.monotonic()
+                transition = self._transition(OPEN)
+        self._notify(transition)
+
+    def reset(self):
+        """
+        Close the breaker and forget past failures
+        """
+        with self._lock:
+            self.failures = 0
+            transition = self._transition(CLOSED)
+        self._notify(transition)
+
+    def _transition(self, state):
+        """
+        Change state, must be called with the lock held
+        :return: Old and new state, None if the state did not change
+        :rtype: tuple
+        """
+        if self.state == state:
+            return None
+        transition = (self.state, state)
+        self.state = state
+        return transition
+
+    def _notify(self, transition):
+        """
+        Report transition to the debug log and the listeners, outside the lock
+        """
+        if transition is None:
+            return
+        # Imported here, importing the handlers package loads the manager, which needs this module
+        from .handlers.debug import DebugLogger
+        old, new = transition
+        if new == OPEN:
+            DebugLogger.warning('Circuit breaker changed state from {} to {}', old, new)
+        else:
+            DebugLogger.info('Circuit breaker changed state from {} to {}', old, new)
+        for callback in list(self._listeners):
+            try:
+                callback(old, new)
+            except Exception as exc:
+                DebugLogger.exception('Circuit breaker listener failed', exc)
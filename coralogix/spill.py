@@ -0,0 +1,247 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""
+Coralogix Logger disk overflow spill
+Author: Coralogix Ltd.
+Email: info@coralogix.com
+"""
+
+import os
+import mmap
+import zlib
+import struct
+from threading import Lock
+from .entry import LogEntry, HEADER as ENTRY
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# Header: magic, version, sequence, head, tail, used bytes, records count; followed by CRC32.
+# Two header slots are written alternately, so a torn header write never loses both.
+HEADER = struct.Struct('<4sIQQQQQ')
+HEADER_CRC = struct.Struct('<I')
+HEADER_SLOT_SIZE = 64
+DATA_OFFSET = 2 * HEADER_SLOT_SIZE
+MAGIC = b'CXSP'
+VERSION = 1
+
+# Record: payload length, payload CRC32; payload is an entry serialized with LogEntry.to_bytes()
+RECORD = struct.Struct('<II')
+WRAP_MARKER = 0xFFFFFFFF
+
+
+class SpillFile(object):
+    """
+    Bounded append-only ring of log entries in a memory-mapped file.
+    Entries are read back in FIFO order; entries which were not read
+    before the process exited are recovered when the file is opened again.
+    The file is locked while it is open, a second process cannot open the same path.
+    """
+
+    def __init__(self, path, max_size):
+        """
+        Open or create spill file
+        :param path: Spill file path
+        :type path: str
+        :param max_size: Spill file size in bytes
+        :type max_size: int
+        """
+        self.path = path
+        self._lock = Lock()
+        self._sequence = 0
+        self._head = 0
+        self._tail = 0
+        self.size = 0
+        self.count = 0
+        # The file is not truncated before it is locked, it may belong to another process
+        self._file = os.fdopen(os.open(path, os.O_RDWR | os.O_CREAT, 0o600), 'r+b')
+        self._lock_file()
+        exists = os.fstat(self._file.fileno()).st_size > DATA_OFFSET
+        if not exists:
+            self._file.truncate(0)
+            self._file.truncate(max(int(max_size), DATA_OFFSET + RECORD.size + ENTRY.size))
+        self._file.flush()
+        self._map = mmap.mmap(self._file.fileno(), 0)
+        self.capacity = len(self._map) - DATA_OFFSET
+        if not exists or not self._recover():
+            self._reset()
+
+    def __len__(self):
+        return self.count
+
+    def _lock_file(self):
+        """
+        Take exclusive lock of the file, released when the file is closed
+        """
+        if fcntl is None:
+            return
+        try:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except (IOError, OSError):
+            self._file.close()
+            raise IOError('Spill file {} is used by another process'.format(self.path))
+
+    def write(self, entry):
+        """
+        Append log entry to the ring
+        :param entry: Encoded log entry
+        :type entry: LogEntry
+        :return: False if there is no room for the entry
+        :rtype: bool
+        """
+        data = entry.to_bytes()
+        record_size = RECORD.size + len(data)
+        with self._lock:
+            tail, used = self._tail, self.size
+            # The record is never split, the rest of the ring is skipped instead
+            if tail + record_size > self.capacity:
+                used += self.capacity - tail
+                tail = 0
+            if used + record_size > self.capacity:
+                return False
+            if tail == 0 and self._tail != 0:
+                self._write_wrap_marker(self._tail)
+            offset = DATA_OFFSET + tail
+            self._map[offset:offset + RECORD.size] = RECORD.pack(len(data), zlib.crc32(data) & 0xffffffff)
+            self._map[offset + RECORD.size:offset + record_size] = data
+            self._tail = tail + record_size
+            self.size = used + record_size
+            self.count += 1
+            self._commit()
+            return True
+
+    def read(self, max_size):
+        """
+        Take the oldest log entries from the ring
+        :param max_size: Maximum total size of returned entries payloads
+        :type max_size: int
+        :return: Log entries
+        :rtype: list
+        """
+        entries = []
+        with self._lock:
+            total = 0
+            while self.count > 0:
+                result = self._read_record(self._head)
+                if result is None:
+                    # Corrupted ring, nothing after this point can be trusted
+                    self._reset()
+                    break
+                head, entry = result
+                if entry is None:
+                    self.size -= self.capacity - self._head
+                    self._head = 0
+                    continue
+                if entries and total + entry.size > max_size:
+                    break
+                entries.append(entry)
+                total += entry.size
+                self.size -= head - self._head
+                self._head = head
+                self.count -= 1
+            if self.count == 0:
+                self._head = self._tail = self.size = 0
+            self._commit()
+        return entries
+
+    def close(self):
+        """
+        Flush the ring to disk and close the file
+        """
+        with self._lock:
+            if self._map is not None:
+                self._map.flush()
+                self._map.close()
+                self._map = None
+                self._file.close()
+
+    def _write_wrap_marker(self, offset):
+        """
+        Mark that the rest of the ring after offset is skipped
+        """
+        if self.capacity - offset >= RECORD.size:
+            offset += DATA_OFFSET
+            self._map[offset:offset + RECORD.size] = RECORD.pack(WRAP_MARKER, 0)
+
+    def _read_record(self, head):
+        """
+        Read record at the given position
+        :return: Position after the record and the entry (None at the wrap point),
+                 or None if the record is corrupted
+        :rtype: tuple
+        """
+        if self.capacity - head < RECORD.size:
+            return 0, None
+        offset = DATA_OFFSET + head
+        length, crc = RECORD.unpack_from(self._map, offset)
+        if length == WRAP_MARKER:
+            return 0, None
+        end = head + RECORD.size + length
+        if length < ENTRY.size or end > self.capacity:
+            return None
+        data = self._map[offset + RECORD.size:DATA_OFFSET + end]
+        if zlib.crc32(data) & 0xffffffff != crc:
+            return None
+        return end, LogEntry.from_bytes(data)
+
+    def _commit(self):
+        """
+        Write ring state to the next header slot
+        """
+        self._sequence += 1
+        header = HEADER.pack(
+            MAGIC, VERSION, self._sequence, self._head, self._tail, self.size, self.count
+        )
+        offset = (self._sequence % 2) * HEADER_SLOT_SIZE
+        self._map[offset:offset + HEADER.size + HEADER_CRC.size] = \
+            header + HEADER_CRC.pack(zlib.crc32(header) & 0xffffffff)
+
+    def _reset(self):
+        """
+        Drop all records
+        """
+        self._head = self._tail = self.size = self.count = 0
+        self._commit()
+
+    def _recover(self):
+        """
+        Restore ring state of a previous process, dropping records after a torn write
+        :return: Recovery status
+        :rtype: bool
+        """
+        headers = []
+        for slot in range(2):
+            offset = slot * HEADER_SLOT_SIZE
+            header = self._map[offset:offset + HEADER.size]
+            crc, = HEADER_CRC.unpack_from(self._map, offset + HEADER.size)
+            if zlib.crc32(header) & 0xffffffff != crc:
+                continue
+            fields = HEADER.unpack(header)
+            if fields[0] == MAGIC and fields[1] == VERSION:
+                headers.append(fields)
+        if not headers:
+            return False
+        _, _, self._sequence, head, tail, used, count = max(headers, key=lambda fields: fields[2])
+        if head >= self.capacity or tail > self.capacity or used > self.capacity:
+            return False
+
+        # Validate all records, the ring is cut at the first one which is corrupted
+        self._head, self.size, self.count = head, 0, 0
+        position = head
+        for _ in range(count):
+            result = self._read_record(position)
+            if result is not None and result[1] is None:
+                self.size += self.capacity - position
+                position = 0
+                result = self._read_record(position)
+            if result is None or result[1] is None:
+                break
+            self.size += result[0] - position
+            position = result[0]
+            self.count += 1
+        self._tail = position
+        self._commit()
+        return True
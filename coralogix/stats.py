@@ -0,0 +1,212 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""
+Coralogix Logger pipeline statistics
+Author: Coralogix Ltd.
+Email: info@coralogix.com
+"""
+
+from bisect import bisect_left
+from threading import Lock
+from .retry import STATES as CIRCUIT_STATES
+
+# Upper bounds of HTTP latency histogram buckets in seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Reasons of dropped log records
+DROP_BUFFER_FULL = 'buffer_full'
+DROP_TOO_BIG = 'too_big'
+DROP_SPILL_FULL = 'spill_full'
+DROP_SEND_FAILED = 'send_failed'
+DROP_RATE_LIMITED = 'rate_limited'
+# Repeats collapsed into a single record
+DROP_DUPLICATE = 'duplicate'
+# Buffered records dropped by the backpressure policy to make room for new ones
+DROP_EVICTED = 'evicted'
+DROP_EXPIRED = 'expired'
+DROP_REASONS = (
+    DROP_BUFFER_FULL, DROP_TOO_BIG, DROP_SPILL_FULL, DROP_SEND_FAILED, DROP_RATE_LIMITED,
+    DROP_DUPLICATE, DROP_EVICTED, DROP_EXPIRED
+)
+
+
+class PipelineStats(object):
+    """
+    Counters of the sending side of the pipeline.
+    Enqueued records are counted by buffer shards, under the lock they already take,
+    so nothing here is touched on the hot path of a successful add_logline().
+    """
+
+    def __init__(self):
+        """
+        Initialize zeroed counters
+        """
+        self._lock = Lock()
+        self.dropped = dict.fromkeys(DROP_REASONS, 0)
+        self.batches_sent = 0
+        self.batches_failed = 0
+        self.records_sent = 0
+        self.bytes_sent = 0
+        self.retries = 0
+        self.circuit_transitions = dict.fromkeys(CIRCUIT_STATES, 0)
+        self.latency_buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.latency_sum = 0.0
+
+    def drop(self, reason, count=1):
+        """
+        Count dropped log records
+        :param reason: Drop reason, one of DROP_REASONS
+        :type reason: str
+        :param count: Number of records (default: 1)
+        :type count: int
+        """
+        with self._lock:
+            self.dropped[reason] = self.dropped.get(reason, 0) + count
+
+    def retry(self):
+        """
+        Count repeated HTTP attempt
+        """
+        with self._lock:
+            self.retries += 1
+
+    def circuit_transition(self, state):
+        """
+        Count circuit breaker transition
+        :param state: New state
+        :type state: str
+        """
+        with self._lock:
+            self.circuit_transitions[state] = self.circuit_transitions.get(state, 0) + 1
+
+    def observe_latency(self, seconds):
+        """
+        Add HTTP request duration to the histogram
+        :param seconds: Request duration
+        :type seconds: float
+        """
+        with self._lock:
+            self.latency_buckets[bisect_left(LATENCY_BUCKETS, seconds)] += 1
+            self.latency_sum += seconds
+
+    def batch_sent(self, records, size):
+        """
+        Count delivered bulk
+        :param records: Number of records in the bulk
+        :type records: int
+        :param size: HTTP body size in bytes
+        :type size: int
+        """
+        with self._lock:
+            self.batches_sent += 1
+            self.records_sent += records
+            self.bytes_sent += size
+
+    def batch_failed(self, records):
+        """
+        Count bulk which was given up, its records are lost
+        :param records: Number of records in the bulk
+        :type records: int
+        """
+        with self._lock:
+            self.batches_failed += 1
+            self.dropped[DROP_SEND_FAILED] += records
+
+    def snapshot(self):
+        """
+        Consistent copy of the counters
+        :return: Counters
+        :rtype: dict
+        """
+        with self._lock:
+            cumulative, buckets = 0, []
+            for bound, count in zip(LATENCY_BUCKETS + (float('inf'),), self.latency_buckets):
+                cumulative += count
+                buckets.append((bound, cumulative))
+            return {
+                'records_dropped': dict(self.dropped),
+                'batches_sent': self.batches_sent,
+                'batches_failed': self.batches_failed,
+                'records_sent': self.records_sent,
+                'bytes_sent': self.bytes_sent,
+                'retries': self.retries,
+                'circuit_breaker_transitions': dict(self.circuit_transitions),
+                'http_latency': {
+                    'buckets': buckets,
+                    'count': cumulative,
+                    'sum': self.latency_sum,
+                },
+            }
+
+
+# Metric name, type, label of dict values and help text of LoggerManager.stats() values
+_METRICS = (
+    ('records_enqueued', 'counter', None, 'Log records added to the buffer'),
+    ('bytes_enqueued', 'counter', None, 'Encoded bytes added to the buffer'),
+    ('records_dropped', 'counter', 'reason', 'Log records dropped, by reason'),
+    ('records_sent', 'counter', None, 'Log records delivered to Coralogix'),
+    ('bytes_sent', 'counter', None, 'HTTP body bytes delivered to Coralogix'),
+    ('batches_sent', 'counter', None, 'Bulks delivered to Coralogix'),
+    ('batches_failed', 'counter', None, 'Bulks given up after all retries'),
+    ('retries', 'counter', None, 'Repeated HTTP attempts'),
+    ('retries_pending', 'gauge', None, 'Bulks waiting for a retry'),
+    ('retries_pending_bytes', 'gauge', None, 'Body bytes of bulks waiting for a retry'),
+    ('circuit_breaker_transitions', 'counter', 'state', 'Circuit breaker transitions, by new state'),
+    ('circuit_breaker_state', 'gauge', 'state', 'Current circuit breaker state'),
+    ('buffer_bytes', 'gauge', None, 'Encoded bytes waiting in the buffer'),
+    ('buffer_records', 'gauge', None, 'Log records waiting in the buffer'),
+    ('priority_buffer_bytes', 'gauge', None, 'Encoded bytes waiting in the priority lane'),
+    ('priority_buffer_records', 'gauge', None, 'Log records waiting in the priority lane'),
+    ('spill_records', 'gauge', None, 'Log records waiting in the disk spill file'),
+    ('oldest_entry_age_seconds', 'gauge', None, 'Age of the oldest record waiting in the buffer'),
+    ('time_delta_ms', 'gauge', None, 'Coralogix server time minus local time applied to log timestamps'),
+    ('time_sync_age_seconds', 'gauge', None, 'Time since the last successful time sync'),
+    ('time_sync_rtt_ms', 'gauge', None, 'Round trip of the time sample the delta is estimated from'),
+    ('http_latency_seconds', 'histogram', None, 'Duration of HTTP requests sending bulks'),
+)
+
+
+def _format_value(value):
+    """
+    Format sample value
+    :rtype: str
+    """
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float):
+        return repr(value)
+    return str(value)
+
+
+def to_prometheus(stats, prefix='coralogix_sdk'):
+    """
+    Render statistics in Prometheus text exposition format
+    :param stats: Statistics returned by LoggerManager.stats()
+    :type stats: dict
+    :param prefix: Metric names prefix (default: coralogix_sdk)
+    :type prefix: str
+    :return: Metrics text
+    :rtype: str
+    """
+    lines = []
+    for key, kind, label, description in _METRICS:
+        name = '{}_{}'.format(prefix, key if kind != 'counter' else key + '_total')
+        lines.append('# HELP {} {}'.format(name, description))
+        lines.append('# TYPE {} {}'.format(name, kind))
+        value = stats.get(key)
+        if kind == 'histogram':
+            histogram = stats['http_latency']
+            for bound, count in histogram['buckets']:
+                lines.append('{}_bucket{{le="{}"}} {}'.format(name, _format_value(bound), count))
+            lines.append('{}_sum {}'.format(name, _format_value(histogram['sum'])))
+            lines.append('{}_count {}'.format(name, histogram['count']))
+        elif label is not None:
+            # A state is exported as one series per possible value, the current one set to 1
+            if not isinstance(value, dict):
+                value = dict((state, int(state == value)) for state in CIRCUIT_STATES)
+            for item, count in sorted(value.items()):
+                lines.append('{}{{{}="{}"}} {}'.format(name, label, item, _format_value(count)))
+        else:
+            lines.append('{} {}'.format(name, _format_value(value or 0)))
+    return '\n'.join(lines) + '\n'
@@ -2,5 +2,6 @@
 # -*- coding: utf-8 -*-
 
 from .case import TestCase
+from .server import StubServer
 
-__all__ = ['TestCase']
+__all__ = ['TestCase', 'StubServer']
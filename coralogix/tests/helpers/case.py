@@ -14,6 +14,9 @@ class TestCase(unittest.TestCase):
         self.SUBSYSTEM_NAME = os.environ.get('SUBSYSTEM_NAME', Coralogix.NO_SUB_SYSTEM)
         self.REGION = os.environ.get('CORALOGIX_REGION', 'EU2')  # Default to EU2 for tests
         DebugLogger.debug_mode = True
+        # Failures of a previous test must not keep the circuit breaker open
+        from coralogix.http import CoralogixHTTPSender
+        CoralogixHTTPSender.circuit_breaker.reset()
 
     def tearDown(self):
         from coralogix.manager import LoggerManager
@@ -0,0 +1,79 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import time
+from threading import Thread, Lock
+from http.server import HTTPServer, BaseHTTPRequestHandler
+from socketserver import ThreadingMixIn
+from coralogix.compression import decompress
+
+
+class _ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class StubServer(object):
+    """
+    Local stand-in for Coralogix ingress which records received requests.
+    Compressed bodies are recorded decompressed.
+    """
+
+    def __init__(self, status=200, delay=0):
+        self.status = status
+        self.delay = delay
+        self.requests = []
+        self._lock = Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def _respond(self, body=b''):
+                self.send_response(stub.status)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                if self.command != 'HEAD':
+                    self.wfile.write(body)
+
+            def _record(self, body):
+                with stub._lock:
+                    stub.requests.append((self.command, self.path, dict(self.headers), body))
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                body = decompress(body, self.headers.get('Content-Encoding'))
+                if stub.delay:
+                    time.sleep(stub.delay)
+                self._record(body)
+                self._respond()
+
+            def do_GET(self):
+                self._record(b'')
+                self._respond(str(int(time.time() * 1e7)).encode())
+
+            def do_HEAD(self):
+                self._record(b'')
+                self._respond()
+
+        self._server = _ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self._thread = Thread(target=self._server.serve_forever)
+        self._thread.daemon = True
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *args):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def url(self, path='/logs/v1/singles'):
+        return 'http://127.0.0.1:{}{}'.format(self._server.server_address[1], path)
+
+    @property
+    def posts(self):
+        with self._lock:
+            return [request for request in self.requests if request[0] == 'POST']
@@ -0,0 +1,195 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import os
+import time
+import unittest.mock
+import json
+import asyncio
+import logging
+from .helpers import TestCase, StubServer
+from coralogix.constants import Coralogix
+from coralogix.handlers.aio import AsyncCoralogixLogger
+
+
+class TestAsyncCoralogixLogger(TestCase):
+    def create_logger(self, handler):
+        logger = logging.getLogger('coralogix-aio-test')
+        logger.propagate = False
+        logger.setLevel(logging.DEBUG)
+        logger.handlers = [handler]
+        return logger
+
+    def create_handler(self):
+        return AsyncCoralogixLogger(
+            private_key=self.PRIVATE_KEY,
+            app_name=self.APP_NAME,
+            subsystem=self.SUBSYSTEM_NAME,
+            region=self.REGION
+        )
+
+    def test_emit_outside_event_loop(self):
+        handler = self.create_handler()
+        self.create_logger(handler).info('Test message!')
+        self.assertEqual(len(handler._queue), 1)
+        self.assertIsNone(handler._task)
+        handler.close()
+
+    def test_emit_queue_limit(self):
+        queue_length = Coralogix.MAX_ASYNC_QUEUE_LENGTH
+        Coralogix.MAX_ASYNC_QUEUE_LENGTH = 2
+        try:
+            handler = self.create_handler()
+            logger = self.create_logger(handler)
+            for _ in range(5):
+                logger.info('Test message!')
+            self.assertEqual(len(handler._queue), 2)
+            handler.close()
+        finally:
+            Coralogix.MAX_ASYNC_QUEUE_LENGTH = queue_length
+
+    def test_flush(self):
+        with StubServer() as server:
+            os.environ['CORALOGIX_LOG_URL'] = server.url()
+            try:
+                handler = self.create_handler()
+            finally:
+                del os.environ['CORALOGIX_LOG_URL']
+
+            async def main():
+                logger = self.create_logger(handler)
+                for index in range(3):
+                    logger.warning('Test message %d!', index)
+                self.assertIsNotNone(handler._task)
+                await handler.aflush()
+                await handler.aclose()
+
+            asyncio.run(main())
+
+            self.assertEqual(len(server.posts), 1)
+            payload = json.loads(server.posts[0][3].decode('utf8'))
+            self.assertEqual([entry['text'] for entry in payload], [
+                'Test message 0!', 'Test message 1!', 'Test message 2!'
+            ])
+            self.assertEqual(payload[0]['severity'], Coralogix.Severity.WARNING)
+            self.assertEqual(payload[0]['category'], 'coralogix-aio-test')
+            self.assertEqual(payload[0]['applicationName'], self.APP_NAME)
+
+    def test_sync_flush_is_not_a_coroutine(self):
+        handler = self.create_handler()
+        self.create_logger(handler).info('Test message!')
+        self.assertIsNone(handler.flush())
+        handler.close()
+
+    def test_emit_restarts_finished_task(self):
+        handler = self.create_handler()
+        logger = self.create_logger(handler)
+
+        async def main():
+            logger.info('Test message!')
+            return handler._task
+
+        first = asyncio.run(main())
+        self.assertTrue(first.done())
+        second = asyncio.run(main())
+        self.assertIsNot(first, second)
+        handler.close()
+
+    def test_buffer_full_drops_are_counted(self):
+        handler = self.create_handler()
+        logger = self.create_logger(handler)
+        buffer_size = Coralogix.MAX_LOG_BUFFER_SIZE
+        Coralogix.MAX_LOG_BUFFER_SIZE = 1
+        try:
+            for index in range(3):
+                logger.info('Test message %d!', index)
+            asyncio.run(handler._drain())
+        finally:
+            Coralogix.MAX_LOG_BUFFER_SIZE = buffer_size
+        self.assertEqual(len(handler._buffer), 1)
+        self.assertEqual(handler.stats()['records_dropped']['buffer_full'], 2)
+        handler.close()
+
+    def test_aclose_waits_for_bulk_being_sent(self):
+        handler = self.create_handler()
+        sent = []
+
+        async def slow_send(bulk):
+            await asyncio.sleep(0.2)
+            sent.extend(bulk['logEntries'])
+            return True
+
+        handler._send = slow_send
+
+        async def main():
+            self.create_logger(handler).info('Test message!')
+            await handler._drain()
+            handler._sending = True
+            handler._task.cancel()
+            handler._task = asyncio.ensure_future(handler._send_pending())
+            await asyncio.sleep(0.05)
+            await handler.aclose()
+
+        asyncio.run(main())
+        self.assertEqual(len(sent), 1)
+
+    def test_open_breaker_keeps_records(self):
+        from coralogix.stats import DROP_SEND_FAILED
+        handler = self.create_handler()
+        breaker = handler._sender.circuit_breaker
+        posts = []
+        handler._post = lambda body, headers: posts.append(body)
+        logger = self.create_logger(handler)
+        for index in range(50):
+            logger.info('Test message %d!', index)
+
+        async def main():
+            self.assertFalse(await handler._send_pending())
+
+        try:
+            for _ in range(breaker.failure_threshold or Coralogix.CIRCUIT_BREAKER_THRESHOLD):
+                breaker.record_failure()
+            with unittest.mock.patch('coralogix.handlers.aio.aiohttp', None):
+                asyncio.run(main())
+            self.assertEqual(posts, [])
+            self.assertEqual(len(handler._buffer), 50)
+            self.assertIn(b'Test message 0!', handler._buffer[0].payload)
+            self.assertEqual(handler.stats()['records_dropped'][DROP_SEND_FAILED], 0)
+
+            # Once the breaker closes the kept records are sent
+            breaker.reset()
+            handler._post = lambda body, headers: posts.append(body) or 200
+            with unittest.mock.patch('coralogix.handlers.aio.aiohttp', None):
+                asyncio.run(handler._send_pending())
+            self.assertEqual(len(posts), 1)
+            self.assertEqual(len(handler._buffer), 0)
+        finally:
+            breaker.reset()
+            handler.close()
+
+    def test_cancelled_probe_opens_breaker(self):
+        from coralogix.retry import OPEN
+        handler = self.create_handler()
+        breaker = handler._sender.circuit_breaker
+        handler._post = lambda body, headers: time.sleep(0.5)
+
+        async def main():
+            task = asyncio.ensure_future(handler._send({
+                'privateKey': self.PRIVATE_KEY,
+                'logEntries': [],
+            }))
+            await asyncio.sleep(0.05)
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+
+        try:
+            for _ in range(breaker.failure_threshold or Coralogix.CIRCUIT_BREAKER_THRESHOLD):
+                breaker.record_failure()
+            breaker._opened = 0
+            with unittest.mock.patch('coralogix.handlers.aio.aiohttp', None):
+                asyncio.run(main())
+            self.assertEqual(breaker.state, OPEN)
+        finally:
+            breaker.reset()
+        handler.close()
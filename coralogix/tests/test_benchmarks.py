@@ -0,0 +1,98 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import os
+import json
+import tempfile
+from .helpers import TestCase
+from coralogix.constants import Coralogix
+from coralogix.benchmarks import pipeline
+from coralogix.benchmarks.__main__ import main
+
+
+class TestBenchmarks(TestCase):
+    def test_percentiles(self):
+        summary = pipeline.percentiles([float(value) for value in range(1, 101)])
+        self.assertEqual(summary['p50'], 51)
+        self.assertEqual(summary['p99'], 100)
+        self.assertEqual(summary['max'], 100)
+        self.assertEqual(summary['mean'], 50.5)
+
+    def test_shard_contention_spreads_threads(self):
+        results = pipeline.shard_contention(400, threads=(4,))
+        runs = results['4']
+        self.assertEqual(runs['1']['filled_shards'], 1)
+        self.assertGreater(runs[str(Coralogix.BUFFER_SHARDS)]['filled_shards'], 1)
+
+    def test_end_to_end_delivers_all_records(self):
+        result = pipeline.end_to_end(500, threads=2, timeout=10)
+        self.assertEqual(result['delivered'], 500)
+        self.assertEqual(result['dropped'], 0)
+
+    def test_main_writes_json(self):
+        fd, path = tempfile.mkstemp(suffix='.json')
+        os.close(fd)
+        try:
+            self.assertEqual(main([
+                '--records', '200', '--threads', '2',
+                '--only', 'add_logline', '--only', 'batch_cutting', '--output', path
+            ]), 0)
+            with open(path) as output:
+                report = json.load(output)
+        finally:
+            os.unlink(path)
+        self.assertEqual(set(report['results']), {'add_logline', 'batch_cutting'})
+        self.assertEqual(report['results']['add_logline']['multi_thread']['enqueued'], 200)
+        self.assertEqual(report['results']['batch_cutting']['1000']['bulks'], 1)
+
+
+class TestIngressServer(TestCase):
+    def post(self, server, records):
+        import requests
+        return requests.post(server.url(), data=json.dumps(records), timeout=5)
+
+    def test_counts_duplicates(self):
+        from coralogix.benchmarks.server import IngressServer
+        from coralogix.benchmarks.soak import record_sequence, MESSAGE_PREFIX
+        with IngressServer(sequence=record_sequence) as server:
+            records = [{'text': MESSAGE_PREFIX + str(sequence)} for sequence in (0, 5, 5, 1000)]
+            self.assertEqual(self.post(server, records).status_code, 200)
+            self.assertEqual(self.post(server, [{'text': 'other'}]).status_code, 200)
+            stats = server.stats()
+        self.assertEqual(stats['records'], 5)
+        self.assertEqual(stats['distinct'], 3)
+        self.assertEqual(stats['duplicates'], 1)
+
+    def test_injects_errors_and_resets(self):
+        import requests
+        from coralogix.benchmarks.server import IngressServer, Faults, FAULT_ERROR, FAULT_RESET
+        with IngressServer(faults=Faults(error_rate=1, error_statuses=(429,))) as server:
+            self.assertEqual(self.post(server, [{'text': 'x'}]).status_code, 429)
+            server.faults = Faults(reset_rate=1)
+            self.assertRaises(requests.ConnectionError, self.post, server, [{'text': 'x'}])
+            stats = server.stats()
+        self.assertEqual(stats['records'], 0)
+        self.assertEqual(stats['faults'][FAULT_ERROR], 1)
+        self.assertEqual(stats['faults'][FAULT_RESET], 1)
+
+    def test_outage_schedule(self):
+        from coralogix.benchmarks.server import Faults
+        faults = Faults(outages=((10, 5),), outage_every=60, outage_duration=10)
+        self.assertFalse(faults.in_outage(0))
+        self.assertTrue(faults.in_outage(12))
+        self.assertFalse(faults.in_outage(15))
+        self.assertTrue(faults.in_outage(55))
+        self.assertTrue(faults.in_outage(119))
+        self.assertFalse(faults.in_outage(120))
+
+
+class TestSoak(TestCase):
+    def test_accounts_for_every_record(self):
+        from coralogix.benchmarks.server import Faults
+        from coralogix.benchmarks.soak import Soak
+        soak = Soak(Faults(latency=0.01, ack_loss_rate=0.2, seed=1), rate=500, threads=2)
+        summary = soak.run(1, report_interval=0.5, drain_timeout=30)
+        self.assertGreater(summary['produced'], 0)
+        self.assertEqual(summary['unaccounted'], 0)
+        self.assertEqual(summary['delivered'], summary['produced'])
+        self.assertGreaterEqual(summary['duplicated'], 0)
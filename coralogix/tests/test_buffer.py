@@ -0,0 +1,129 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+from .helpers import TestCase
+from coralogix.buffer import LogBuffer, BufferShard
+from coralogix.entry import LogEntry
+
+
+class TestLogBuffer(TestCase):
+    def create_buffer(self, count=100):
+        buffer = LogBuffer()
+        for index in range(count):
+            buffer.append(LogEntry.from_dict({'text': 'x' * (index % 17), 'severity': 3}))
+        return buffer
+
+    def test_append(self):
+        buffer = self.create_buffer(10)
+        self.assertEqual(len(buffer), 10)
+        self.assertEqual(buffer.size, sum(entry.size for entry in buffer))
+
+    def test_plan_largest_fitting_bulk(self):
+        buffer = self.create_buffer()
+        for max_size in (50, 100, 777, 1500):
+            with self.subTest(max_size=max_size):
+                count = buffer.plan(max_size)
+                self.assertLessEqual(LogEntry.bulk_size(buffer[:count]), max_size)
+                self.assertGreater(LogEntry.bulk_size(buffer[:count + 1]), max_size)
+
+    def test_plan_takes_at_least_one(self):
+        buffer = self.create_buffer()
+        self.assertEqual(buffer.plan(5), 1)
+        self.assertEqual(LogBuffer().plan(5), 0)
+
+    def test_plan_minimum(self):
+        buffer = self.create_buffer()
+        self.assertEqual(buffer.plan(5, minimum=0), 0)
+        self.assertEqual(buffer.plan(10 ** 6, minimum=0), len(buffer))
+
+    def test_plan_whole_buffer(self):
+        buffer = self.create_buffer()
+        self.assertEqual(buffer.plan(10 ** 6), len(buffer))
+
+    def test_take(self):
+        buffer = self.create_buffer()
+        expected = list(buffer)
+        first = buffer.take(buffer.plan(300))
+        self.assertEqual(first, expected[:len(first)])
+        self.assertEqual(buffer.size, sum(entry.size for entry in buffer))
+
+        count = buffer.plan(300)
+        self.assertLessEqual(LogEntry.bulk_size(buffer[:count]), 300)
+        self.assertGreater(LogEntry.bulk_size(buffer[:count + 1]), 300)
+
+        buffer.take(len(buffer))
+        self.assertEqual(len(buffer), 0)
+        self.assertEqual(buffer.size, 0)
+        self.assertEqual(buffer.take(1), [])
+
+    def test_put_back(self):
+        buffer = self.create_buffer()
+        expected = list(buffer)
+        taken = buffer.take(buffer.plan(300))
+        buffer.put_back(taken)
+        self.assertEqual(list(buffer), expected)
+        self.assertEqual(buffer.size, sum(entry.size for entry in buffer))
+        count = buffer.plan(300)
+        self.assertEqual(count, len(taken))
+        self.assertLessEqual(LogEntry.bulk_size(buffer[:count]), 300)
+        buffer.put_back([])
+        self.assertEqual(len(buffer), len(expected))
+
+    def test_take_size(self):
+        buffer = self.create_buffer()
+        expected = list(buffer)
+        taken = buffer.take_size(100)
+        self.assertEqual(taken, expected[:len(taken)])
+        self.assertGreaterEqual(sum(entry.size for entry in taken), 100)
+        self.assertEqual(buffer.size, sum(entry.size for entry in buffer))
+        self.assertEqual(buffer.take_size(0), [])
+
+    def test_take_expired(self):
+        buffer = LogBuffer()
+        for timestamp in (1, 2, 3, 4):
+            buffer.append(LogEntry.from_dict({'text': 'x', 'timestamp': timestamp}))
+        self.assertEqual([entry.timestamp for entry in buffer.take_expired(3)], [1, 2])
+        self.assertEqual([entry.timestamp for entry in buffer], [3, 4])
+        self.assertEqual(buffer.size, sum(entry.size for entry in buffer))
+
+    def test_take_lower_severity(self):
+        buffer = LogBuffer()
+        for index, severity in enumerate((3, 1, 5, 1, 3, 6)):
+            buffer.append(LogEntry.from_dict({'text': str(index), 'severity': severity}))
+        taken = buffer.take_lower_severity(5, 3 * buffer[0].size)
+        # Debug entries go first, then the oldest info entry
+        self.assertEqual([entry.severity for entry in taken], [3, 1, 1])
+        self.assertEqual([entry.severity for entry in buffer], [5, 3, 6])
+        self.assertEqual(buffer.size, sum(entry.size for entry in buffer))
+        self.assertEqual(buffer.plan(10 ** 6), 3)
+        self.assertEqual(buffer.take_lower_severity(3, 10 ** 6), [])
+
+    def test_take_lower_severity_interleaved(self):
+        buffer = LogBuffer()
+        # Timestamps of the same width keep all entries the same size
+        for timestamp in range(1000, 1500):
+            buffer.append(LogEntry.from_dict({
+                'text': 'x', 'severity': timestamp % 5 + 1, 'timestamp': timestamp
+            }))
+        taken = buffer.take_lower_severity(4, 150 * buffer[0].size)
+        # All debug entries, then the oldest verbose ones
+        self.assertEqual([entry.severity for entry in taken].count(1), 100)
+        verbose = [entry.timestamp for entry in taken if entry.severity == 2]
+        self.assertEqual(verbose, list(range(1001, 1250, 5)))
+        timestamps = [entry.timestamp for entry in buffer]
+        self.assertEqual(timestamps, sorted(timestamps))
+        self.assertEqual(len(buffer), 350)
+        self.assertEqual(buffer.size, sum(entry.size for entry in buffer))
+        self.assertEqual(len(buffer.take(buffer.plan(10 ** 6))), 350)
+
+
+class TestBufferShard(TestCase):
+    def test_append_reports_new_generation(self):
+        shard = BufferShard()
+        entry = LogEntry.from_dict({'text': 'x', 'severity': 3})
+        self.assertTrue(shard.append(entry))
+        self.assertFalse(shard.append(entry))
+        self.assertEqual(shard.swap(), [entry, entry])
+        self.assertEqual(shard.size, 0)
+        self.assertTrue(shard.append(entry))
+        self.assertEqual(shard.appended, 3)
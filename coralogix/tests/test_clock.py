@@ -0,0 +1,121 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import time
+from unittest import mock
+from .helpers import TestCase, StubServer
+from coralogix.clock import ClockSync
+from coralogix.http import CoralogixHTTPSender
+from coralogix.manager import LoggerManager
+
+
+def server_clock(skew, delay=0):
+    """
+    Fake server time fetch, the server clock runs skew milliseconds ahead
+    and every request takes delay seconds
+    """
+    def fetch(*args):
+        time.sleep(delay / 2)
+        server_time = time.time() * 1000 + skew
+        time.sleep(delay / 2)
+        return server_time
+    return fetch
+
+
+class TestClockSync(TestCase):
+    def test_first_sample_sets_offset(self):
+        clock = ClockSync(server_clock(5000))
+        self.assertEqual(clock.time_delta(), 0)
+        self.assertIsNone(clock.age())
+        self.assertTrue(clock.sample())
+        self.assertAlmostEqual(clock.time_delta(), 5000, delta=50)
+        self.assertLess(clock.age(), 1)
+        self.assertGreater(clock.last_update, 0)
+
+    def test_round_trip_compensation(self):
+        # The server reads its clock half way, the local clock after the whole round trip
+        clock = ClockSync(server_clock(0, delay=0.2))
+        clock.sample()
+        self.assertGreaterEqual(clock.rtt, 200)
+        self.assertAlmostEqual(clock.time_delta(), 0, delta=50)
+
+    def test_smoothing_and_step(self):
+        skew = [0]
+        clock = ClockSync(lambda: time.time() * 1000 + skew[0], smoothing=0.5, step=1000)
+        clock.sample()
+        skew[0] = 100
+        clock.sample()
+        # Small changes move the estimate part of the way
+        self.assertAlmostEqual(clock.time_delta(), 50, delta=20)
+        skew[0] = 10000
+        clock.sample()
+        # Large ones replace it
+        self.assertAlmostEqual(clock.time_delta(), 10000, delta=20)
+
+    def test_shortest_round_trip_wins(self):
+        samples = iter([(0, 0), (0.3, 400), (0.3, 400)])
+
+        def fetch():
+            delay, error = next(samples)
+            time.sleep(delay)
+            return time.time() * 1000 - delay * 500 + error
+        clock = ClockSync(fetch, smoothing=1.0)
+        for _ in range(3):
+            clock.sample()
+        # Samples delayed on the network do not pull the estimate away
+        self.assertAlmostEqual(clock.time_delta(), 0, delta=20)
+
+    def test_failed_fetch(self):
+        clock = ClockSync(lambda: None, burst=2)
+        self.assertFalse(clock.sync())
+        self.assertIsNone(clock.offset)
+
+    def test_background_sync(self):
+        updates = []
+        clock = ClockSync(server_clock(3000), updates.append, interval=60, check_interval=0.05)
+        clock.start()
+        try:
+            clock.start()
+            self.assertTrue(clock.running)
+            deadline = time.monotonic() + 5
+            while len(updates) < 3 and time.monotonic() < deadline:
+                time.sleep(0.01)
+        finally:
+            clock.stop(timeout=5)
+        self.assertFalse(clock.running)
+        self.assertGreaterEqual(len(updates), 3)
+        self.assertAlmostEqual(updates[-1], 3000, delta=50)
+
+    def test_follows_wall_clock_step(self):
+        clock = ClockSync(server_clock(0))
+        clock.sample()
+        with mock.patch('coralogix.clock.time.time', side_effect=lambda: time.monotonic() + 3600):
+            # The offset is kept against the monotonic clock, so the delta undoes the step
+            delta = clock.time_delta()
+        self.assertAlmostEqual(delta, (time.time() - time.monotonic() - 3600) * 1000, delta=50)
+
+
+class TestManagerClockSync(TestCase):
+    def test_sync_does_not_block_send_path(self):
+        with StubServer() as server:
+            manager = LoggerManager()
+            try:
+                with mock.patch.dict('os.environ', {
+                    'CORALOGIX_LOG_URL': server.url(), 'CORALOGIX_TIME_DELTA_URL': server.url('/sdk/v1/time')
+                }), mock.patch.object(CoralogixHTTPSender, 'get_server_time', side_effect=server_clock(2000, 0.2)):
+                    # Configuration and sends go on while the mutex is taken and the time server is slow
+                    started = time.monotonic()
+                    with manager._mutex:
+                        manager.configure(True, privateKey='key', applicationName='app',
+                                          subsystemName='sub', region='EU2')
+                    self.assertLess(time.monotonic() - started, 0.2)
+                    deadline = time.monotonic() + 5
+                    while not manager._time_delta_last_update and time.monotonic() < deadline:
+                        time.sleep(0.01)
+                stats = manager.stats()
+                self.assertAlmostEqual(stats['time_delta_ms'], 2000, delta=50)
+                self.assertGreaterEqual(stats['time_sync_rtt_ms'], 200)
+                self.assertAlmostEqual(manager._time_delta_last_update, time.time(), delta=5)
+            finally:
+                manager.close()
+            self.assertFalse(manager._clock.running)
@@ -0,0 +1,117 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import os
+import time
+import shutil
+import tempfile
+import unittest
+from .helpers import TestCase
+from coralogix.constants import Coralogix
+from coralogix.entry import LogEntry
+from coralogix.collector import CollectorServer, CollectorClient, is_supported
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.time() + timeout
+    while not condition() and time.time() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+@unittest.skipUnless(is_supported(), 'Unix domain sockets are not supported')
+class TestCollector(TestCase):
+    def setUp(self):
+        super(TestCollector, self).setUp()
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'collector.sock')
+
+    def tearDown(self):
+        super(TestCollector, self).tearDown()
+        shutil.rmtree(self.directory)
+
+    def test_forward_entries(self):
+        received = []
+        server = CollectorServer(self.path, received.append)
+        server.start()
+        client = CollectorClient(self.path)
+        try:
+            entries = [
+                LogEntry.from_dict({'text': 'message {}'.format(index), 'severity': 3, 'timestamp': 1.5})
+                for index in range(100)
+            ]
+            # Entries rejected by a busy collector are buffered by the sender instead
+            accepted = [entry for entry in entries if client.send(entry)]
+            self.assertTrue(accepted)
+            self.assertTrue(wait_for(lambda: len(received) == len(accepted)))
+            self.assertEqual([entry.payload for entry in received], [entry.payload for entry in accepted])
+            self.assertEqual(received[0].severity, 3)
+            self.assertEqual(received[0].timestamp, 1.5)
+        finally:
+            client.close()
+            server.close()
+        self.assertFalse(os.path.exists(self.path))
+
+    def test_socket_permissions(self):
+        import stat
+        server = CollectorServer(self.path, lambda entry: None)
+        try:
+            self.assertEqual(stat.S_IMODE(os.stat(self.path).st_mode), Coralogix.COLLECTOR_SOCKET_MODE)
+        finally:
+            server.close()
+        server = CollectorServer(self.path, lambda entry: None, mode=0o660)
+        try:
+            self.assertEqual(stat.S_IMODE(os.stat(self.path).st_mode), 0o660)
+            self.assertEqual(os.listdir(self.directory), ['collector.sock'])
+        finally:
+            server.close()
+
+    def test_collector_unavailable(self):
+        client = CollectorClient(self.path)
+        entry = LogEntry.from_dict({'text': 'message', 'severity': 3})
+        self.assertFalse(client.send(entry))
+        # The collector is not looked up again before the retry interval
+        received = []
+        server = CollectorServer(self.path, received.append)
+        server.start()
+        try:
+            self.assertFalse(client.send(entry))
+            client._retry_at = 0
+            self.assertTrue(client.send(entry))
+            self.assertTrue(wait_for(lambda: len(received) == 1))
+        finally:
+            client.close()
+            server.close()
+
+    def test_big_entry_stays_local(self):
+        client = CollectorClient(self.path)
+        entry = LogEntry.from_dict({'text': 'x' * Coralogix.COLLECTOR_MAX_ENTRY_SIZE})
+        self.assertFalse(client.send(entry))
+        self.assertIsNone(client._socket)
+
+    @unittest.skipUnless(hasattr(os, 'fork'), 'fork is not supported')
+    def test_forked_worker_forwards_to_master(self):
+        from coralogix.manager import LoggerManager
+        LoggerManager.start_collector(self.path)
+        try:
+            pid = os.fork()
+            if pid == 0:
+                try:
+                    LoggerManager.add_logline('From worker', Coralogix.Severity.INFO, 'worker')
+                    os._exit(0 if LoggerManager._pending_size() == 0 else 1)
+                except BaseException:
+                    os._exit(2)
+            _, status = os.waitpid(pid, 0)
+            self.assertEqual(os.WEXITSTATUS(status), 0)
+
+            def received():
+                with LoggerManager._mutex:
+                    LoggerManager._collect()
+                    return any(b'"From worker"' in entry.payload for entry in LoggerManager._buffer)
+            self.assertTrue(wait_for(received))
+        finally:
+            LoggerManager.stop_collector()
+            with LoggerManager._mutex:
+                LoggerManager._collect()
+                LoggerManager._buffer.take(len(LoggerManager._buffer))
+                LoggerManager._buffer_size = 0
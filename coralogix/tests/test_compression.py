@@ -0,0 +1,105 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import os
+import json
+import unittest
+from .helpers import TestCase, StubServer
+from coralogix.compression import ENCODINGS, compress, decompress, is_available, zstandard
+from coralogix.constants import Coralogix
+from coralogix.http import CoralogixHTTPSender
+from coralogix.manager import LoggerManager
+
+
+class TestCompression(TestCase):
+    def tearDown(self):
+        CoralogixHTTPSender.set_compression(None)
+        super(TestCompression, self).tearDown()
+
+    def send_bulk(self, url, count=50):
+        CoralogixHTTPSender.send_request({
+            'privateKey': self.PRIVATE_KEY,
+            'applicationName': self.APP_NAME,
+            'subsystemName': self.SUBSYSTEM_NAME,
+            'logEntries': [
+                {'text': 'Test message {}!'.format(index), 'severity': 3}
+                for index in range(count)
+            ],
+        }, url=url)
+
+    def test_compress_round_trip(self):
+        data = b'{"text":"Test message!"}' * 100
+        for encoding in ENCODINGS:
+            if not is_available(encoding):
+                continue
+            with self.subTest(encoding=encoding):
+                compressed = compress(data, encoding)
+                self.assertLess(len(compressed), len(data))
+                self.assertEqual(decompress(compressed, encoding), data)
+
+    def test_invalid_compression(self):
+        with self.assertRaises(ValueError):
+            CoralogixHTTPSender.set_compression('brotli')
+
+    @unittest.skipIf(zstandard is not None, 'zstandard is installed')
+    def test_zstd_fallback(self):
+        self.assertEqual(CoralogixHTTPSender.set_compression('zstd'), 'gzip')
+
+    def test_send_request_compressed(self):
+        for encoding in ('gzip', 'deflate', 'zstd'):
+            if not is_available(encoding):
+                continue
+            with self.subTest(encoding=encoding), StubServer() as server:
+                CoralogixHTTPSender.set_compression(encoding, 1)
+                self.send_bulk(server.url())
+
+                _, _, headers, body = server.posts[0]
+                self.assertEqual(headers['Content-Encoding'], encoding)
+                payload = json.loads(body.decode('utf8'))
+                self.assertEqual(len(payload), 50)
+                self.assertEqual(payload[7]['text'], 'Test message 7!')
+                self.assertEqual(payload[7]['applicationName'], self.APP_NAME)
+                self.assertLess(CoralogixHTTPSender.compression_ratio(), 1.0)
+
+    def test_chunk_size_by_wire_size(self):
+        wire_chunk_size = Coralogix.MAX_LOG_WIRE_CHUNK_SIZE
+        try:
+            Coralogix.MAX_LOG_WIRE_CHUNK_SIZE = 1024 ** 2
+            self.assertEqual(LoggerManager._chunk_size(), Coralogix.MAX_LOG_CHUNK_SIZE)
+
+            with StubServer() as server:
+                CoralogixHTTPSender.set_compression('gzip')
+                self.send_bulk(server.url())
+            ratio = CoralogixHTTPSender.compression_ratio()
+            self.assertLess(ratio, 1.0)
+            self.assertAlmostEqual(
+                LoggerManager._chunk_size(),
+                min(1024 ** 2 / ratio, Coralogix.MAX_LOG_BUFFER_SIZE)
+            )
+        finally:
+            Coralogix.MAX_LOG_WIRE_CHUNK_SIZE = wire_chunk_size
+
+    def test_oversized_compressed_bulk_is_split(self):
+        wire_chunk_size = Coralogix.MAX_LOG_WIRE_CHUNK_SIZE
+        try:
+            Coralogix.MAX_LOG_WIRE_CHUNK_SIZE = 2048
+            with StubServer() as server:
+                CoralogixHTTPSender.set_compression('gzip')
+                CoralogixHTTPSender.send_request({
+                    'privateKey': self.PRIVATE_KEY,
+                    'applicationName': self.APP_NAME,
+                    'subsystemName': self.SUBSYSTEM_NAME,
+                    # Random text barely compresses, the bulk is larger than the limit
+                    'logEntries': [
+                        {'text': os.urandom(64).hex(), 'severity': 3} for _ in range(100)
+                    ],
+                }, url=server.url())
+
+                self.assertGreater(len(server.posts), 1)
+                texts = []
+                for _, _, headers, body in server.posts:
+                    self.assertLessEqual(int(headers['Content-Length']), 2048)
+                    texts.extend(entry['text'] for entry in json.loads(body.decode('utf8')))
+                self.assertEqual(len(texts), 100)
+        finally:
+            Coralogix.MAX_LOG_WIRE_CHUNK_SIZE = wire_chunk_size
@@ -1,8 +1,10 @@
 #!/usr/bin/python
 # -*- coding: utf-8 -*-
 
+import os
+from unittest import mock
 from .helpers import TestCase
-from coralogix.constants import Coralogix
+from coralogix.constants import Coralogix, _env_seconds
 
 
 class TestConstants(TestCase):
@@ -15,3 +17,12 @@ class TestConstants(TestCase):
         self.assertEqual(Coralogix.map_severity(50), Coralogix.Severity.CRITICAL)
         self.assertEqual(Coralogix.map_severity('default'), Coralogix.Severity.INFO)
         self.assertEqual(Coralogix.map_severity(13), Coralogix.Severity.INFO)
+
+    def test_env_seconds(self):
+        values = (('2.5', 2.5), ('0', 0), ('', 8), ('8s', 8), ('-1', 8), ('nan', 8), ('inf', 8))
+        for value, expected in values:
+            with self.subTest(value=value), \
+                    mock.patch.dict(os.environ, {'CORALOGIX_SHUTDOWN_TIMEOUT': value}):
+                self.assertEqual(_env_seconds('CORALOGIX_SHUTDOWN_TIMEOUT', 8), expected)
+        with mock.patch.dict(os.environ, clear=True):
+            self.assertEqual(_env_seconds('CORALOGIX_SHUTDOWN_TIMEOUT', 8), 8)
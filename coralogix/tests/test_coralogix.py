@@ -75,3 +75,132 @@ class TestCoralogixLogger(TestCase):
                 )
             )
         )
+
+    def test_deferred_emit_formats_on_sending_thread(self):
+        import sys
+        import time
+        import json
+        import logging
+        from threading import Thread
+        from coralogix.manager import LoggerManager
+        handler = CoralogixLogger(
+            private_key=self.PRIVATE_KEY,
+            app_name=self.APP_NAME,
+            subsystem=self.SUBSYSTEM_NAME,
+            region=self.REGION,
+            deferred=True
+        )
+        handler.setFormatter(logging.Formatter('%(levelname)s %(message)s'))
+        logger = logging.getLogger('coralogix.tests.deferred')
+        logger.propagate = False
+        logger.addHandler(handler)
+        # The sending thread may take the record from the queue at any time
+        snapshots = []
+        prepare = handler.prepare
+        handler.prepare = lambda record: snapshots.append(prepare(record)) or snapshots[-1]
+        try:
+            with LoggerManager._mutex:
+                LoggerManager._collect()
+                LoggerManager._buffer.take(len(LoggerManager._buffer))
+                LoggerManager._priority_buffer.take(len(LoggerManager._priority_buffer))
+                # The handler lock is not needed to emit in deferred mode
+                with handler.lock:
+                    try:
+                        1 / 0
+                    except ZeroDivisionError:
+                        thread = Thread(
+                            target=logger.error,
+                            args=('Failed %s', 'job'),
+                            kwargs={'exc_info': sys.exc_info()}
+                        )
+                        thread.start()
+                        thread.join(5)
+                self.assertFalse(thread.is_alive())
+                record, = snapshots
+                # Only the snapshot is queued, without the traceback frames
+                self.assertEqual(record.msg, 'Failed job')
+                self.assertIsNone(record.args)
+                self.assertIsNone(record.exc_info)
+                self.assertTrue(record.exc_text.startswith('Traceback'))
+
+                deadline = time.monotonic() + 5
+                while not len(LoggerManager._priority_buffer) and time.monotonic() < deadline:
+                    LoggerManager._format_records()
+                    LoggerManager._collect()
+                    time.sleep(0.01)
+                # Errors take the priority lane
+                entry = json.loads(LoggerManager._priority_buffer[-1].payload)
+                self.assertTrue(entry['text'].startswith('ERROR Failed job\nTraceback'))
+                self.assertEqual(entry['category'], 'coralogix.tests.deferred')
+                self.assertEqual(entry['timestamp'], record.created * 1000 + LoggerManager._time_delta)
+        finally:
+            logger.removeHandler(handler)
+            with LoggerManager._mutex:
+                LoggerManager._records.clear()
+                LoggerManager._collect()
+                LoggerManager._buffer.take(len(LoggerManager._buffer))
+                LoggerManager._priority_buffer.take(len(LoggerManager._priority_buffer))
+                LoggerManager._buffer_size = 0
+
+    def test_deferred_record_ignores_later_changes(self):
+        import json
+        import time
+        import logging
+        from coralogix.manager import LoggerManager
+        handler = CoralogixLogger(
+            private_key=self.PRIVATE_KEY,
+            app_name=self.APP_NAME,
+            subsystem=self.SUBSYSTEM_NAME,
+            region=self.REGION,
+            deferred=True
+        )
+        record = logging.LogRecord('coralogix.tests.deferred', logging.INFO, __file__, 1,
+                                   'Order %s', (['pending'],), None)
+        try:
+            with LoggerManager._mutex:
+                LoggerManager._collect()
+                LoggerManager._buffer.take(len(LoggerManager._buffer))
+                handler.handle(record)
+                record.args[0][0] = 'paid'
+                record.msg = 'Changed %s'
+                # The sending thread may format the record meanwhile
+                deadline = time.monotonic() + 5
+                while not len(LoggerManager._buffer) and time.monotonic() < deadline:
+                    LoggerManager._format_records()
+                    LoggerManager._collect()
+                    time.sleep(0.01)
+                entry = json.loads(LoggerManager._buffer[-1].payload)
+                self.assertEqual(entry['text'], "Order ['pending']")
+        finally:
+            with LoggerManager._mutex:
+                LoggerManager._records.clear()
+                LoggerManager._collect()
+                LoggerManager._buffer.take(len(LoggerManager._buffer))
+                LoggerManager._buffer_size = 0
+
+    def test_handler_with_own_manager(self):
+        from coralogix.manager import LoggerManager
+        manager = LoggerManager()
+        try:
+            # Holding the manager mutex keeps the sending thread from taking the logs
+            with manager._mutex:
+                handler = CoralogixLogger(
+                    private_key=self.PRIVATE_KEY,
+                    app_name='Other application',
+                    subsystem=self.SUBSYSTEM_NAME,
+                    region=self.REGION,
+                    manager=manager
+                )
+                self.assertTrue(manager.configured)
+                self.assertEqual(manager._bulk_template['applicationName'], 'Other application')
+                self.assertNotEqual(LoggerManager._bulk_template['applicationName'], 'Other application')
+                enqueued = LoggerManager.stats()['records_enqueued']
+                handler.info('Test message!')
+                # The init message and the log
+                self.assertEqual(manager.stats()['records_enqueued'], 2)
+                self.assertEqual(LoggerManager.stats()['records_enqueued'], enqueued)
+                manager._collect()
+                manager._buffer.take(len(manager._buffer))
+                manager.configured = False
+        finally:
+            manager.close()
@@ -2,6 +2,9 @@
 # -*- coding: utf-8 -*-
 
 from __future__ import with_statement
+import os
+import time
+import tempfile
 from io import StringIO
 from contextlib import redirect_stdout
 from .helpers import TestCase
@@ -83,3 +86,74 @@ class TestDebugLogger(TestCase):
             DebugLogger.exception(34, Exception('Test exception'))
         output = f.getvalue()
         self.assertTrue(output.startswith('Failed to print log:'))
+
+    def test_lazy_arguments(self):
+        class Argument(object):
+            formatted = 0
+
+            def __format__(self, spec):
+                Argument.formatted += 1
+                return 'argument'
+
+        f = StringIO()
+        with redirect_stdout(f):
+            DebugLogger.info('Test {} message', Argument())
+            DebugLogger.debug_mode = False
+            DebugLogger.info('Test {} message', Argument())
+        self.assertEqual(Argument.formatted, 1)
+        self.assertEqual(f.getvalue().count('Test argument message'), 1)
+
+    def test_level(self):
+        f = StringIO()
+        try:
+            DebugLogger.configure(level='warning')
+            self.assertFalse(DebugLogger.enabled('INFO'))
+            self.assertTrue(DebugLogger.enabled('ERROR'))
+            with redirect_stdout(f):
+                DebugLogger.info('Test info message')
+                DebugLogger.warning('Test warning message')
+        finally:
+            DebugLogger.configure(level='DEBUG')
+        output = f.getvalue()
+        self.assertNotIn('Test info message', output)
+        self.assertIn('Test warning message', output)
+
+    def test_repeated_errors(self):
+        f = StringIO()
+        try:
+            DebugLogger.configure(repeat_interval=0.2)
+            with redirect_stdout(f):
+                for attempt in range(5):
+                    DebugLogger.error('Test repeated error {}', attempt)
+                time.sleep(0.2)
+                DebugLogger.error('Test repeated error {}', 5)
+        finally:
+            DebugLogger.configure(repeat_interval=60)
+        output = f.getvalue()
+        self.assertIn('Test repeated error 0', output)
+        self.assertNotIn('Test repeated error 1', output)
+        self.assertIn('Test repeated error 5 (4 similar messages suppressed)', output)
+
+    def test_recent_and_file(self):
+        path = os.path.join(tempfile.mkdtemp(), 'debug.log')
+        DebugLogger.debug_mode = False
+        try:
+            DebugLogger.configure(recent=2, path=path)
+            self.assertTrue(DebugLogger.enabled('DEBUG'))
+            for index in range(3):
+                DebugLogger.info('Test message {}', index)
+            try:
+                raise ValueError('Test exception')
+            except ValueError as exc:
+                DebugLogger.exception('Test exception message', exc)
+            recent = DebugLogger.recent()
+        finally:
+            DebugLogger.configure(recent=0, path='')
+        self.assertFalse(DebugLogger.enabled('ERROR'))
+        self.assertEqual(len(recent), 2)
+        self.assertIn('Test message 2', recent[0])
+        self.assertIn('Traceback', recent[1])
+        with open(path) as output:
+            lines = output.read()
+        self.assertIn('Test message 0', lines)
+        self.assertIn('ValueError: Test exception', lines)
@@ -0,0 +1,70 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import json
+from .helpers import TestCase
+from coralogix.constants import Coralogix
+from coralogix.dedup import Deduplicator
+from coralogix.stats import DROP_DUPLICATE
+
+
+class TestDeduplicator(TestCase):
+    def test_repeats_within_window(self):
+        dedup = Deduplicator(window=10, max_keys=100)
+        self.assertEqual(dedup.add(('a',), 100, {}), (True, []))
+        self.assertEqual(dedup.add(('a',), 101, {}), (False, ()))
+        self.assertEqual(dedup.add(('a',), 105, {}), (False, ()))
+        self.assertTrue(dedup.add(('b',), 105, {})[0])
+
+        # A repeat after the window opens a new one and closes the old
+        keep, closed = dedup.add(('a',), 111, {})
+        self.assertTrue(keep)
+        self.assertEqual([(window.count, window.first, window.last) for window in closed], [(2, 100, 105)])
+
+    def test_expire(self):
+        dedup = Deduplicator(window=10, max_keys=100)
+        dedup.add(('a',), 100, {})
+        dedup.add(('a',), 102, {})
+        dedup.add(('b',), 100, {})
+        self.assertEqual(dedup.expire(105), [])
+        closed = dedup.expire(113)
+        self.assertEqual([window.key for window in closed], [('a',)])
+        self.assertEqual(len(dedup), 0)
+
+    def test_bounded_state(self):
+        dedup = Deduplicator(window=10, max_keys=32, shards=4)
+        dedup.add((0,), 100, {})
+        dedup.add((0,), 100, {})
+        closed = []
+        for index in range(1, 1000):
+            closed.extend(dedup.add((index,), 100, {})[1])
+        self.assertLessEqual(len(dedup), 32)
+        self.assertEqual([window.key for window in closed], [(0,)])
+
+
+class TestManagerDedup(TestCase):
+    def test_add_logline_collapses_repeats(self):
+        from coralogix.manager import LoggerManager
+        manager = LoggerManager(dedup_window=60)
+        try:
+            for _ in range(50):
+                manager.add_logline('Connection refused', Coralogix.Severity.ERROR, 'db',
+                                    className='pool', methodName='connect')
+            manager.add_logline('Connection refused', Coralogix.Severity.ERROR, 'db',
+                                className='pool', methodName='close')
+            stats = manager.stats()
+            self.assertEqual(stats['records_enqueued'], 2)
+            self.assertEqual(stats['records_dropped'][DROP_DUPLICATE], 49)
+
+            manager._flush_duplicates(force=True)
+            with manager._mutex:
+                manager._collect()
+                entry = manager._priority_buffer[-1].to_dict()
+            summary = json.loads(entry['text'])
+            self.assertEqual(summary['message'], 'Connection refused')
+            self.assertEqual(summary['duplicates'], 49)
+            self.assertLessEqual(summary['firstTimestamp'], summary['lastTimestamp'])
+            self.assertEqual(entry['methodName'], 'connect')
+            self.assertEqual(entry['severity'], Coralogix.Severity.ERROR)
+        finally:
+            manager.close()
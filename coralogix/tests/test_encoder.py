@@ -0,0 +1,83 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import json
+import uuid
+import decimal
+import datetime
+from enum import Enum
+from .helpers import TestCase
+from coralogix.constants import Coralogix
+from coralogix.encoder import ENCODERS, default, dumps, get_encoder, is_available, set_encoder
+
+
+class Color(Enum):
+    RED = 'red'
+
+
+class Opaque(object):
+    def __str__(self):
+        return 'opaque'
+
+
+class TestEncoder(TestCase):
+    def tearDown(self):
+        super(TestEncoder, self).tearDown()
+        set_encoder()
+
+    def test_default_converts_common_types(self):
+        self.assertEqual(default(datetime.datetime(2024, 1, 2, 3, 4, 5)), '2024-01-02T03:04:05')
+        self.assertEqual(default(datetime.date(2024, 1, 2)), '2024-01-02')
+        self.assertEqual(default(datetime.timedelta(seconds=90)), 90.0)
+        self.assertEqual(default(decimal.Decimal('1.10')), '1.10')
+        self.assertEqual(default(uuid.UUID(int=1)), '00000000-0000-0000-0000-000000000001')
+        self.assertEqual(default(Color.RED), 'red')
+        self.assertEqual(default(b'\xffbytes'), u'�bytes')
+        self.assertEqual(default({1}), [1])
+        self.assertEqual(default(Opaque()), 'opaque')
+
+    def test_encoders_never_raise(self):
+        record = {
+            'text': u'Test message! ש',
+            'severity': 3,
+            'timestamp': 1700000000000.5,
+            'created': datetime.datetime(2024, 1, 2, 3, 4, 5),
+            'amount': decimal.Decimal('1.10'),
+            'request': uuid.UUID(int=1),
+            'object': Opaque(),
+            'big': 2 ** 70,
+        }
+        for name, _ in ENCODERS:
+            if not is_available(name):
+                continue
+            with self.subTest(encoder=name):
+                self.assertEqual(set_encoder(name).name, name)
+                decoded = json.loads(dumps(record).decode('utf8'))
+                self.assertEqual(decoded['text'], record['text'])
+                self.assertEqual(decoded['amount'], '1.10')
+                self.assertEqual(decoded['request'], str(record['request']))
+                self.assertEqual(decoded['object'], 'opaque')
+                self.assertEqual(decoded['big'], 2 ** 70)
+                self.assertTrue(decoded['created'].startswith('2024-01-02T03:04:05'))
+
+    def test_set_encoder(self):
+        self.assertTrue(is_available('json'))
+        self.assertIn(get_encoder().name, [name for name, _ in ENCODERS if is_available(name)])
+        with self.assertRaises(ValueError):
+            set_encoder('invalid')
+        encoder = set_encoder(lambda obj: json.dumps(obj, sort_keys=True))
+        self.assertEqual(dumps({'b': 1, 'a': 2}), b'{"a": 2, "b": 1}')
+        self.assertIs(get_encoder(), encoder)
+
+    def test_add_logline_keeps_non_json_fields(self):
+        from coralogix.manager import LoggerManager
+        with LoggerManager._mutex:
+            LoggerManager.add_logline(
+                'Test message!',
+                Coralogix.Severity.INFO,
+                Coralogix.CORALOGIX_CATEGORY,
+                created=None,
+                amount=decimal.Decimal('1.10')
+            )
+            shard = LoggerManager._shard()
+            self.assertEqual(shard.entries[-1].to_dict()['amount'], '1.10')
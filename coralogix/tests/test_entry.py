@@ -0,0 +1,61 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import json
+from .helpers import TestCase
+from coralogix.constants import Coralogix
+from coralogix.entry import LogEntry
+
+
+class TestLogEntry(TestCase):
+    def create_entry(self, text='Test message!'):
+        return LogEntry.from_dict({
+            'text': text,
+            'timestamp': 1000.0,
+            'severity': int(Coralogix.Severity.INFO),
+            'category': Coralogix.CORALOGIX_CATEGORY,
+        })
+
+    def test_from_dict(self):
+        entry = self.create_entry()
+        self.assertIsInstance(entry.payload, bytes)
+        self.assertEqual(entry.size, len(entry.payload))
+        self.assertEqual(entry.severity, Coralogix.Severity.INFO)
+        self.assertEqual(entry.timestamp, 1000.0)
+        self.assertEqual(entry.to_dict()['text'], 'Test message!')
+
+    def test_bulk_size(self):
+        entries = [self.create_entry(), self.create_entry(u'Тестовое сообщение')]
+        self.assertEqual(LogEntry.bulk_size(entries), len(LogEntry.join(entries)))
+        self.assertEqual(LogEntry.bulk_size([]), len(LogEntry.join([])))
+
+    def test_join_with_common_fields(self):
+        entries = [self.create_entry(), LogEntry.from_dict({'applicationName': 'override'})]
+        result = json.loads(LogEntry.join(entries, {
+            'applicationName': 'app',
+            'subsystemName': 'sub',
+        }).decode('utf8'))
+        self.assertEqual(len(result), 2)
+        self.assertEqual(result[0]['applicationName'], 'app')
+        self.assertEqual(result[0]['subsystemName'], 'sub')
+        self.assertEqual(result[0]['text'], 'Test message!')
+        self.assertEqual(result[1]['applicationName'], 'override')
+
+    def test_join_skips_common_fields_set_by_entry(self):
+        entries = [
+            LogEntry.from_dict({'applicationName': 'override', 'text': 'first'}),
+            LogEntry.from_dict({'applicationName': 'a', 'subsystemName': 'b'}),
+            LogEntry.from_dict({'text': 'applicationName'}),
+        ]
+        payload = LogEntry.join(entries, {
+            'applicationName': 'app',
+            'subsystemName': 'sub',
+        }).decode('utf8')
+        self.assertEqual(payload.count('"applicationName":'), 3)
+        self.assertEqual(payload.count('"subsystemName":'), 3)
+        result = json.loads(payload)
+        self.assertEqual(result[0], {
+            'applicationName': 'override', 'subsystemName': 'sub', 'text': 'first'})
+        self.assertEqual(result[1], {'applicationName': 'a', 'subsystemName': 'b'})
+        self.assertEqual(result[2], {
+            'applicationName': 'app', 'subsystemName': 'sub', 'text': 'applicationName'})
@@ -112,3 +112,64 @@ class TestCoralogixHTTPSender(TestCase):
         )
 
         CoralogixHTTPSender._mutex = mutex_backup
+
+    def test_send_request_reuses_connection(self):
+        from .helpers import StubServer
+        with StubServer() as server:
+            CoralogixHTTPSender._session = None
+            for _ in range(3):
+                CoralogixHTTPSender.send_request({
+                    'privateKey': self.PRIVATE_KEY,
+                    'applicationName': self.APP_NAME,
+                    'subsystemName': self.SUBSYSTEM_NAME,
+                    'logEntries': [{'text': 'Test message!', 'severity': 3}],
+                }, url=server.url())
+            stats = CoralogixHTTPSender.connection_stats()
+            self.assertEqual(len(server.posts), 3)
+            self.assertEqual(stats['requests'], 3)
+            self.assertEqual(stats['connections'], 1)
+            self.assertEqual(stats['reused'], 2)
+
+    def test_session_rebuilt_after_fork(self):
+        session = CoralogixHTTPSender._get_session()
+        self.assertIs(CoralogixHTTPSender._get_session(), session)
+        CoralogixHTTPSender._session_pid = -1
+        self.assertIsNot(CoralogixHTTPSender._get_session(), session)
+
+    def test_warm_up(self):
+        from .helpers import StubServer
+        with StubServer() as server:
+            CoralogixHTTPSender._session = None
+            self.assertTrue(CoralogixHTTPSender.warm_up(server.url()))
+            CoralogixHTTPSender.send_request({
+                'privateKey': self.PRIVATE_KEY,
+                'logEntries': [{'text': 'Test message!', 'severity': 3}],
+            }, url=server.url())
+            self.assertEqual(CoralogixHTTPSender.connection_stats()['connections'], 1)
+            self.assertEqual(server.requests[0][0], 'HEAD')
+
+    def test_send_request_encodes_bulk_once(self):
+        from .helpers import StubServer
+        retry_interval = Coralogix.HTTP_SEND_RETRY_INTERVAL
+        build_request = CoralogixHTTPSender.__dict__['_build_request']
+        calls = []
+
+        def counting_build_request(cls, bulk):
+            calls.append(bulk)
+            return build_request.__func__(cls, bulk)
+
+        Coralogix.HTTP_SEND_RETRY_INTERVAL = 0.01
+        CoralogixHTTPSender._build_request = classmethod(counting_build_request)
+        try:
+            with StubServer(status=503) as server:
+                CoralogixHTTPSender.send_request({
+                    'privateKey': self.PRIVATE_KEY,
+                    'logEntries': [{'text': 'Test message!', 'severity': 3}],
+                }, url=server.url())
+                posts = server.posts
+        finally:
+            CoralogixHTTPSender._build_request = build_request
+            Coralogix.HTTP_SEND_RETRY_INTERVAL = retry_interval
+        self.assertGreater(len(posts), 1)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(len(set(post[3] for post in posts)), 1)
@@ -62,6 +62,7 @@ class TestIntegration(TestCase):
         if LoggerManager._buffer:
             print(f"\nDebug: Buffer contains {len(LoggerManager._buffer)} entries")
             for i, entry in enumerate(LoggerManager._buffer):
+                entry = entry.to_dict()
                 entry_text = entry.get('text', 'MISSING')
                 print(f"Entry {i}: text='{entry_text}', severity={entry.get('severity')}, category={entry.get('category')}")
                 # Verify the test message is in the buffer
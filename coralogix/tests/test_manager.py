@@ -142,3 +142,404 @@ class TestLoggerManager(TestCase):
         self.assertIsNone(
             LoggerManager._send_bulk(True)
         )
+
+    def test_add_logline_encodes_once(self):
+        from coralogix.entry import LogEntry
+        # Holding the manager mutex keeps the sending thread from taking the entry
+        with LoggerManager._mutex:
+            size = LoggerManager._buffer.size + sum(shard.size for shard in LoggerManager._shards)
+            LoggerManager.add_logline(
+                'Test message!',
+                Coralogix.Severity.INFO,
+                Coralogix.CORALOGIX_CATEGORY,
+            )
+            shard = LoggerManager._shard()
+            entry = shard.entries[-1]
+        self.assertIsInstance(entry, LogEntry)
+        self.assertEqual(LoggerManager._buffer_size, size + entry.size)
+
+    def test_collect_shards(self):
+        from coralogix.entry import LogEntry
+        with LoggerManager._mutex:
+            LoggerManager._collect()
+            LoggerManager._buffer.take(len(LoggerManager._buffer))
+            for index, timestamp in enumerate((3, 1, 2)):
+                LoggerManager._shards[index].append(
+                    LogEntry.from_dict({'text': str(timestamp), 'timestamp': timestamp})
+                )
+            LoggerManager._collect()
+            self.assertEqual([entry.timestamp for entry in LoggerManager._buffer], [1, 2, 3])
+            self.assertTrue(all(not shard.entries for shard in LoggerManager._shards))
+            self.assertEqual(LoggerManager._buffer_size, LoggerManager._buffer.size)
+            LoggerManager._buffer.take(len(LoggerManager._buffer))
+            LoggerManager._buffer_size = 0
+
+    def test_threads_spread_over_shards(self):
+        from threading import Thread, Barrier
+        manager = LoggerManager()
+        try:
+            threads = 16
+            barrier = Barrier(threads)
+
+            def produce():
+                # All threads are alive at once, so none reuses the ident of another one
+                barrier.wait()
+                manager.add_logline('Test message!', Coralogix.Severity.INFO, Coralogix.CORALOGIX_CATEGORY)
+                barrier.wait()
+
+            workers = [Thread(target=produce) for _ in range(threads)]
+            for worker in workers:
+                worker.start()
+            for worker in workers:
+                worker.join()
+            filled = [shard for shard in manager._shards if shard.entries]
+            # Other threads may take slots meanwhile, so a few test threads may share a shard
+            self.assertGreater(len(filled), min(threads, len(manager._shards)) // 2)
+        finally:
+            manager.close(timeout=0)
+
+    def test_send_bulk_keeps_logs_when_senders_busy(self):
+        pool = LoggerManager._pool
+        reserved = 0
+        while pool.reserve():
+            reserved += 1
+        try:
+            LoggerManager.add_logline(
+                'Test message!',
+                Coralogix.Severity.INFO,
+                Coralogix.CORALOGIX_CATEGORY,
+            )
+            pending = lambda: len(LoggerManager._buffer) + sum(
+                len(shard.entries) for shard in LoggerManager._shards
+            )
+            size = pending()
+            LoggerManager._send_bulk(time_sync=False, wait=False)
+            self.assertEqual(pending(), size)
+        finally:
+            LoggerManager._collect()
+            LoggerManager._buffer.take(len(LoggerManager._buffer))
+            LoggerManager._buffer_size = 0
+            for _ in range(reserved):
+                pool.release()
+
+    def clear_buffer(self):
+        LoggerManager._collect()
+        LoggerManager._buffer.take(len(LoggerManager._buffer))
+        LoggerManager._buffer_size = 0
+
+    def test_next_send_delay(self):
+        threshold = Coralogix.SEND_SIZE_THRESHOLD
+        with LoggerManager._mutex:
+            try:
+                self.clear_buffer()
+                self.assertIsNone(LoggerManager._next_send_delay())
+                LoggerManager.add_logline(
+                    'Test message!',
+                    Coralogix.Severity.INFO,
+                    Coralogix.CORALOGIX_CATEGORY,
+                )
+                delay = LoggerManager._next_send_delay()
+                self.assertGreater(delay, 0)
+                self.assertLessEqual(delay, Coralogix.MAX_SEND_LATENCY)
+                Coralogix.SEND_SIZE_THRESHOLD = 1
+                self.assertEqual(LoggerManager._next_send_delay(), 0)
+            finally:
+                Coralogix.SEND_SIZE_THRESHOLD = threshold
+                self.clear_buffer()
+
+    def test_next_send_delay_not_configured(self):
+        LoggerManager.configured = False
+        try:
+            self.assertIsNone(LoggerManager._next_send_delay())
+        finally:
+            LoggerManager.configured = True
+
+    def test_add_logline_wakes_sending_thread(self):
+        threshold = Coralogix.SEND_SIZE_THRESHOLD
+        with LoggerManager._mutex:
+            try:
+                self.clear_buffer()
+                LoggerManager._wakeup.clear()
+                # The first log arms the latency deadline
+                LoggerManager.add_logline('Test message!', Coralogix.Severity.INFO, 'test')
+                self.assertTrue(LoggerManager._wakeup.is_set())
+                LoggerManager._wakeup.clear()
+                LoggerManager.add_logline('Test message!', Coralogix.Severity.INFO, 'test')
+                self.assertFalse(LoggerManager._wakeup.is_set())
+                # Crossing the size threshold sends right away
+                Coralogix.SEND_SIZE_THRESHOLD = LoggerManager._pending_size() + 1
+                LoggerManager.add_logline('Test message!', Coralogix.Severity.INFO, 'test')
+                self.assertTrue(LoggerManager._wakeup.is_set())
+            finally:
+                Coralogix.SEND_SIZE_THRESHOLD = threshold
+                self.clear_buffer()
+
+    def test_stop_wakes_sending_thread(self):
+        LoggerManager._wakeup.clear()
+        LoggerManager.stop()
+        self.assertTrue(LoggerManager._wakeup.is_set())
+
+    def test_managers_are_isolated(self):
+        from coralogix.stats import DROP_BUFFER_FULL
+        enqueued = LoggerManager.stats()['records_enqueued']
+        noisy = LoggerManager(max_buffer_size=1024, sender_workers=1)
+        critical = LoggerManager()
+        try:
+            self.assertIn(noisy, LoggerManager._instances)
+            self.assertIsNot(noisy._pool, LoggerManager._pool)
+            self.assertEqual(noisy._pool.workers, 1)
+            for _ in range(100):
+                noisy.add_logline('x' * 100, Coralogix.Severity.INFO, 'noisy')
+            critical.add_logline('Critical message!', Coralogix.Severity.CRITICAL, 'critical')
+
+            noisy_stats, critical_stats = noisy.stats(), critical.stats()
+            self.assertLess(noisy_stats['records_enqueued'], 100)
+            self.assertGreater(noisy_stats['records_dropped'][DROP_BUFFER_FULL], 0)
+            self.assertEqual(critical_stats['records_enqueued'], 1)
+            self.assertEqual(critical_stats['records_dropped'][DROP_BUFFER_FULL], 0)
+            self.assertEqual(LoggerManager.stats()['records_enqueued'], enqueued)
+        finally:
+            noisy.close()
+            critical.close()
+        self.assertNotIn(noisy, LoggerManager._instances)
+        self.assertFalse(noisy._thread.is_alive())
+
+    def test_managers_have_own_sender(self):
+        from coralogix.http import CoralogixHTTPSender
+        wire_chunk_size = Coralogix.MAX_LOG_WIRE_CHUNK_SIZE
+        first, second = LoggerManager(), LoggerManager()
+        try:
+            Coralogix.MAX_LOG_WIRE_CHUNK_SIZE = 1024 ** 2
+            first._sender.set_compression('gzip')
+            self.assertIsNot(first._sender, second._sender)
+            self.assertIs(LoggerManager._sender, CoralogixHTTPSender)
+            self.assertEqual(first._sender._compression, 'gzip')
+            self.assertIsNone(second._sender._compression)
+            first._sender._compression_ratio = 0.1
+            self.assertEqual(second._sender.compression_ratio(), 1.0)
+            self.assertGreater(first._chunk_size(), second._chunk_size())
+            for _ in range(Coralogix.CIRCUIT_BREAKER_THRESHOLD):
+                first._sender.circuit_breaker.record_failure()
+            self.assertFalse(first._sender.circuit_breaker.ready())
+            self.assertTrue(second._sender.circuit_breaker.ready())
+            self.assertTrue(CoralogixHTTPSender.circuit_breaker.ready())
+        finally:
+            Coralogix.MAX_LOG_WIRE_CHUNK_SIZE = wire_chunk_size
+            first.close(timeout=0)
+            second.close(timeout=0)
+
+    def test_sender_pool_fits_workers(self):
+        manager = LoggerManager(sender_workers=Coralogix.HTTP_POOL_MAXSIZE + 4)
+        try:
+            adapter = manager._sender._get_session().get_adapter('https://')
+            self.assertEqual(adapter._pool_maxsize, Coralogix.HTTP_POOL_MAXSIZE + 4)
+            manager.sender_workers = Coralogix.HTTP_POOL_MAXSIZE + 8
+            manager.configure(sync_time=False)
+            adapter = manager._sender._get_session().get_adapter('https://')
+            self.assertEqual(adapter._pool_maxsize, Coralogix.HTTP_POOL_MAXSIZE + 8)
+        finally:
+            manager.configured = False
+            manager.close(timeout=0)
+
+    def test_unreferenced_manager_is_collected(self):
+        import gc
+        import time
+        import weakref
+        manager = LoggerManager(sender_workers=1)
+        manager.add_logline('Test message!', Coralogix.Severity.INFO, 'test')
+        thread, ref = manager._thread, weakref.ref(manager)
+        self.assertIn(manager, LoggerManager._instances)
+        del manager
+        # The sending thread holds the manager while it checks the buffer
+        deadline = time.monotonic() + 5
+        while ref() is not None and time.monotonic() < deadline:
+            gc.collect()
+            time.sleep(0.01)
+        self.assertIsNone(ref())
+        thread.join(5)
+        self.assertFalse(thread.is_alive())
+
+    def fill(self, manager, severity=Coralogix.Severity.DEBUG):
+        for _ in range(20):
+            manager.add_logline('x' * 100, severity, 'test')
+
+    def test_backpressure_drop_oldest(self):
+        from coralogix.stats import DROP_EVICTED
+        manager = LoggerManager(max_buffer_size=1024, backpressure='drop_oldest')
+        try:
+            self.fill(manager)
+            manager.add_logline('Newest message!', Coralogix.Severity.INFO, 'test')
+            with manager._mutex:
+                manager._collect()
+                entries = list(manager._buffer)
+            self.assertIn(b'Newest message!', entries[-1].payload)
+            stats = manager.stats()
+            self.assertGreater(stats['records_dropped'][DROP_EVICTED], 0)
+            self.assertEqual(stats['records_enqueued'] - stats['records_dropped'][DROP_EVICTED], len(entries))
+            self.assertEqual(manager._buffer_size, sum(entry.size for entry in entries))
+            self.assertLess(manager._buffer_size, 1024 + entries[-1].size)
+        finally:
+            manager.close()
+
+    def test_backpressure_drop_lowest_severity(self):
+        from coralogix.stats import DROP_EVICTED, DROP_BUFFER_FULL
+        manager = LoggerManager(max_buffer_size=1024, backpressure='drop_lowest_severity')
+        try:
+            self.fill(manager, Coralogix.Severity.WARNING)
+            dropped = manager.stats()['records_dropped'][DROP_BUFFER_FULL]
+            # Nothing buffered is less severe, the new log is dropped
+            manager.add_logline('Info message!', Coralogix.Severity.INFO, 'test')
+            self.assertEqual(manager.stats()['records_dropped'][DROP_BUFFER_FULL], dropped + 1)
+        finally:
+            manager.close()
+
+        manager = LoggerManager(max_buffer_size=1024, backpressure='drop_lowest_severity')
+        try:
+            self.fill(manager)
+            manager.add_logline('Warning message!', Coralogix.Severity.WARNING, 'test')
+            with manager._mutex:
+                manager._collect()
+                severities = [entry.severity for entry in manager._buffer]
+            self.assertEqual(severities[-1], Coralogix.Severity.WARNING)
+            self.assertGreater(manager.stats()['records_dropped'][DROP_EVICTED], 0)
+            self.assertEqual(manager._buffer_size, manager._buffer.size)
+        finally:
+            manager.close()
+
+    def test_backpressure_expire(self):
+        from coralogix.stats import DROP_EXPIRED
+        max_age = Coralogix.BACKPRESSURE_MAX_AGE
+        manager = LoggerManager(max_buffer_size=1024, backpressure='expire')
+        try:
+            self.fill(manager)
+            Coralogix.BACKPRESSURE_MAX_AGE = 0
+            manager.add_logline('Newest message!', Coralogix.Severity.INFO, 'test')
+            self.assertGreater(manager.stats()['records_dropped'][DROP_EXPIRED], 0)
+            self.assertEqual(manager._buffer_size, manager._pending_size())
+        finally:
+            Coralogix.BACKPRESSURE_MAX_AGE = max_age
+            manager.close()
+
+    def test_backpressure_block(self):
+        import time
+        from coralogix.stats import DROP_BUFFER_FULL
+        timeout = Coralogix.BACKPRESSURE_TIMEOUT
+        Coralogix.BACKPRESSURE_TIMEOUT = 0.2
+        manager = LoggerManager(max_buffer_size=1024)
+        try:
+            self.fill(manager)
+            dropped = manager.stats()['records_dropped'][DROP_BUFFER_FULL]
+            manager.backpressure = 'block'
+            # Nothing is sent by a manager which is not configured, the caller waits in vain
+            started = time.monotonic()
+            manager.add_logline('Newest message!', Coralogix.Severity.INFO, 'test')
+            self.assertGreaterEqual(time.monotonic() - started, 0.2)
+            self.assertEqual(manager.stats()['records_dropped'][DROP_BUFFER_FULL], dropped + 1)
+        finally:
+            Coralogix.BACKPRESSURE_TIMEOUT = timeout
+            manager.close()
+
+    def test_priority_lane(self):
+        from coralogix.http import CoralogixHTTPSender
+        from coralogix.stats import DROP_BUFFER_FULL
+        manager = LoggerManager(max_buffer_size=1024)
+        send_request = CoralogixHTTPSender.send_request
+        sent = []
+        CoralogixHTTPSender.send_request = staticmethod(lambda bulk, **kwargs: sent.append(bulk))
+        try:
+            self.fill(manager)
+            dropped = manager.stats()['records_dropped'][DROP_BUFFER_FULL]
+            manager._wakeup.clear()
+            # The buffer is full, the error takes the priority lane and is sent right away
+            manager.add_logline('Error message!', Coralogix.Severity.ERROR, 'test')
+            stats = manager.stats()
+            self.assertEqual(stats['records_dropped'][DROP_BUFFER_FULL], dropped)
+            self.assertEqual(stats['priority_buffer_records'], 1)
+            self.assertTrue(manager._wakeup.is_set())
+
+            manager._region = self.REGION
+            manager.configured = True
+            self.assertEqual(manager._next_send_delay(), 0)
+            manager._send_bulk(time_sync=False)
+            entries = sent[0]['logEntries']
+            self.assertIn(b'Error message!', entries[0].payload)
+            self.assertGreater(len(entries), 1)
+            self.assertEqual(manager.stats()['priority_buffer_records'], 0)
+        finally:
+            CoralogixHTTPSender.send_request = send_request
+            manager.configured = False
+            manager.close()
+
+    def test_backpressure_invalid_policy(self):
+        self.assertRaises(ValueError, LoggerManager, backpressure='drop_all')
+
+    def test_manager_configuration_is_independent(self):
+        manager = LoggerManager()
+        try:
+            self.assertFalse(manager.configured)
+            manager._bulk_template = {'applicationName': 'other'}
+            manager.configured = True
+            self.assertTrue(LoggerManager.configured)
+            self.assertNotEqual(LoggerManager._bulk_template, manager._bulk_template)
+            self.assertIsNone(manager._collector_path)
+        finally:
+            manager.configured = False
+            manager.close()
+
+    def flushing_manager(self, server):
+        import os
+        from unittest import mock
+        with mock.patch.dict(os.environ, {'CORALOGIX_LOG_URL': server.url()}):
+            manager = LoggerManager(sender_workers=2, send_size_threshold=10 * 1024 ** 2, max_send_latency=60)
+            manager.configure(sync_time=False, privateKey=self.PRIVATE_KEY, applicationName=self.APP_NAME,
+                              subsystemName=self.SUBSYSTEM_NAME, region=self.REGION)
+            # The init message goes first
+            manager.flush(timeout=5)
+        for index in range(100):
+            manager.add_logline('Test message {}!'.format(index), Coralogix.Severity.INFO, 'test')
+        return manager
+
+    def test_flush_drains_buffer(self):
+        from .helpers import StubServer
+        chunk_size = Coralogix.MAX_LOG_CHUNK_SIZE
+        with StubServer() as server:
+            Coralogix.MAX_LOG_CHUNK_SIZE = 2048
+            manager = self.flushing_manager(server)
+            try:
+                posts = len(server.posts)
+                result = manager.flush(timeout=10)
+                self.assertEqual(result, {'delivered': 100, 'dropped': 0, 'remaining': 0})
+                self.assertGreater(len(server.posts) - posts, 1)
+            finally:
+                Coralogix.MAX_LOG_CHUNK_SIZE = chunk_size
+                manager.close()
+
+    def test_close_owns_the_drain(self):
+        from .helpers import StubServer
+        with StubServer() as server:
+            manager = self.flushing_manager(server)
+            try:
+                manager.stop()
+                manager._thread.join(5)
+                self.assertFalse(manager._thread.is_alive())
+                # The sending thread does not flush on its own, the logs wait for close()
+                self.assertEqual(manager._remaining_records(), 100)
+            finally:
+                result = manager.close(timeout=10)
+        self.assertEqual(result, {'delivered': 100, 'dropped': 0, 'remaining': 0})
+
+    def test_flush_deadline(self):
+        import time
+        from .helpers import StubServer
+        with StubServer() as server:
+            manager = self.flushing_manager(server)
+            try:
+                server.delay = 3
+                started = time.monotonic()
+                result = manager.flush(timeout=0.5)
+                self.assertLess(time.monotonic() - started, 1.5)
+                # The bulk is still on its way
+                self.assertEqual(result, {'delivered': 0, 'dropped': 0, 'remaining': 100})
+                server.delay = 0
+            finally:
+                manager.close(timeout=5)
@@ -0,0 +1,66 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import time
+from threading import Event
+from .helpers import TestCase, StubServer
+from coralogix.http import CoralogixHTTPSender
+from coralogix.pool import SenderPool
+
+
+class TestSenderPool(TestCase):
+    def test_reserve_limit(self):
+        pool = SenderPool(1, 2)
+        self.assertTrue(pool.reserve())
+        self.assertTrue(pool.reserve())
+        self.assertFalse(pool.reserve())
+        self.assertFalse(pool.available())
+        pool.release()
+        self.assertTrue(pool.available())
+        pool.release()
+        self.assertTrue(pool.join(0))
+        pool.close()
+
+    def test_in_flight_not_below_workers(self):
+        pool = SenderPool(4, 1)
+        self.assertEqual(pool.max_in_flight, 4)
+        pool.close()
+
+    def test_submit_releases_place(self):
+        pool = SenderPool(2)
+        done = Event()
+        self.assertTrue(pool.reserve())
+        pool.submit(done.set)
+        self.assertTrue(pool.join(5))
+        self.assertTrue(done.is_set())
+        self.assertEqual(pool.in_flight, 0)
+        pool.close()
+
+    def test_failed_task_releases_place(self):
+        pool = SenderPool(1)
+        self.assertTrue(pool.reserve())
+        pool.submit(lambda: 1 / 0)
+        self.assertTrue(pool.join(5))
+        pool.close()
+
+    def send_bulks(self, server, workers, count=8):
+        pool = SenderPool(workers, workers)
+        started = time.time()
+        for index in range(count):
+            self.assertTrue(pool.reserve(timeout=None))
+            pool.submit(CoralogixHTTPSender.send_request, {
+                'privateKey': self.PRIVATE_KEY,
+                'logEntries': [{'text': 'Bulk {}'.format(index), 'severity': 3}],
+            }, url=server.url())
+        self.assertTrue(pool.join(30))
+        pool.close()
+        return time.time() - started
+
+    def test_throughput_scales_with_workers(self):
+        with StubServer(delay=0.2) as server:
+            single = self.send_bulks(server, 1)
+            concurrent = self.send_bulks(server, 4)
+            self.assertEqual(len(server.posts), 16)
+        # 8 bulks with 200ms latency: ~1.6s with one sender, ~0.4s with four
+        self.assertGreater(single, 1.5)
+        self.assertLess(concurrent, single / 2)
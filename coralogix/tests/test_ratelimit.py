@@ -0,0 +1,70 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import json
+import time
+from .helpers import TestCase
+from coralogix.constants import Coralogix
+from coralogix.ratelimit import RateLimiter, TokenBucket
+from coralogix.stats import DROP_RATE_LIMITED
+
+
+class TestTokenBucket(TestCase):
+    def test_burst_then_rate(self):
+        bucket = TokenBucket(rate=100, burst=5)
+        self.assertEqual([bucket.take() for _ in range(6)], [True] * 5 + [False])
+        self.assertEqual(bucket.suppressed, 1)
+        time.sleep(0.05)
+        self.assertTrue(bucket.take())
+        self.assertEqual(bucket.take_suppressed(), 1)
+        self.assertEqual(bucket.suppressed, 0)
+
+
+class TestRateLimiter(TestCase):
+    def test_limits_by_key(self):
+        limiter = RateLimiter({
+            'noisy': (0.001, 2),
+            Coralogix.Severity.DEBUG: (0.001, 3),
+            ('payments', Coralogix.Severity.INFO): (0.001, 1),
+        })
+        debug, info = Coralogix.Severity.DEBUG, Coralogix.Severity.INFO
+        self.assertEqual([limiter.allow('noisy', info) for _ in range(3)], [True, True, False])
+        self.assertEqual([limiter.allow('payments', info) for _ in range(2)], [True, False])
+        self.assertTrue(limiter.allow('payments', Coralogix.Severity.ERROR))
+        self.assertTrue(limiter.allow('other', info))
+        # Records suppressed by a category limit do not use up the severity limit
+        self.assertFalse(limiter.allow('noisy', debug))
+        self.assertEqual([limiter.allow('other', debug) for _ in range(4)], [True] * 3 + [False])
+        self.assertTrue(limiter.has_suppressed())
+        self.assertEqual(limiter.take_suppressed(), {
+            'noisy': 2,
+            int(debug): 1,
+            ('payments', int(info)): 1,
+        })
+        self.assertFalse(limiter.has_suppressed())
+
+
+class TestManagerRateLimits(TestCase):
+    def test_add_logline_drops_and_reports(self):
+        from coralogix.manager import LoggerManager
+        manager = LoggerManager(rate_limits={'noisy': (0.001, 10)})
+        try:
+            for _ in range(100):
+                manager.add_logline('Retry storm!', Coralogix.Severity.ERROR, 'noisy')
+            manager.add_logline('Test message!', Coralogix.Severity.INFO, 'quiet')
+            stats = manager.stats()
+            self.assertEqual(stats['records_enqueued'], 11)
+            self.assertEqual(stats['records_dropped'][DROP_RATE_LIMITED], 90)
+
+            # The summary is due once per interval
+            self.assertGreater(manager._report_rate_limits(), 0)
+            self.assertIsNone(manager._report_rate_limits(force=True))
+            self.assertEqual(manager.stats()['records_enqueued'], 12)
+            with manager._mutex:
+                manager._collect()
+                summary = json.loads(manager._buffer[-1].to_dict()['text'])
+            self.assertEqual(summary['suppressed'], 90)
+            self.assertEqual(summary['limits'], [{'suppressed': 90, 'category': 'noisy'}])
+            self.assertIsNone(manager._report_rate_limits())
+        finally:
+            manager.close()
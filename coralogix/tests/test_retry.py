@@ -0,0 +1,143 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import time
+from .helpers import TestCase, StubServer
+from coralogix.constants import Coralogix
+from coralogix.http import CoralogixHTTPSender
+from coralogix.retry import CircuitBreaker, backoff, is_retryable, CLOSED, OPEN, HALF_OPEN
+
+
+class TestBackoff(TestCase):
+    def test_exponential_with_jitter(self):
+        for attempt in range(1, 10):
+            limit = min(60, 2 * 2 ** (attempt - 1))
+            delays = [backoff(attempt, base=2, cap=60) for _ in range(50)]
+            self.assertTrue(all(0 <= delay <= limit for delay in delays))
+            self.assertGreater(len(set(delays)), 1)
+
+    def test_is_retryable(self):
+        self.assertTrue(is_retryable(429))
+        self.assertTrue(is_retryable(503))
+        self.assertFalse(is_retryable(200))
+        self.assertFalse(is_retryable(400))
+
+
+class TestCircuitBreaker(TestCase):
+    def test_opens_after_threshold(self):
+        breaker = CircuitBreaker(failure_threshold=3, reset_timeout=60)
+        for _ in range(2):
+            breaker.record_failure()
+            self.assertTrue(breaker.allow())
+        breaker.record_failure()
+        self.assertEqual(breaker.state, OPEN)
+        self.assertFalse(breaker.allow())
+        self.assertFalse(breaker.ready())
+        self.assertGreater(breaker.retry_in(), 59)
+
+    def test_success_resets_failures(self):
+        breaker = CircuitBreaker(failure_threshold=2)
+        breaker.record_failure()
+        breaker.record_success()
+        breaker.record_failure()
+        self.assertEqual(breaker.state, CLOSED)
+
+    def test_half_open_probe(self):
+        transitions = []
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.05)
+        breaker.add_listener(lambda old, new: transitions.append((old, new)))
+        breaker.record_failure()
+        time.sleep(0.06)
+        self.assertTrue(breaker.ready())
+        self.assertTrue(breaker.allow())
+        # A single probe at a time
+        self.assertFalse(breaker.allow())
+        self.assertIsNone(breaker.retry_in())
+        breaker.record_failure()
+        self.assertEqual(breaker.state, OPEN)
+        time.sleep(0.06)
+        self.assertTrue(breaker.allow())
+        breaker.record_success()
+        self.assertEqual(breaker.state, CLOSED)
+        self.assertEqual(transitions, [
+            (CLOSED, OPEN), (OPEN, HALF_OPEN), (HALF_OPEN, OPEN), (OPEN, HALF_OPEN), (HALF_OPEN, CLOSED)
+        ])
+
+
+class TestRetryScheduling(TestCase):
+    def test_failed_bulk_is_scheduled_not_slept(self):
+        from coralogix.manager import LoggerManager
+        bulk = {
+            'privateKey': self.PRIVATE_KEY,
+            'applicationName': self.APP_NAME,
+            'subsystemName': self.SUBSYSTEM_NAME,
+            'logEntries': [{'text': 'Test message!', 'severity': 3}],
+        }
+        with StubServer(status=503) as server:
+            try:
+                started = time.time()
+                LoggerManager._send_attempt(bulk, server.url(), 1)
+                self.assertLess(time.time() - started, Coralogix.HTTP_SEND_RETRY_INTERVAL)
+                self.assertEqual(len(LoggerManager._retries), 1)
+                due, _, _, _, attempt = LoggerManager._retries[0]
+                self.assertEqual(attempt, 2)
+                self.assertLessEqual(due, time.monotonic() + Coralogix.HTTP_SEND_RETRY_INTERVAL)
+
+                # Make the retry due and let it through
+                server.status = 200
+                with LoggerManager._retry_lock:
+                    LoggerManager._retries[0] = (0,) + LoggerManager._retries[0][1:]
+                LoggerManager._resend_retry()
+                self.assertTrue(LoggerManager._pool.join(5))
+                self.assertEqual(len(server.posts), 2)
+                self.assertEqual(LoggerManager._retries, [])
+            finally:
+                with LoggerManager._retry_lock:
+                    LoggerManager._retries = []
+                    LoggerManager._retry_size = 0
+
+    def test_retries_count_against_buffer_size(self):
+        from coralogix.http import BulkRequest
+        from coralogix.manager import LoggerManager
+        manager = LoggerManager(max_buffer_size=1000)
+        try:
+            manager._schedule_retry(BulkRequest(b'x' * 1000, {}, 10), 'http://127.0.0.1', 2, 60)
+            self.assertEqual(manager._used_size(), 1000)
+            self.assertEqual(manager.stats()['retries_pending_bytes'], 1000)
+            manager.add_logline('Test message!', Coralogix.Severity.INFO, 'test')
+            self.assertEqual(manager._pending_size(), 0)
+            self.assertEqual(manager.stats()['records_dropped']['buffer_full'], 1)
+
+            manager._retries[0] = (0,) + manager._retries[0][1:]
+            manager._pool.reserve = lambda: False
+            self.assertFalse(manager._resend_retry())
+            del manager._pool.reserve
+            manager._pool.submit = lambda *args: None
+            self.assertTrue(manager._resend_retry())
+            self.assertEqual(manager._used_size(), 0)
+            manager.add_logline('Test message!', Coralogix.Severity.INFO, 'test')
+            self.assertGreater(manager._pending_size(), 0)
+        finally:
+            manager.close(timeout=0)
+
+    def test_open_breaker_keeps_logs_in_buffer(self):
+        from coralogix.manager import LoggerManager
+        with LoggerManager._mutex:
+            LoggerManager.add_logline('Test message!', Coralogix.Severity.INFO, 'test')
+        for _ in range(Coralogix.CIRCUIT_BREAKER_THRESHOLD):
+            CoralogixHTTPSender.circuit_breaker.record_failure()
+        configured = LoggerManager.configured
+        LoggerManager.configured = True
+        try:
+            pending = LoggerManager._pending_size()
+            LoggerManager._send_bulk(time_sync=False, wait=False)
+            self.assertEqual(LoggerManager._pending_size(), pending)
+            self.assertEqual(LoggerManager._pool.in_flight, 0)
+            self.assertGreater(LoggerManager._next_send_delay(), 1)
+        finally:
+            LoggerManager.configured = configured
+            CoralogixHTTPSender.circuit_breaker.reset()
+            with LoggerManager._mutex:
+                LoggerManager._collect()
+                LoggerManager._buffer.take(len(LoggerManager._buffer))
+                LoggerManager._buffer_size = 0
@@ -0,0 +1,185 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import os
+import shutil
+import tempfile
+import unittest
+from .helpers import TestCase
+from coralogix.constants import Coralogix
+from coralogix.entry import LogEntry
+from coralogix.manager import LoggerManager
+from coralogix.spill import SpillFile, DATA_OFFSET, fcntl
+
+
+class SpillTestCase(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'spill.bin')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def create_entry(self, index):
+        return LogEntry.from_dict({
+            'text': 'message {}'.format(index) + 'x' * (index % 13),
+            'severity': 3,
+            'timestamp': 1000.0 + index
+        })
+
+
+class TestSpillFile(SpillTestCase):
+    def test_write_read_fifo(self):
+        spill = SpillFile(self.path, 4096)
+        entries = [self.create_entry(index) for index in range(10)]
+        for entry in entries:
+            self.assertTrue(spill.write(entry))
+        self.assertEqual(len(spill), 10)
+        result = spill.read(10 ** 6)
+        self.assertEqual([entry.payload for entry in result], [entry.payload for entry in entries])
+        self.assertEqual([entry.timestamp for entry in result], [entry.timestamp for entry in entries])
+        self.assertEqual(len(spill), 0)
+        self.assertEqual(spill.size, 0)
+        spill.close()
+
+    def test_read_max_size(self):
+        spill = SpillFile(self.path, 4096)
+        for index in range(10):
+            spill.write(self.create_entry(index))
+        result = spill.read(60)
+        self.assertTrue(result)
+        self.assertLessEqual(sum(entry.size for entry in result), 60)
+        self.assertEqual(len(spill), 10 - len(result))
+        # At least one entry is always returned
+        self.assertEqual(len(spill.read(1)), 1)
+        spill.close()
+
+    def test_capacity(self):
+        spill = SpillFile(self.path, 1024)
+        written = 0
+        while spill.write(self.create_entry(written)):
+            written += 1
+        self.assertGreater(written, 0)
+        self.assertEqual(len(spill), written)
+        self.assertLessEqual(spill.size, spill.capacity)
+        self.assertEqual(len(spill.read(10 ** 6)), written)
+        spill.close()
+
+    def test_wrap_around(self):
+        spill = SpillFile(self.path, 1024)
+        expected, index = [], 0
+        for _ in range(200):
+            for _ in range(3):
+                entry = self.create_entry(index)
+                if spill.write(entry):
+                    expected.append(entry.payload)
+                index += 1
+            for entry in spill.read(80):
+                self.assertEqual(entry.payload, expected.pop(0))
+        self.assertEqual([entry.payload for entry in spill.read(10 ** 6)], expected)
+        spill.close()
+
+    def test_recover_after_reopen(self):
+        spill = SpillFile(self.path, 2048)
+        for index in range(20):
+            spill.write(self.create_entry(index))
+        spill.read(100)
+        count = len(spill)
+        spill.close()
+        spill = SpillFile(self.path, 2048)
+        self.assertEqual(len(spill), count)
+        self.assertEqual(
+            [entry.payload for entry in spill.read(10 ** 6)],
+            [self.create_entry(index).payload for index in range(20 - count, 20)]
+        )
+        spill.close()
+
+    def test_recover_truncates_corrupted_record(self):
+        spill = SpillFile(self.path, 2048)
+        for index in range(5):
+            spill.write(self.create_entry(index))
+        spill.close()
+        # Damage the payload of the third record
+        with open(self.path, 'r+b') as spill_file:
+            offset = DATA_OFFSET
+            for index in range(2):
+                offset += 8 + 9 + self.create_entry(index).size
+            spill_file.seek(offset + 8 + 9 + 2)
+            spill_file.write(b'#')
+        spill = SpillFile(self.path, 2048)
+        self.assertEqual(len(spill), 2)
+        self.assertEqual(
+            [entry.payload for entry in spill.read(10 ** 6)],
+            [self.create_entry(index).payload for index in range(2)]
+        )
+        spill.close()
+
+    def test_corrupted_header(self):
+        with open(self.path, 'wb') as spill_file:
+            spill_file.write(b'\x01' * 4096)
+        spill = SpillFile(self.path, 4096)
+        self.assertEqual(len(spill), 0)
+        self.assertTrue(spill.write(self.create_entry(1)))
+        spill.close()
+
+    @unittest.skipIf(fcntl is None, 'file locks are not supported')
+    def test_locked_by_open_file(self):
+        spill = SpillFile(self.path, 4096)
+        self.assertTrue(spill.write(self.create_entry(1)))
+        with self.assertRaises(IOError):
+            SpillFile(self.path, 4096)
+        spill.close()
+        spill = SpillFile(self.path, 4096)
+        self.assertEqual(len(spill), 1)
+        spill.close()
+
+
+class TestManagerSpill(SpillTestCase):
+    def test_spilled_entries_go_before_newer_ones(self):
+        manager = LoggerManager()
+        try:
+            manager._spill = SpillFile(self.path, 4096)
+            manager._spill_process = os.getpid()
+            manager._spill.write(self.create_entry(1))
+            manager._shards[0].append(self.create_entry(2))
+            with manager._mutex:
+                manager._collect()
+                self.assertEqual([entry.timestamp for entry in manager._buffer], [1001.0, 1002.0])
+        finally:
+            manager._spill.close()
+            manager._spill = None
+            manager.close(timeout=0)
+
+    def test_overflow_spill_and_drain(self):
+        max_buffer_size = Coralogix.MAX_LOG_BUFFER_SIZE
+        spill, process = LoggerManager._spill, LoggerManager._spill_process
+        try:
+            with LoggerManager._mutex:
+                LoggerManager._collect()
+                LoggerManager._buffer.take(len(LoggerManager._buffer))
+                LoggerManager._buffer_size = 0
+                Coralogix.MAX_LOG_BUFFER_SIZE = 200
+                LoggerManager._spill = SpillFile(self.path, 4096)
+                LoggerManager._spill_process = os.getpid()
+                for index in range(20):
+                    LoggerManager.add_logline(
+                        'message {}'.format(index),
+                        Coralogix.Severity.INFO,
+                        Coralogix.CORALOGIX_CATEGORY
+                    )
+                self.assertGreater(len(LoggerManager._spill), 0)
+                spilled = len(LoggerManager._spill)
+                LoggerManager._collect()
+                # Buffer is still full, nothing is moved
+                self.assertEqual(len(LoggerManager._spill), spilled)
+                LoggerManager._buffer.take(len(LoggerManager._buffer))
+                LoggerManager._collect()
+                self.assertLess(len(LoggerManager._spill), spilled)
+                self.assertLessEqual(LoggerManager._buffer.size, Coralogix.MAX_LOG_BUFFER_SIZE)
+                self.assertEqual(LoggerManager._buffer_size, LoggerManager._buffer.size)
+                LoggerManager._buffer.take(len(LoggerManager._buffer))
+                LoggerManager._buffer_size = 0
+        finally:
+            Coralogix.MAX_LOG_BUFFER_SIZE = max_buffer_size
+            LoggerManager._spill.close()
+            LoggerManager._spill, LoggerManager._spill_process = spill, process
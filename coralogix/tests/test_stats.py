@@ -0,0 +1,116 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+from .helpers import TestCase, StubServer
+from coralogix.constants import Coralogix
+from coralogix.http import CoralogixHTTPSender
+from coralogix.stats import PipelineStats, LATENCY_BUCKETS, to_prometheus
+
+
+class TestPipelineStats(TestCase):
+    def create_bulk(self, count=3):
+        return {
+            'privateKey': self.PRIVATE_KEY,
+            'applicationName': self.APP_NAME,
+            'subsystemName': self.SUBSYSTEM_NAME,
+            'logEntries': [
+                {'text': 'message {}'.format(index), 'timestamp': 1.0, 'severity': 3}
+                for index in range(count)
+            ],
+        }
+
+    def test_latency_histogram(self):
+        stats = PipelineStats()
+        for seconds in (0.001, 0.02, 0.02, 100):
+            stats.observe_latency(seconds)
+        histogram = stats.snapshot()['http_latency']
+        self.assertEqual(histogram['count'], 4)
+        self.assertAlmostEqual(histogram['sum'], 100.041)
+        buckets = dict(histogram['buckets'])
+        self.assertEqual(buckets[0.005], 1)
+        self.assertEqual(buckets[0.025], 3)
+        self.assertEqual(buckets[LATENCY_BUCKETS[-1]], 3)
+        self.assertEqual(buckets[float('inf')], 4)
+
+    def test_batch_failed_drops_records(self):
+        stats = PipelineStats()
+        stats.batch_failed(7)
+        snapshot = stats.snapshot()
+        self.assertEqual(snapshot['batches_failed'], 1)
+        self.assertEqual(snapshot['records_dropped']['send_failed'], 7)
+
+    def test_send_request_records_batch(self):
+        stats = PipelineStats()
+        with StubServer() as server:
+            CoralogixHTTPSender.send_request(self.create_bulk(), url=server.url(), stats=stats)
+        snapshot = stats.snapshot()
+        self.assertEqual(snapshot['batches_sent'], 1)
+        self.assertEqual(snapshot['records_sent'], 3)
+        self.assertGreater(snapshot['bytes_sent'], 0)
+        self.assertEqual(snapshot['http_latency']['count'], 1)
+        self.assertEqual(snapshot['retries'], 0)
+
+    def test_send_request_records_failure(self):
+        stats = PipelineStats()
+        retry_interval = Coralogix.HTTP_SEND_RETRY_INTERVAL
+        threshold = Coralogix.CIRCUIT_BREAKER_THRESHOLD
+        Coralogix.HTTP_SEND_RETRY_INTERVAL = 0
+        Coralogix.CIRCUIT_BREAKER_THRESHOLD = Coralogix.HTTP_SEND_RETRY_COUNT + 2
+        try:
+            CoralogixHTTPSender.send_request(
+                self.create_bulk(), url='http://127.0.0.1:9/', stats=stats
+            )
+        finally:
+            Coralogix.HTTP_SEND_RETRY_INTERVAL = retry_interval
+            Coralogix.CIRCUIT_BREAKER_THRESHOLD = threshold
+        snapshot = stats.snapshot()
+        self.assertEqual(snapshot['batches_failed'], 1)
+        self.assertEqual(snapshot['retries'], Coralogix.HTTP_SEND_RETRY_COUNT)
+        self.assertEqual(snapshot['records_dropped']['send_failed'], 3)
+
+    def test_manager_stats(self):
+        from coralogix.manager import LoggerManager
+        before = LoggerManager.stats()
+        max_buffer_size = Coralogix.MAX_LOG_BUFFER_SIZE
+        with LoggerManager._mutex:
+            try:
+                LoggerManager.add_logline('message', Coralogix.Severity.INFO, 'test')
+                stats = LoggerManager.stats()
+                self.assertEqual(stats['records_enqueued'], before['records_enqueued'] + 1)
+                self.assertGreater(stats['bytes_enqueued'], before['bytes_enqueued'])
+                self.assertGreaterEqual(stats['buffer_records'], 1)
+                self.assertGreaterEqual(stats['oldest_entry_age_seconds'], 0)
+                Coralogix.MAX_LOG_BUFFER_SIZE = 0
+                LoggerManager.add_logline('message', Coralogix.Severity.INFO, 'test')
+                stats = LoggerManager.stats()
+                self.assertEqual(
+                    stats['records_dropped']['buffer_full'],
+                    before['records_dropped']['buffer_full'] + 1
+                )
+            finally:
+                Coralogix.MAX_LOG_BUFFER_SIZE = max_buffer_size
+                LoggerManager._collect()
+                LoggerManager._buffer.take(len(LoggerManager._buffer))
+                LoggerManager._buffer_size = 0
+
+    def test_to_prometheus(self):
+        from coralogix.manager import LoggerManager
+        text = to_prometheus(LoggerManager.stats())
+        self.assertIn('# TYPE coralogix_sdk_records_enqueued_total counter\n', text)
+        self.assertIn('coralogix_sdk_records_dropped_total{reason="buffer_full"} ', text)
+        self.assertIn('coralogix_sdk_http_latency_seconds_bucket{le="+Inf"} ', text)
+        self.assertIn('coralogix_sdk_buffer_bytes ', text)
+        self.assertTrue(text.endswith('\n'))
+
+    def test_modules_import_on_their_own(self):
+        import os
+        import sys
+        import subprocess
+        import coralogix
+        root = os.path.dirname(os.path.dirname(os.path.abspath(coralogix.__file__)))
+        # A fresh interpreter, so nothing was loaded by the other tests
+        modules = ('coralogix.stats', 'coralogix.retry', 'coralogix.pool', 'coralogix.collector',
+                   'coralogix.clock')
+        for module in modules:
+            with self.subTest(module=module):
+                subprocess.check_call([sys.executable, '-c', 'import ' + module], cwd=root)
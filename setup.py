@@ -28,6 +28,15 @@ setup(
         'requests>=2.24.0',
     ],
     extras_require={
+        'zstd': [
+            'zstandard>=0.15.0',
+        ],
+        'asyncio': [
+            'aiohttp>=3.6.0',
+        ],
+        'orjson': [
+            'orjson>=3.0.0',
+        ],
         'development': [
             'wheel>=0.31.0',
             'twine>=3.3.0',